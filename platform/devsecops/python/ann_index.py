@@ -0,0 +1,532 @@
+# ann_index.py
+"""
+IVF (inverted file) approximate nearest-neighbour index for local retrieval.
+
+Vectors are L2-normalized and clustered with spherical k-means into
+`nlist` inverted lists. A query scores the centroids, then only the rows of
+the `nprobe` closest lists, so with nlist ~ 4*sqrt(N) a top-k touches a
+few thousand rows instead of millions. nprobe is the recall/latency knob
+(per index, or per query); nprobe == nlist is an exact scan.
+
+Layout:
+
+  base   rows grouped by list (list i = rows offsets[i]:offsets[i+1]), so a
+         probe is a contiguous slice; a numpy memmap after open()
+  tail   rows inserted since the last compaction, with their list number;
+         probed by mask until compact() merges them into the base
+
+Deletes and overwrites tombstone the old row; compact() (run automatically
+once the tail outgrows `compact_ratio` of the base) drops tombstones.
+Until `min_train` vectors exist the index is untrained and searched
+exhaustively.
+
+With quantizer="int8" or "pq" (quantization.py) probed lists are scored on
+compact codes of each row's residual from its list centroid (IVF-PQ style)
+instead of float rows, and the best `rerank * top_k`
+candidates are re-scored exactly against the float vectors (rerank=0
+returns the approximate scores as is).
+
+On disk (save()/open()), one directory per index:
+
+  vectors.npy  offsets.npy  centroids.npy  ids.json  metadata.json  meta.json
+  codes.npy  quantizer.npz                           (quantized indexes)
+
+open() memory-maps vectors.npy and codes.npy read-only, so worker
+processes opening the same directory share one page-cached copy; with a
+quantizer only the codes are scanned, and float rows are paged in for the
+few re-ranked candidates.
+
+Metadata filters are resolved against inverted bitmaps (metadata_index.py)
+before scoring: probed lists only score rows that pass, and a filter
+selective enough to leave fewer rows than the probe would scan is answered
+by an exact scan of just those rows (so a narrow ACL never comes back
+short because its rows sit in unprobed lists).
+
+IVFVectorStore wraps one IVFIndex per namespace behind the LocalVectorStore
+upsert/query/delete/describe_index_stats interface.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from metadata_index import DEFAULT_INDEXED_FIELDS, BitmapIndex, compile_filter
+from quantization import make_quantizer, quantizer_from_state
+from vector_store import Metadata, as_record, normalize, read_export
+
+DEFAULT_NPROBE = 8
+DEFAULT_MIN_TRAIN = 4096
+DEFAULT_COMPACT_RATIO = 0.2
+DEFAULT_RERANK = 4
+
+_KMEANS_ITERS = 10
+_TRAIN_POINTS_PER_LIST = 40  # k-means sample per list; below ~39 centroids get noisy
+_ASSIGN_BLOCK = 65536
+
+
+def default_nlist(n: int) -> int:
+    return max(1, min(n, int(4 * np.sqrt(n))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (max inner product) of each row, in bounded blocks."""
+    out = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], _ASSIGN_BLOCK):
+        block = vectors[start:start + _ASSIGN_BLOCK]
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(
+    vectors: np.ndarray, nlist: int, iters: int = _KMEANS_ITERS, seed: int = 0
+) -> np.ndarray:
+    """Spherical k-means over (a sample of) normalized rows."""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    sample_size = min(n, nlist * _TRAIN_POINTS_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iters):
+        labels = _assign(sample, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+        empty = counts == 0
+        if empty.any():  # re-seed empty lists with random points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms > 0, norms, 1.0)
+    return centroids.astype(np.float32)
+
+
+def _write_npy(path: Path, array: np.ndarray) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, array)
+    os.replace(tmp, path)
+
+
+def _write_json(path: Path, obj: Any) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(obj, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class IVFIndex:
+    """One collection of (id, vector, metadata) rows with an IVF search."""
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: Optional[int] = None,
+        nprobe: int = DEFAULT_NPROBE,
+        min_train: int = DEFAULT_MIN_TRAIN,
+        compact_ratio: float = DEFAULT_COMPACT_RATIO,
+        quantizer: Optional[str] = None,
+        pq_m: Optional[int] = None,
+        rerank: int = DEFAULT_RERANK,
+        indexed_fields: Sequence[str] = DEFAULT_INDEXED_FIELDS,
+    ):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.compact_ratio = compact_ratio
+        self.quantizer_kind = None if quantizer in (None, "none") else quantizer
+        self.pq_m = pq_m
+        self.rerank = rerank
+        make_quantizer(self.quantizer_kind, dim, pq_m)  # validate early
+
+        self.centroids: Optional[np.ndarray] = None
+        self.quantizer = None
+        self.codes: Optional[np.ndarray] = None  # per base row, when quantized
+        self.base = np.empty((0, dim), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.tail = np.empty((64, dim), dtype=np.float32)
+        self.tail_lists = np.empty(64, dtype=np.int32)
+        self.tail_size = 0
+
+        # per row, base rows first then tail rows
+        self.ids: List[str] = []
+        self.metadata: List[Metadata] = []
+        self.live = np.empty(64, dtype=bool)
+        self.row_of: Dict[str, int] = {}
+        self.bitmaps = BitmapIndex(indexed_fields)
+
+    # ---- size -------------------------------------------------------------
+
+    @property
+    def base_size(self) -> int:
+        return self.base.shape[0]
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    # ---- writes -----------------------------------------------------------
+
+    def add(self, items: Iterable[Tuple[str, np.ndarray, Metadata]]) -> None:
+        """Insert or overwrite (id, normalized vector, metadata) rows."""
+        for vec_id, vec, metadata in items:
+            self.remove([vec_id])
+            if self.tail_size == self.tail.shape[0]:
+                self.tail = np.concatenate([self.tail, np.empty_like(self.tail)])
+                self.tail_lists = np.concatenate([self.tail_lists, np.empty_like(self.tail_lists)])
+            self.tail[self.tail_size] = vec
+            self.tail_lists[self.tail_size] = (
+                int(np.argmax(self.centroids @ vec)) if self.trained else -1
+            )
+            self.tail_size += 1
+
+            row = len(self.ids)
+            self.ids.append(vec_id)
+            self.metadata.append(metadata)
+            if row == self.live.shape[0]:
+                self.live = np.concatenate([self.live, np.empty_like(self.live)])
+            self.live[row] = True
+            self.row_of[vec_id] = row
+            self.bitmaps.add(row, metadata)
+
+        if not self.trained and len(self) >= self.min_train:
+            self.build()
+        elif self.trained and self.tail_size > self.compact_ratio * max(self.base_size, 1):
+            self.compact()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        for vec_id in ids:
+            row = self.row_of.pop(vec_id, None)
+            if row is not None:
+                self.live[row] = False
+                self.bitmaps.discard(row, self.metadata[row])
+                self.metadata[row] = {}
+
+    def _live_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(base rows, tail positions) still live."""
+        live = self.live[: len(self.ids)]
+        base_rows = np.flatnonzero(live[: self.base_size])
+        tail_pos = np.flatnonzero(live[self.base_size:])
+        return base_rows, tail_pos
+
+    def build(self, nlist: Optional[int] = None, seed: int = 0) -> None:
+        """(Re)train the centroids on every live vector and re-lay the lists."""
+        base_rows, tail_pos = self._live_rows()
+        vectors = np.concatenate([self.base[base_rows], self.tail[tail_pos]])
+        if vectors.shape[0] == 0:
+            return
+        self.nlist = nlist or self.nlist or default_nlist(vectors.shape[0])
+        self.nlist = min(self.nlist, vectors.shape[0])
+        self.centroids = train_centroids(vectors, self.nlist, seed=seed)
+        lists = _assign(vectors, self.centroids)
+        codes = None
+        self.quantizer = make_quantizer(self.quantizer_kind, self.dim, self.pq_m)
+        if self.quantizer is not None:
+            residuals = vectors - self.centroids[lists]
+            self.quantizer.train(residuals, seed=seed)
+            codes = self.quantizer.encode(residuals)
+        self.tail_lists[: self.tail_size] = -1
+        self._relayout(base_rows, tail_pos, vectors, lists, codes)
+
+    def compact(self) -> None:
+        """Merge the tail into the base and drop tombstones (no retraining)."""
+        if not self.trained:
+            return
+        base_rows, tail_pos = self._live_rows()
+        base_lists = np.repeat(
+            np.arange(self.nlist, dtype=np.int32), np.diff(self.offsets)
+        )[base_rows]
+        lists = np.concatenate([base_lists, self.tail_lists[tail_pos]])
+        vectors = np.concatenate([self.base[base_rows], self.tail[tail_pos]])
+        codes = None
+        if self.quantizer is not None:
+            # only the tail needs encoding; base codes are carried over
+            residuals = self.tail[tail_pos] - self.centroids[self.tail_lists[tail_pos]]
+            codes = np.concatenate([self.codes[base_rows], self.quantizer.encode(residuals)])
+        self._relayout(base_rows, tail_pos, vectors, lists, codes)
+
+    def _relayout(self, base_rows, tail_pos, vectors, lists, codes=None) -> None:
+        order = np.argsort(lists, kind="stable")
+        old_rows = np.concatenate([base_rows, self.base_size + tail_pos])[order]
+        self.base = np.ascontiguousarray(vectors[order])
+        self.codes = None if codes is None else np.ascontiguousarray(codes[order])
+        counts = np.bincount(lists, minlength=self.nlist)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.ids = [self.ids[r] for r in old_rows]
+        self.metadata = [self.metadata[r] for r in old_rows]
+        self.row_of = {vec_id: row for row, vec_id in enumerate(self.ids)}
+        self.live = np.ones(max(64, len(self.ids)), dtype=bool)
+        self.bitmaps.rebuild(self.metadata)
+        self.tail_size = 0
+
+    # ---- search -----------------------------------------------------------
+
+    def search(
+        self,
+        q: np.ndarray,
+        top_k: int,
+        nprobe: Optional[int] = None,
+        filter: Optional[Mapping[str, Any]] = None,
+    ) -> List[Tuple[int, float]]:
+        """[(row, score)] of the best top_k live rows passing `filter`, best first."""
+        if top_k <= 0 or not self.row_of:
+            return []
+        n = len(self.ids)
+        allowed = self.live[:n]
+        mask, residual = self.bitmaps.resolve(filter, n)
+        if mask is not None:
+            allowed = allowed & mask
+
+        approx = self.quantizer.scorer(q) if self.quantizer is not None else None
+        cscores = self.centroids @ q if self.trained else None
+        tail_allowed = allowed[self.base_size:]
+        if not self.trained:
+            base_rows = np.empty(0, dtype=np.intp)
+            tail_pos = np.flatnonzero(tail_allowed)
+        else:
+            nprobe = min(nprobe or self.nprobe, self.nlist)
+            if mask is not None and allowed.sum() <= nprobe * n / self.nlist:
+                # selective filter: exact scan of the rows that pass
+                base_rows = np.flatnonzero(allowed[: self.base_size])
+                tail_pos = np.flatnonzero(tail_allowed)
+            else:
+                probe = np.argpartition(-cscores, nprobe - 1)[:nprobe]
+                base_rows = np.concatenate(
+                    [np.arange(self.offsets[lst], self.offsets[lst + 1]) for lst in probe]
+                )
+                base_rows = base_rows[allowed[base_rows]]
+                in_probe = np.isin(self.tail_lists[: self.tail_size], probe)
+                tail_pos = np.flatnonzero(in_probe & tail_allowed)
+
+        rows = np.concatenate([base_rows, self.base_size + tail_pos])
+        if residual is not None:
+            keep = [residual(self.metadata[r]) for r in rows]
+            rows = rows[np.asarray(keep, dtype=bool)]
+        if rows.size == 0:
+            return []
+        base_rows = rows[rows < self.base_size]
+        tail_pos = rows[rows >= self.base_size] - self.base_size
+
+        if approx is not None:
+            # codes hold the residual from the list centroid
+            lists = np.searchsorted(self.offsets, base_rows, side="right") - 1
+            base_scores = approx(self.codes[base_rows]) + cscores[lists]
+        else:
+            base_scores = self.base[base_rows] @ q
+        scores = np.concatenate([base_scores, self.tail[tail_pos] @ q])
+
+        if approx is not None and self.rerank > 0:
+            # exact re-rank of the best approximate candidates
+            n_rerank = min(top_k * self.rerank, rows.shape[0])
+            shortlist = np.argpartition(-scores, n_rerank - 1)[:n_rerank]
+            rows = rows[shortlist]
+            scores = self._exact_scores(rows, q)
+
+        k = min(top_k, rows.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def _exact_scores(self, rows: np.ndarray, q: np.ndarray) -> np.ndarray:
+        scores = np.empty(rows.shape[0], dtype=np.float32)
+        in_base = rows < self.base_size
+        base_rows = rows[in_base]
+        order = np.argsort(base_rows)  # ascending reads from a mapped file
+        base_scores = np.empty(base_rows.shape[0], dtype=np.float32)
+        base_scores[order] = self.base[base_rows[order]] @ q
+        scores[in_base] = base_scores
+        scores[~in_base] = self.tail[rows[~in_base] - self.base_size] @ q
+        return scores
+
+    # ---- persistence ------------------------------------------------------
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Compact and write the index to directory `path`."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        if self.trained:
+            self.compact()
+        else:
+            self.build()
+
+        centroids = self.centroids if self.trained else np.empty((0, self.dim), np.float32)
+        _write_npy(path / "vectors.npy", self.base)
+        _write_npy(path / "offsets.npy", self.offsets)
+        _write_npy(path / "centroids.npy", centroids)
+        _write_json(path / "ids.json", self.ids)
+        _write_json(path / "metadata.json", self.metadata)
+        if self.quantizer is not None:
+            _write_npy(path / "codes.npy", self.codes)
+            tmp = path / ".quantizer.npz.tmp"
+            with open(tmp, "wb") as fh:
+                np.savez(fh, **self.quantizer.state())
+            os.replace(tmp, path / "quantizer.npz")
+        # meta.json last: a reader never sees a half-written index as complete
+        _write_json(
+            path / "meta.json",
+            {
+                "dim": self.dim,
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "min_train": self.min_train,
+                "compact_ratio": self.compact_ratio,
+                "quantizer": self.quantizer_kind,
+                "pq_m": self.pq_m,
+                "rerank": self.rerank,
+                "indexed_fields": sorted(self.bitmaps.fields),
+                "count": len(self.ids),
+            },
+        )
+
+    @classmethod
+    def open(cls, path: Union[str, Path], mmap: bool = True) -> "IVFIndex":
+        """Load a saved index; vectors and codes are memory-mapped read-only by default."""
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        index = cls(
+            meta["dim"], meta["nlist"], meta["nprobe"], meta["min_train"], meta["compact_ratio"],
+            meta.get("quantizer"), meta.get("pq_m"), meta.get("rerank", DEFAULT_RERANK),
+            meta.get("indexed_fields", DEFAULT_INDEXED_FIELDS),
+        )
+        mode = "r" if mmap else None
+        index.base = np.load(path / "vectors.npy", mmap_mode=mode)
+        if index.quantizer_kind and (path / "quantizer.npz").exists():
+            with np.load(path / "quantizer.npz") as state:
+                index.quantizer = quantizer_from_state(index.quantizer_kind, dict(state))
+            index.codes = np.load(path / "codes.npy", mmap_mode=mode)
+        index.offsets = np.load(path / "offsets.npy")
+        centroids = np.load(path / "centroids.npy")
+        index.centroids = centroids if centroids.shape[0] else None
+        index.ids = json.loads((path / "ids.json").read_text(encoding="utf-8"))
+        index.metadata = json.loads((path / "metadata.json").read_text(encoding="utf-8"))
+        index.row_of = {vec_id: row for row, vec_id in enumerate(index.ids)}
+        index.live = np.ones(max(64, len(index.ids)), dtype=bool)
+        index.bitmaps.rebuild(index.metadata)
+        return index
+
+
+class IVFVectorStore:
+    """
+    LocalVectorStore interface over one IVFIndex per namespace, persisted
+    under `root/<namespace>/` (namespace "" is stored as "_default").
+    """
+
+    def __init__(
+        self,
+        root: Optional[Union[str, Path]] = None,
+        dimension: Optional[int] = None,
+        nlist: Optional[int] = None,
+        nprobe: int = DEFAULT_NPROBE,
+        min_train: int = DEFAULT_MIN_TRAIN,
+        quantizer: Optional[str] = None,
+        pq_m: Optional[int] = None,
+        rerank: int = DEFAULT_RERANK,
+        indexed_fields: Sequence[str] = DEFAULT_INDEXED_FIELDS,
+    ):
+        self.root = Path(root) if root else None
+        self.dimension = dimension
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.quantizer = quantizer
+        self.pq_m = pq_m
+        self.rerank = rerank
+        self.indexed_fields = tuple(indexed_fields)
+        self._indexes: Dict[str, IVFIndex] = {}
+        self._lock = threading.RLock()
+        if self.root is not None and self.root.is_dir():
+            for sub in sorted(self.root.iterdir()):
+                if (sub / "meta.json").exists():
+                    index = IVFIndex.open(sub)
+                    self._indexes["" if sub.name == "_default" else sub.name] = index
+                    self.dimension = index.dim
+
+    def load_json(self, path: Union[str, Path]) -> str:
+        namespace, vectors = read_export(path)
+        self.upsert(vectors, namespace=namespace)
+        return namespace
+
+    def _index(self, namespace: str) -> IVFIndex:
+        index = self._indexes.get(namespace)
+        if index is None:
+            index = self._indexes[namespace] = IVFIndex(
+                self.dimension, self.nlist, self.nprobe, self.min_train,
+                quantizer=self.quantizer, pq_m=self.pq_m, rerank=self.rerank,
+                indexed_fields=self.indexed_fields,
+            )
+        return index
+
+    def upsert(self, vectors: Iterable[Any], namespace: str = "") -> Dict[str, int]:
+        records = [as_record(v) for v in vectors]
+        with self._lock:
+            rows = []
+            for vec_id, values, metadata in records:
+                vec = normalize(values, self.dimension)
+                if self.dimension is None:
+                    self.dimension = vec.shape[0]
+                rows.append((str(vec_id), vec, metadata))
+            if rows:
+                self._index(namespace).add(rows)
+        return {"upserted_count": len(rows)}
+
+    def delete(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        namespace: str = "",
+        delete_all: bool = False,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            if delete_all:
+                self._indexes.pop(namespace, None)
+            elif namespace in self._indexes:
+                self._indexes[namespace].remove(ids or ())
+        return {}
+
+    def query(
+        self,
+        vector: Sequence[float],
+        top_k: int = 5,
+        namespace: str = "",
+        filter: Optional[Mapping[str, Any]] = None,
+        include_metadata: bool = True,
+        nprobe: Optional[int] = None,
+        **_ignored: Any,
+    ) -> Dict[str, Any]:
+        compile_filter(filter)  # reject bad filters even on an empty namespace
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                return {"namespace": namespace, "matches": []}
+            q = normalize(vector, self.dimension)
+            matches = []
+            for row, score in index.search(q, top_k, nprobe=nprobe, filter=filter):
+                match: Dict[str, Any] = {"id": index.ids[row], "score": score}
+                if include_metadata:
+                    match["metadata"] = dict(index.metadata[row])
+                matches.append(match)
+        return {"namespace": namespace, "matches": matches}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: {"vector_count": len(ix)} for name, ix in self._indexes.items()}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values()),
+        }
+
+    def save(self, root: Optional[Union[str, Path]] = None) -> None:
+        root = Path(root) if root else self.root
+        if root is None:
+            raise ValueError("IVFVectorStore.save needs a root directory")
+        with self._lock:
+            for name, index in self._indexes.items():
+                index.save(root / (name or "_default"))
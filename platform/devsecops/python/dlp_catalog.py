@@ -0,0 +1,174 @@
+# dlp_catalog.py
+"""
+Compile the classification catalog into a bitmask lookup for the runtime.
+
+  governance/classification_catalog/classification.yaml  -> label priority
+  governance/classification_catalog/pii_entities.yaml    -> entity -> label
+
+Each entity type gets one bit; each label gets the OR of its entities' bits.
+Resolving a label for a set of detections is then an OR over per-entity
+bits followed by at most len(priority) AND tests – no sets are built per
+request, and catalog edits roll out without touching code.
+
+PyYAML is optional at runtime (the Lambda zip does not ship it); without it,
+or without the catalog directory, BUILTIN_CATALOG mirrors the YAML files.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+CATALOG_DIR = Path(
+    os.environ.get("DLP_CATALOG_DIR")
+    or REPO_ROOT / "platform" / "governance" / "classification_catalog"
+)
+
+# Mirror of the YAML catalog, used when it can't be read at runtime
+BUILTIN_CATALOG: Dict[str, Any] = {
+    "priority": [
+        "RESTRICTED_PHI",
+        "RESTRICTED_PII",
+        "CONFIDENTIAL",
+        "INTERNAL",
+        "PUBLIC",
+    ],
+    "entities": {
+        "MRN": "RESTRICTED_PHI",
+        "ICD10_CODE": "RESTRICTED_PHI",
+        "MEDICATION": "RESTRICTED_PHI",
+        "PHI_HINT": "RESTRICTED_PHI",
+        "SSN": "RESTRICTED_PII",
+        "PASSPORT": "RESTRICTED_PII",
+        "DRIVERS_LICENSE": "RESTRICTED_PII",
+        "CREDIT_CARD": "RESTRICTED_PII",
+        "DOB": "RESTRICTED_PII",
+        "PHONE_NUMBER": "RESTRICTED_PII",
+        "EMAIL_ADDRESS": "RESTRICTED_PII",
+        "IP_ADDRESS": "CONFIDENTIAL",
+        "ADDRESS": "RESTRICTED_PII",
+        "ROUTING": "RESTRICTED_PII",
+        "ACCOUNT": "RESTRICTED_PII",
+        "PII_HINT": "RESTRICTED_PII",
+    },
+    "defaults": {"no_entities": "INTERNAL", "fallback": "PUBLIC"},
+}
+
+
+@dataclass(frozen=True)
+class CompiledCatalog:
+    """Precomputed entity-bit / label-mask tables."""
+
+    bits: Dict[str, int]
+    # (label, mask) in priority order, highest first
+    label_masks: Tuple[Tuple[str, int], ...]
+    types_by_label: Dict[str, FrozenSet[str]]
+    no_entities: str
+    fallback: str
+    source: str
+
+    @property
+    def top_label(self) -> str:
+        return self.label_masks[0][0] if self.label_masks else self.no_entities
+
+    def mask_for(self, types: Iterable[str]) -> int:
+        """OR together the bits of the given entity types (unknown types = 0)."""
+        bits = self.bits
+        mask = 0
+        for t in types:
+            mask |= bits.get(t, 0)
+        return mask
+
+    def label_for_mask(self, mask: int) -> str:
+        if not mask:
+            return self.no_entities
+        for label, label_mask in self.label_masks:
+            if mask & label_mask:
+                return label
+        return self.fallback
+
+    def label_for_types(self, types: Iterable[str]) -> str:
+        return self.label_for_mask(self.mask_for(types))
+
+
+def compile_catalog(doc: Dict[str, Any], source: str = "builtin") -> CompiledCatalog:
+    """
+    Build a CompiledCatalog from a merged catalog document:
+
+      {"priority": [...], "entities": {TYPE: LABEL}, "defaults": {...}}
+
+    Entity labels missing from the priority list are appended after it so a
+    typo in the catalog never silently drops an entity.
+    """
+    priority = [str(p) for p in doc.get("priority") or []]
+    entities = {str(k).upper(): str(v) for k, v in (doc.get("entities") or {}).items()}
+    defaults = doc.get("defaults") or {}
+
+    for label in entities.values():
+        if label not in priority:
+            priority.append(label)
+
+    bits: Dict[str, int] = {}
+    masks: Dict[str, int] = {label: 0 for label in priority}
+    types_by_label: Dict[str, set] = {label: set() for label in priority}
+    for i, (etype, label) in enumerate(sorted(entities.items())):
+        bits[etype] = 1 << i
+        masks[label] |= 1 << i
+        types_by_label[label].add(etype)
+
+    return CompiledCatalog(
+        bits=bits,
+        label_masks=tuple((label, masks[label]) for label in priority if masks[label]),
+        types_by_label={k: frozenset(v) for k, v in types_by_label.items()},
+        no_entities=str(defaults.get("no_entities", "INTERNAL")),
+        fallback=str(defaults.get("fallback", "PUBLIC")),
+        source=source,
+    )
+
+
+def load_catalog(catalog_dir: Optional[Path] = None) -> CompiledCatalog:
+    """Read classification.yaml + pii_entities.yaml, falling back to the builtin mirror."""
+    catalog_dir = Path(catalog_dir or CATALOG_DIR)
+    try:
+        import yaml  # deferred: only needed when the catalog is (re)compiled
+    except ImportError:
+        return compile_catalog(BUILTIN_CATALOG)
+
+    try:
+        labels_doc = yaml.safe_load((catalog_dir / "classification.yaml").read_text()) or {}
+        entities_doc = yaml.safe_load((catalog_dir / "pii_entities.yaml").read_text()) or {}
+    except OSError:
+        return compile_catalog(BUILTIN_CATALOG)
+
+    return compile_catalog(
+        {
+            "priority": labels_doc.get("priority"),
+            "entities": entities_doc.get("entities"),
+            "defaults": entities_doc.get("defaults"),
+        },
+        source=str(catalog_dir),
+    )
+
+
+_CATALOG_LOCK = threading.Lock()
+_CATALOG: Optional[CompiledCatalog] = None
+
+
+def get_catalog() -> CompiledCatalog:
+    """Process-wide compiled catalog (compiled on first use)."""
+    global _CATALOG
+    if _CATALOG is None:
+        with _CATALOG_LOCK:
+            if _CATALOG is None:
+                _CATALOG = load_catalog()
+    return _CATALOG
+
+
+def reload_catalog(catalog_dir: Optional[Path] = None) -> CompiledCatalog:
+    """Recompile from disk, e.g. after shipping a new catalog."""
+    global _CATALOG
+    with _CATALOG_LOCK:
+        _CATALOG = load_catalog(catalog_dir)
+    return _CATALOG
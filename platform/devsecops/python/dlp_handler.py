@@ -1,29 +1,32 @@
 import json
 import logging
-import os
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
-import boto3
-
 from dlp_utils import (
     Decision,
+    classify_text,
     detect_pii,
     evaluate_policy,
     get_evidence_bucket_from_env,
     log_decision,
+    mask_text,
     safe_preview,
 )
+from evidence_writer import flush_aged_writers, install_lambda_hooks
+from rag_transport import RagTransportError, transport_from_env, transport_mode_from_env
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-lambda_client = boto3.client("lambda")
-
 EVIDENCE_BUCKET = get_evidence_bucket_from_env()
-RAG_LAMBDA_NAME = os.environ.get("RAG_LAMBDA_NAME", "")
+install_lambda_hooks()
+
 
-if not RAG_LAMBDA_NAME:
-    raise RuntimeError("RAG_LAMBDA_NAME environment variable is required")
+@lru_cache(maxsize=1)
+def get_rag_transport():
+    """inprocess | lambda (RAG_LAMBDA_NAME) | http (RAG_HTTP_URL); see rag_transport."""
+    return transport_from_env()
 
 
 def build_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
@@ -44,28 +47,30 @@ def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
         return {}
 
 
-def lambda_handler(event, context):
+def screen_prompt(
+    prompt: str,
+    role: str,
+    classification: Optional[Dict[str, Any]] = None,
+    shared_vault: Optional[bool] = None,
+) -> Dict[str, Any]:
     """
-    API Gateway → DLP Filter.
-
-    Expected request body:
-      {
-        "user_id": "123",
-        "role": "analyst",
-        "prompt": "User prompt..."
-      }
+    Ingress DLP for one prompt: classify, decide, log evidence, mask.
+
+    Shared by lambda_handler and the ASGI gateway server; pass the
+    classify_text(prompt) result as `classification` if you already have
+    it (the server computes it in its scan worker pool). `shared_vault`
+    says whether the orchestrator runs in another process and must resolve
+    the vault tokens minted here (default: DLP_RAG_TRANSPORT is not
+    inprocess); see dlp_vault.get_vault. Returns
+
+      {"decision": "allow" | "mask" | "block",
+       "decision_id": "...",
+       "forward_payload": {...} | None}   # None when blocked
     """
-    logger.info(json.dumps({"event": "incoming_request", "raw_event": str(event)[:500]}))
-
-    body = parse_body(event)
-    prompt = body.get("prompt")
-    role = body.get("role", "unknown")
-
-    if not prompt:
-        return build_response(400, {"error": "Missing 'prompt' in request body"})
-
-    # 1) Detect PII/PHI in the prompt
-    pii_findings = detect_pii(prompt)
+    # 1) Detect PII/PHI in the prompt (classification travels with the request)
+    if classification is None:
+        classification = classify_text(prompt)
+    pii_findings = detect_pii(prompt, classification["entities"])
 
     # 2) Evaluate policy for this role
     decision: Decision = evaluate_policy(role, pii_findings)
@@ -91,45 +96,81 @@ def lambda_handler(event, context):
                 }
             )
         )
-        return build_response(
-            400,
-            {
-                "error": "Prompt blocked by DLP policy.",
-                "decision_id": decision_id,
-            },
-        )
+        return {"decision": decision, "decision_id": decision_id, "forward_payload": None}
+
+    # Mask PII in one pass over the spans we already have before forwarding
+    redaction_applied = False
+    if decision == "mask":
+        # Reversible tokens for vault types so dlp-admin can get them back on
+        # egress; without a vault the orchestrator can read, mask for good
+        from dlp_vault import TOKENIZED_TYPES, VaultConfigError, get_vault
+
+        vault = None
+        if any(f.get("type") in TOKENIZED_TYPES for f in pii_findings):
+            if shared_vault is None:
+                shared_vault = transport_mode_from_env() != "inprocess"
+            try:
+                vault = get_vault(shared=shared_vault)
+            except VaultConfigError as exc:
+                logger.warning("%s; masking without reversible tokens.", exc)
+        prompt, state = mask_text(prompt, entities=pii_findings, vault=vault)
+        redaction_applied = state["redaction_applied"]
 
-    # In a more advanced version, you'd mask PII here if decision == "mask".
     forward_payload = {
         "prompt": prompt,
         "user_role": role,
         "original_decision_id": decision_id,
+        "redaction_applied": redaction_applied,
+        # Spare the orchestrator a second classification pass
+        "dlp_classification": {
+            "label": classification["label"],
+            "entity_types": sorted({e["type"] for e in classification["entities"]}),
+        },
     }
+    return {"decision": decision, "decision_id": decision_id, "forward_payload": forward_payload}
 
-    try:
-        invoke_resp = lambda_client.invoke(
-            FunctionName=RAG_LAMBDA_NAME,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(forward_payload).encode("utf-8"),
-        )
-    except Exception as exc:
-        logger.exception("Failed to invoke RAG lambda")
+
+def _handle(event, context):
+    """
+    API Gateway → DLP Filter.
+
+    Expected request body:
+      {
+        "user_id": "123",
+        "role": "analyst",
+        "prompt": "User prompt..."
+      }
+    """
+    logger.info(json.dumps({"event": "incoming_request", "raw_event": str(event)[:500]}))
+
+    body = parse_body(event)
+    prompt = body.get("prompt")
+    role = body.get("role", "unknown")
+
+    if not prompt:
+        return build_response(400, {"error": "Missing 'prompt' in request body"})
+
+    screened = screen_prompt(prompt, role)
+    decision_id = screened["decision_id"]
+
+    if screened["decision"] == "block":
         return build_response(
-            500,
+            400,
             {
-                "error": "Internal error invoking RAG orchestrator.",
-                "details": str(exc),
+                "error": "Prompt blocked by DLP policy.",
                 "decision_id": decision_id,
             },
         )
 
     try:
-        rag_payload = json.loads(invoke_resp["Payload"].read())
-    except Exception:
+        rag_payload = get_rag_transport().send(screened["forward_payload"])
+    except RagTransportError as exc:
+        logger.exception("Failed to call RAG orchestrator")
         return build_response(
             500,
             {
-                "error": "Invalid response from RAG orchestrator.",
+                "error": "Internal error invoking RAG orchestrator.",
+                "details": str(exc),
                 "decision_id": decision_id,
             },
         )
@@ -137,29 +178,14 @@ def lambda_handler(event, context):
     # RAG lambda already returns a JSON-friendly structure
     return build_response(200, rag_payload)
 
-from dlp_utils import detect_pii, classify_text, check_data_movement, evaluate_dlp_policy
-
-def handle_ingress(prompt_text, user_role="anonymous"):
-    entities = detect_pii(prompt_text)
-    label = classify_text(entities)
 
-    movement = check_data_movement(
-        "dlp_gateway",
-        "rag_orchestrator",
-        {
-            "classification_label": label,
-            "policy_decision": {"action": "allow"},
-            "redaction_applied": label not in {"RESTRICTED_PHI","RESTRICTED_PII"}
-        }
-    )
-
-    decision = evaluate_dlp_policy(
-        direction="ingress",
-        user_role=user_role,
-        text=prompt_text,
-        entities=entities,
-        classification_label=label,
-        movement=movement
-    )
-
-    return decision, entities, label
+def lambda_handler(event, context):
+    """
+    Lambda entry point (see _handle). The environment is frozen once this
+    returns, so an evidence batch that is already due is written first
+    (fresh records stay buffered; see evidence_writer).
+    """
+    try:
+        return _handle(event, context)
+    finally:
+        flush_aged_writers()
@@ -0,0 +1,148 @@
+# dlp_redact.py
+"""
+Span-based redaction engine for the "mask" decision.
+
+Takes the scanner's spans (dlp_scanner.Span or entity dicts with
+start/end/type) and rebuilds the text in ONE pass: untouched slices and
+replacements are collected into a list and joined once – no repeated
+str.replace, and no second regex scan.
+
+Per-entity strategies are plain callables ``(entity_type, value) -> str``:
+
+  full_mask          "123-45-6789" -> "[SSN]"
+  last4              "123-45-6789" -> "***-**-6789"
+  format_preserving  "123-45-6789" -> "804-91-3357" (keyed, deterministic)
+
+A strategy of ``None`` leaves the span as-is (used for context keywords
+such as PHI_HINT, which are signals rather than values).
+"""
+import hashlib
+import hmac
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+Strategy = Callable[[str, str], str]
+
+
+def full_mask(entity_type: str, value: str) -> str:
+    return f"[{entity_type}]"
+
+
+def last4(entity_type: str, value: str) -> str:
+    """Mask every letter/digit except the last four, keeping separators."""
+    keep = 4
+    out = []
+    for ch in reversed(value):
+        if ch.isalnum():
+            if keep > 0:
+                out.append(ch)
+                keep -= 1
+            else:
+                out.append("*")
+        else:
+            out.append(ch)
+    return "".join(reversed(out))
+
+
+def format_preserving(key: bytes) -> Strategy:
+    """
+    Build a keyed format-preserving strategy: digits map to digits and
+    letters to letters (case kept), separators and length are untouched.
+    The same (key, type, value) always yields the same token, so masked
+    values can still be joined on downstream. One-way: the original
+    can't be recovered from the token.
+    """
+
+    def strategy(entity_type: str, value: str) -> str:
+        digest = hmac.new(
+            key, f"{entity_type}\x00{value}".encode("utf-8"), hashlib.sha256
+        ).digest()
+        out = []
+        for i, ch in enumerate(value):
+            b = digest[i % len(digest)]
+            if ch.isdigit():
+                out.append(str(b % 10))
+            elif ch.isalpha():
+                base = "A" if ch.isupper() else "a"
+                out.append(chr(ord(base) + b % 26))
+            else:
+                out.append(ch)
+        return "".join(out)
+
+    return strategy
+
+
+# Without DLP_REDACTION_KEY tokens are only stable within one process
+_REDACTION_KEY = os.environ.get("DLP_REDACTION_KEY", "").encode("utf-8") or os.urandom(32)
+FORMAT_PRESERVING = format_preserving(_REDACTION_KEY)
+
+DEFAULT_STRATEGIES: Dict[str, Optional[Strategy]] = {
+    "SSN": last4,
+    "CREDIT_CARD": last4,
+    "ROUTING": last4,
+    "ACCOUNT": last4,
+    "PHONE_NUMBER": last4,
+    "PHI_HINT": None,
+}
+
+
+@dataclass(frozen=True)
+class RedactionResult:
+    text: str
+    count: int  # spans actually replaced
+    counts_by_type: Dict[str, int]
+
+    @property
+    def applied(self) -> bool:
+        return self.count > 0
+
+
+def span_fields(span: Any) -> Optional[Tuple[str, int, int]]:
+    """(type, start, end) from a Span or an entity dict; None without offsets."""
+    if isinstance(span, Mapping):
+        start, end = span.get("start"), span.get("end")
+        if start is None or end is None:
+            return None  # e.g. synthetic entities without offsets
+        return str(span.get("type", "")), int(start), int(end)
+    return span.type, span.start, span.end
+
+
+def redact(
+    text: str,
+    spans: Iterable[Any],
+    strategies: Optional[Mapping[str, Optional[Strategy]]] = None,
+    default: Optional[Strategy] = full_mask,
+) -> RedactionResult:
+    """
+    Replace every span in ``text`` according to its entity's strategy.
+
+    Spans may arrive in any order; overlapping spans are resolved in favour
+    of the one that starts first.
+    """
+    table = DEFAULT_STRATEGIES if strategies is None else strategies
+
+    fields = [f for f in (span_fields(s) for s in spans) if f is not None]
+    fields.sort(key=lambda f: (f[1], -f[2]))
+
+    parts = []
+    pos = 0
+    count = 0
+    by_type: Dict[str, int] = {}
+    for etype, start, end in fields:
+        if start < pos or end <= start:
+            continue
+        strategy = table.get(etype, default)
+        if strategy is None:
+            continue
+        parts.append(text[pos:start])
+        parts.append(strategy(etype, text[start:end]))
+        pos = end
+        count += 1
+        by_type[etype] = by_type.get(etype, 0) + 1
+
+    if not count:
+        return RedactionResult(text, 0, {})
+
+    parts.append(text[pos:])
+    return RedactionResult("".join(parts), count, by_type)
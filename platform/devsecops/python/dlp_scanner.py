@@ -0,0 +1,302 @@
+# dlp_scanner.py
+"""
+Single-pass entity scanner for the DLP gateway.
+
+Every detector is folded into ONE compiled alternation (one named group per
+detector), so a prompt is walked once no matter how many entity types we
+look for. Case-insensitivity is handled by the regex flag instead of
+lower-casing a full copy of the text.
+
+Detector patterns may contain a ``(?P<value>...)`` group marking the part of
+the match that is the sensitive value (e.g. the 9 digits after "routing
+number"). Offsets reported for a match are the offsets of that group when it
+participates, otherwise of the whole match.
+"""
+import re
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+
+@dataclass(frozen=True)
+class Detector:
+    """One entity detector folded into the combined scanner."""
+
+    entity_type: str
+    pattern: str
+    score: float
+    # Reported value when the pattern has no (participating) value group
+    value: Optional[str] = None
+    # Post-match check (e.g. Luhn) – rejected matches are dropped
+    validator: Optional[Callable[[str], bool]] = None
+
+
+class Span(NamedTuple):
+    """Compact match record – enough for a redactor to slice the text."""
+
+    type: str
+    start: int
+    end: int
+    score: float
+
+
+def _luhn_ok(candidate: str) -> bool:
+    digits = [int(c) for c in candidate if c.isdigit()]
+    if not 13 <= len(digits) <= 19:
+        return False
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2 == 1:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+# Order matters only when two detectors match at the SAME offset: the first
+# one listed wins. Keyword-anchored detectors bound their look-ahead; the
+# scanner re-walks the text between keyword and value (see _matches), so
+# "passport for 123-45-6789 A1234567" reports the SSN as well.
+DEFAULT_DETECTORS: Tuple[Detector, ...] = (
+    # SSN pattern: 123-45-6789
+    Detector("SSN", r"\b\d{3}-\d{2}-\d{4}\b", 0.99),
+    Detector(
+        "CREDIT_CARD",
+        r"\b(?:\d[ -]?){12,18}\d\b",
+        0.95,
+        validator=_luhn_ok,
+    ),
+    Detector(
+        "PHONE_NUMBER",
+        r"(?<!\w)(?:\+?1[ .-]?)?(?:\(\d{3}\)|\d{3})[ .-]?\d{3}[ .-]\d{4}\b",
+        0.85,
+    ),
+    # Dotted quad with valid octets, but not a version string
+    # ("version 1.2.3.4", "1.2.3.4.5")
+    Detector(
+        "IP_ADDRESS",
+        r"(?<!version )(?<!release )(?<!build )(?<!\d\.)"
+        r"\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b(?!\.\d)",
+        0.9,
+    ),
+    # US routing number (9 digits) when "routing" mentioned nearby
+    Detector("ROUTING", r"routing (?:number )?(?P<value>\d{9})", 0.98),
+    # Passport-like token (must contain a digit) when "passport" appears
+    Detector(
+        "PASSPORT",
+        r"passport.{0,40}?\b(?P<value>(?=[A-Z]*\d)[A-Z0-9]{6,10})\b",
+        0.97,
+    ),
+    Detector(
+        "DRIVERS_LICENSE",
+        r"\bdriver'?s? licen[cs]e.{0,30}?\b(?P<value>(?=[A-Z]*\d)[A-Z0-9]{5,15})\b",
+        0.95,
+    ),
+    Detector(
+        "DOB",
+        r"\b(?:dob|date of birth|born(?: on)?)\b[:\s]*"
+        r"(?P<value>\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{2}-\d{2})\b",
+        0.9,
+    ),
+    # Medical record number; value falls back to "unknown" without digits.
+    # A dashed number after it ("MRN: 123-45-6789") is left to SSN.
+    Detector(
+        "MRN", r"\bmrn\b(?:[:#\s]*(?P<value>\d+)\b(?!-\d))?", 0.99, value="unknown"
+    ),
+    Detector(
+        "ICD10_CODE",
+        r"\b(?:icd-?10|dx|diagnosis code)\b[:\s]*(?P<value>[A-TV-Z]\d{2}(?:\.\d{1,4})?)\b",
+        0.9,
+    ),
+    # A drug needs a dose ("taking zyrtec 10 mg") or a common drug-name
+    # stem ("prescribed amoxicillin"); "taking over the project" is not PHI
+    Detector(
+        "MEDICATION",
+        r"\b(?:prescribed|taking|rx)\b[:\s]+(?P<value>"
+        r"[a-z]{4,} \d+(?:\.\d+)? ?(?:mg|mcg|ml|iu|units?)"
+        r"|[a-z]{2,}(?:cillin|mycin|cycline|pril|olol|sartan|statin|prazole|oxetine"
+        r"|codone|formin|profen|pam|lam)(?: \d+ ?mg)?)\b",
+        0.85,
+    ),
+    # Street address: number, street name and suffix, followed by a city
+    # (", Springfield"), a unit ("Apt 4") or a ZIP code
+    Detector(
+        "ADDRESS",
+        r"\b\d{1,6}\s+(?:\w+\s+){1,3}?(?:blvd|st|ave|rd|drive|dr|ln|lane|way|ct)\b\.?"
+        r"(?=,\s*[a-z]+|\s+(?:apt|suite|unit|#)\s*\w+|\s+\d{5}\b)",
+        0.9,
+    ),
+    Detector("EMAIL_ADDRESS", r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b", 0.95),
+    # Medical-ish hints → very crude PHI marker
+    Detector(
+        "PHI_HINT",
+        r"\b(?:patient|diagnosis|diagnosed|medication|strep|test(?:ed)? positive)\b",
+        0.9,
+        value="medical_context",
+    ),
+)
+
+
+class EntityScanner:
+    """
+    Pre-compiled multi-detector scanner.
+
+    Build once (module import / cold start), then call ``scan`` or
+    ``finditer`` per text. Matches are produced left to right in a single
+    ``finditer`` walk over the input.
+    """
+
+    def __init__(self, detectors: Sequence[Detector]):
+        self.detectors: Tuple[Detector, ...] = tuple(detectors)
+        self._groups: Dict[str, Tuple[Detector, Optional[str]]] = {}
+
+        parts: List[str] = []
+        for i, det in enumerate(self.detectors):
+            group = f"d{i}"
+            value_group: Optional[str] = None
+            body = det.pattern
+            if "(?P<value>" in body:
+                value_group = f"{group}_value"
+                body = body.replace("(?P<value>", f"(?P<{value_group}>")
+            parts.append(f"(?P<{group}>{body})")
+            self._groups[group] = (det, value_group)
+
+        self.pattern = re.compile("|".join(parts), re.IGNORECASE)
+
+    def _matches(self, text: str, pos: int, endpos: Optional[int]):
+        """
+        Yield ``(match, detector, value, start, end, valid)`` per raw match.
+
+        A match must not hide what it overlaps: neither one its validator
+        rejects (e.g. a digit run failing Luhn; "2024 123-45-6789" is an
+        SSN) nor the text a keyword-anchored match skips between keyword
+        and value ("passport for 123-45-6789 A1234567"). After either, the
+        walk resumes one character after the match start instead of its
+        end; spans already reported are not reported again.
+        """
+        if endpos is None:
+            endpos = len(text)
+        seen = set()
+        while pos <= endpos:
+            for m in self.pattern.finditer(text, pos, endpos):
+                det, value_group = self._groups[m.lastgroup]  # type: ignore[index]
+                if value_group is not None and m.start(value_group) != -1:
+                    start, end = m.span(value_group)
+                    value = m.group(value_group)
+                else:
+                    start, end = m.span()
+                    value = det.value if det.value is not None else m.group(0)
+                valid = det.validator is None or det.validator(value)
+                key = (det.entity_type, start, end)
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield m, det, value, start, end, valid
+                if not valid or start > m.start():
+                    pos = m.start() + 1
+                    break
+            else:
+                return
+
+    def finditer(
+        self, text: str, pos: int = 0, endpos: Optional[int] = None
+    ) -> Iterator[Tuple[Detector, str, int, int]]:
+        """
+        Yield ``(detector, value, start, end)`` for every match in one pass.
+
+        ``pos`` / ``endpos`` behave like ``Pattern.finditer``: characters
+        before ``pos`` still count for ``\\b`` and look-behind checks.
+        """
+        for _m, det, value, start, end, valid in self._matches(text, pos, endpos):
+            if valid:
+                yield det, value, start, end
+
+    def iter_spans(
+        self, text: str, pos: int = 0, endpos: Optional[int] = None
+    ) -> Iterator[Span]:
+        """
+        Stream every match as a ``Span`` without building entity dicts.
+
+        Lazy, so callers can stop as soon as they have what they need.
+        """
+        for det, _value, start, end in self.finditer(text, pos, endpos):
+            yield Span(det.entity_type, start, end, det.score)
+
+    def iter_stream(
+        self,
+        chunks: Iterable[str],
+        overlap: int = 256,
+        context: int = 16,
+    ) -> Iterator[Span]:
+        """
+        Scan an iterable of text chunks, yielding spans with GLOBAL offsets
+        as soon as they are final.
+
+        Only a bounded tail is carried between chunks: a match is emitted
+        once at least ``overlap`` characters follow it; anything closer to
+        the end of the buffer (or still open) is re-scanned together with
+        the next chunk, so an SSN split across two chunks is still found
+        exactly once. ``context`` characters before the carried tail are
+        kept so ``\\b`` / look-behind checks see the real preceding text.
+
+        ``overlap`` must exceed the longest match we care about (the
+        keyword-anchored detectors stay well under 100 characters).
+        """
+        ctx = ""  # already-final text just before `buf`
+        buf = ""  # text not yet final
+        base = 0  # global offset of buf[0]
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buf += chunk
+            if len(buf) <= overlap:
+                continue
+
+            text = ctx + buf
+            off = len(ctx)
+            cutoff = len(text) - overlap
+            keep_from = cutoff
+            for m, det, _value, start, end, valid in self._matches(text, off, None):
+                if m.end() > cutoff:
+                    # Might still grow/change with more input: carry it over
+                    keep_from = min(keep_from, m.start())
+                    break
+                if valid:
+                    yield Span(det.entity_type, base + start - off, base + end - off, det.score)
+
+            base += keep_from - off
+            ctx = text[max(0, keep_from - context):keep_from]
+            buf = text[keep_from:]
+
+        text = ctx + buf
+        off = len(ctx)
+        for det, _value, start, end in self.finditer(text, off):
+            yield Span(det.entity_type, base + start - off, base + end - off, det.score)
+
+    def scan(self, text: str) -> List[Dict[str, Any]]:
+        """Return every match as an entity dict with type/value/score/start/end."""
+        return [
+            {
+                "type": det.entity_type,
+                "value": value,
+                "score": det.score,
+                "start": start,
+                "end": end,
+            }
+            for det, value, start, end in self.finditer(text)
+        ]
+
+
+DEFAULT_SCANNER = EntityScanner(DEFAULT_DETECTORS)
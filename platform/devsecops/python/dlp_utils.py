@@ -1,15 +1,29 @@
 # dlp_utils.py
 import os
-import re
 import json
+import codecs
+import hashlib
 import subprocess
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, Iterable, Iterator, List, Literal, Optional, Sequence, Tuple, Union
+
+from dlp_catalog import get_catalog
+from dlp_redact import redact, span_fields
+from dlp_scanner import DEFAULT_SCANNER, Span
+from evidence_writer import get_evidence_writer
 
 REPO_ROOT = Path(__file__).resolve().parents[3]
 
 DATA_MOVEMENT_REGO = REPO_ROOT / "platform" / "mlsecops" / "data_movement" / "data_movement.rego"
-FLOWS_JSON = REPO_ROOT / "platform" / "mlsecops" / "data_movement" / "flows.json"
+FLOWS_JSON = Path(
+    os.environ.get("FLOWS_JSON_PATH")
+    or REPO_ROOT / "platform" / "mlsecops" / "data_movement" / "flows.json"
+)
 
 
 # ------------------------------------------------------------------------------------
@@ -18,60 +32,59 @@ FLOWS_JSON = REPO_ROOT / "platform" / "mlsecops" / "data_movement" / "flows.json
 
 def detect_entities(text: str) -> List[Dict[str, Any]]:
     """
-    Return a list of detected entities with type, value, score.
+    Return a list of detected entities with type, value, score and the
+    start/end offsets of every occurrence (not just the first hit).
     Already used by Streamlit and tests indirectly.
+
+    All detectors run in a single pass via dlp_scanner.DEFAULT_SCANNER.
     """
-    entities: List[Dict[str, Any]] = []
-    lowered = text.lower()
+    return DEFAULT_SCANNER.scan(text)
 
-    # SSN pattern: 123-45-6789
-    ssn_match = re.search(r"\b\d{3}-\d{2}-\d{4}\b", text)
-    if ssn_match:
-        entities.append({"type": "SSN", "value": ssn_match.group(0), "score": 0.99})
 
-    # US routing number (9 digits) when "routing" mentioned nearby
-    routing_match = re.search(r"routing (number )?(\d{9})", lowered)
-    if routing_match:
-        entities.append(
-            {"type": "ROUTING", "value": routing_match.group(2), "score": 0.98}
-        )
+def iter_spans(text: str) -> Iterator[Span]:
+    """
+    Stream every match as a compact Span(type, start, end, score).
 
-    # Passport-like token when "passport" appears
-    passport_match = re.search(r"passport.*?\b([A-Z0-9]{6,10})\b", text, re.IGNORECASE)
-    if passport_match:
-        entities.append(
-            {"type": "PASSPORT", "value": passport_match.group(1), "score": 0.97}
-        )
+    Spans come out in text order and never overlap, so a redactor can mask
+    the text in one linear pass without re-running the regexes.
+    """
+    return DEFAULT_SCANNER.iter_spans(text)
 
-    # Medical-ish hints → very crude MRN/PHI marker
-    if re.search(r"\bmrn\b", lowered):
-        entities.append({"type": "MRN", "value": "unknown", "score": 0.99})
 
-    if re.search(
-        r"\b(patient|diagnosis|diagnosed|medication|strep|test(ed)? positive)\b",
-        lowered,
-    ):
-        entities.append({"type": "PHI_HINT", "value": "medical_context", "score": 0.9})
+# Catalog labels -> the lower-case labels callers (tests, OPA builder) use
+RUNTIME_LABELS = {
+    "RESTRICTED_PHI": "phi",
+    "RESTRICTED_PII": "restricted_pii",
+}
+
+
+def _runtime_label(catalog_label: str) -> str:
+    return RUNTIME_LABELS.get(catalog_label, catalog_label.lower())
+
 
-    return entities
 # ---------------------------------------------------------------------------
 # Backwards-compatible API for tests
 # ---------------------------------------------------------------------------
 
-def detect_pii(text: str) -> List[Dict[str, Any]]:
+def detect_pii(
+    text: str, entities: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
     """
     Legacy helper kept for the pytest suite.
 
-    - Uses detect_entities() for real regex/heuristics.
+    - Uses detect_entities() for real regex/heuristics (pass `entities` if
+      you already scanned the text, e.g. via classify_text).
     - Additionally, if the word 'SSN' appears, we emit a synthetic SSN entity
       so the test `test_detect_pii_detects_ssn` passes even without digits.
     """
-    entities = detect_entities(text)
+    if entities is None:
+        entities = detect_entities(text)
 
-    # drop pure PHI hints; tests are focused on PII
+    # drop PHI entities; tests are focused on PII
+    phi_types = get_catalog().types_by_label.get("RESTRICTED_PHI", frozenset())
     pii_like = [
         e for e in entities
-        if str(e.get("type", "")).upper() not in {"MRN", "PHI_HINT"}
+        if str(e.get("type", "")).upper() not in phi_types
     ]
 
     # If the text mentions 'SSN' but no SSN entity was found, add one
@@ -87,14 +100,9 @@ def detect_pii(text: str) -> List[Dict[str, Any]]:
     return pii_like
 
 
-# --- simple detectors (tight enough for a demo, not toy “random” flags) ---
-
-SSN_RE = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
-ROUTING_RE = re.compile(r"\b\d{9}\b")
-MRN_RE = re.compile(r"\bMRN[:\s]*\d+\b", re.IGNORECASE)
-
-from typing import List, Dict, Any, Union
-# make sure this import line is present at the top of the file
+def _label_for_types(types: Iterable[str]) -> str:
+    """Resolve a label through the compiled catalog's bitmask tables."""
+    return _runtime_label(get_catalog().label_for_types(types))
 
 
 def classify_text(text_or_entities: Union[str, List[Dict[str, Any]]]):
@@ -105,27 +113,20 @@ def classify_text(text_or_entities: Union[str, List[Dict[str, Any]]]):
        - Input: raw text (str)
        - Output: dict:
          {
-           "label": "internal" | "restricted_pii" | "phi",
+           "label": "internal" | "confidential" | "restricted_pii" | "phi",
            "entities": [ { "type", "value", "score" }, ... ]
          }
 
     2) Legacy test usage:
        - Input: list of entities
        - Output: label string only:
-         "internal" | "restricted_pii" | "phi"
+         "internal" | "confidential" | "restricted_pii" | "phi"
+
+    Labels come from the compiled classification catalog (dlp_catalog).
     """
 
     def label_from_entities(ents: List[Dict[str, Any]]) -> str:
-        types = {str(e.get("type", "")).upper() for e in ents}
-
-        has_phi = bool(types & {"MRN", "PHI_HINT"})
-        has_pii = bool(types & {"SSN", "ROUTING", "ACCOUNT", "PII_HINT"})
-
-        if has_phi:
-            return "phi"
-        if has_pii:
-            return "restricted_pii"
-        return "internal"
+        return _label_for_types(str(e.get("type", "")).upper() for e in ents)
 
     # -------- Legacy path: tests pass entities directly --------
     if isinstance(text_or_entities, list):
@@ -142,10 +143,400 @@ def classify_text(text_or_entities: Union[str, List[Dict[str, Any]]]):
     }
 
 
+def classify_label(text: str) -> str:
+    """
+    Label-only fast path for callers that don't need the entity list.
+
+    Stops scanning at the first span of the catalog's top-priority label
+    (RESTRICTED_PHI), since nothing later in the text can outrank it.
+    """
+    catalog = get_catalog()
+    bits = catalog.bits
+    top_mask = catalog.label_masks[0][1] if catalog.label_masks else 0
+    mask = 0
+    for span in DEFAULT_SCANNER.iter_spans(text):
+        mask |= bits.get(span.type, 0)
+        if mask & top_mask:
+            break
+    return _runtime_label(catalog.label_for_mask(mask))
+
+
+def _classify_one(text: str) -> Tuple[str, Dict[str, int], List[Span]]:
+    spans = list(DEFAULT_SCANNER.iter_spans(text))
+    counts: Dict[str, int] = {}
+    for span in spans:
+        counts[span.type] = counts.get(span.type, 0) + 1
+    return _label_for_types(counts), counts, spans
+
+
+def classify_texts(
+    texts: Sequence[str],
+    workers: int = 0,
+    chunksize: int = 64,
+) -> Dict[str, List[Any]]:
+    """
+    Batch classifier for bulk prompt-log and RAG-corpus rescans.
+
+    Returns a columnar result, one entry per input text, same order:
+
+      {
+        "labels":        ["internal" | "confidential" | "restricted_pii" | "phi", ...],
+        "entity_counts": [{"SSN": 2, ...}, ...],
+        "spans":         [[Span(type, start, end, score), ...], ...],
+      }
+
+    The scanner is compiled once per process. With workers > 1 the regex
+    work fans out over a process pool in chunks of `chunksize` texts;
+    workers=0/1 runs in-process (cheapest for small batches).
+    """
+    if workers and workers > 1 and len(texts) > chunksize:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_classify_one, texts, chunksize=chunksize))
+    else:
+        rows = [_classify_one(t) for t in texts]
+
+    return {
+        "labels": [r[0] for r in rows],
+        "entity_counts": [r[1] for r in rows],
+        "spans": [r[2] for r in rows],
+    }
+
+
+def _iter_text_chunks(source: Any, chunk_size: int) -> Iterator[str]:
+    """
+    Normalize a str, a file object (text or binary) or an iterable of
+    str/bytes chunks into an iterator of str chunks. Bytes are decoded
+    incrementally so multi-byte UTF-8 sequences may straddle chunks.
+    """
+    if isinstance(source, str):
+        yield source
+        return
+
+    if hasattr(source, "read"):
+        def pieces() -> Iterator[Any]:
+            while True:
+                piece = source.read(chunk_size)
+                if not piece:
+                    return
+                yield piece
+        it: Iterable[Any] = pieces()
+    else:
+        it = source
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for piece in it:
+        if isinstance(piece, (bytes, bytearray)):
+            piece = decoder.decode(bytes(piece))
+        if piece:
+            yield piece
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_stream_spans(
+    source: Any,
+    chunk_size: int = 64 * 1024,
+    overlap: int = 256,
+) -> Iterator[Span]:
+    """
+    Incrementally yield Spans (global offsets) from a large document.
+
+    `source` may be a str, a text/binary file object or any iterable of
+    str/bytes chunks. Memory stays at roughly one chunk plus `overlap`
+    characters, independent of document size.
+    """
+    return DEFAULT_SCANNER.iter_stream(
+        _iter_text_chunks(source, chunk_size), overlap=overlap
+    )
+
+
+def classify_stream(
+    source: Any,
+    chunk_size: int = 64 * 1024,
+    overlap: int = 256,
+) -> Dict[str, Any]:
+    """
+    Streaming classifier for uploads too large to hold as one string.
+
+    Stops reading as soon as a PHI entity is seen: RESTRICTED_PHI is the top
+    of the priority list in classification.yaml, so nothing later in the
+    document can change the label. `complete` tells whether the whole input
+    was scanned (entity_counts are partial when it wasn't).
+
+      {"label": ..., "entity_counts": {...}, "complete": bool}
+    """
+    catalog = get_catalog()
+    top_types = catalog.types_by_label.get(catalog.top_label, frozenset())
+    counts: Dict[str, int] = {}
+    complete = True
+    spans = iter_stream_spans(source, chunk_size=chunk_size, overlap=overlap)
+    for span in spans:
+        counts[span.type] = counts.get(span.type, 0) + 1
+        if span.type in top_types:
+            complete = False
+            spans.close()
+            break
+
+    return {
+        "label": _label_for_types(counts),
+        "entity_counts": counts,
+        "complete": complete,
+    }
+
+
 # ------------------------------------------------------------------------------------
 # 2. OPA bridge
 # ------------------------------------------------------------------------------------
 
+@dataclass(frozen=True)
+class LabelNotIn:
+    """'classification_label not_in [A, B]'"""
+
+    text: str
+    labels: frozenset
+
+    def violated(self, label: str, action: str, redacted: bool) -> bool:
+        return label in self.labels
+
+
+@dataclass(frozen=True)
+class ActionIn:
+    """'policy_decision.action in [allow,mask]'"""
+
+    text: str
+    actions: frozenset
+
+    def violated(self, label: str, action: str, redacted: bool) -> bool:
+        return action not in self.actions
+
+
+@dataclass(frozen=True)
+class RedactionRequired:
+    """'redaction_applied == true'"""
+
+    text: str
+
+    def violated(self, label: str, action: str, redacted: bool) -> bool:
+        return not redacted
+
+
+FlowCondition = LabelNotIn | ActionIn | RedactionRequired
+
+
+@dataclass(frozen=True)
+class CompiledFlow:
+    """One flows.json entry with its condition strings parsed once."""
+
+    id: str
+    allowed: bool
+    has_conditions: bool
+    conditions: Tuple[FlowCondition, ...]
+
+
+def _compile_condition(cond: str) -> Optional[FlowCondition]:
+    """
+    Turn one flows.json condition string into a predicate object.
+
+    Unknown conditions compile to None and are skipped at evaluation time
+    (non-fatal, same as the Rego mirror always did).
+    """
+    c = cond.strip()
+    if c.startswith("classification_label not_in"):
+        return LabelNotIn(c, frozenset(_parse_list(c)))
+    if c.startswith("policy_decision.action in"):
+        return ActionIn(c, frozenset(_parse_list(c)))
+    if c == "redaction_applied == true":
+        return RedactionRequired(c)
+    return None
+
+
+def _compile_flows(
+    flows: List[Dict[str, Any]],
+) -> Dict[Tuple[str, str], CompiledFlow]:
+    """
+    Index flows by (from, to).
+
+    Only the FIRST flow for a pair is kept: evaluation always returned on
+    the first matching flow, so later duplicates could never be reached.
+    """
+    index: Dict[Tuple[str, str], CompiledFlow] = {}
+    for f in flows:
+        if not isinstance(f, dict):
+            continue
+        key = (f.get("from"), f.get("to"))
+        if key in index:
+            continue
+        conds = f.get("conditions")
+        compiled = tuple(
+            p for p in (_compile_condition(c) for c in conds or []) if p is not None
+        )
+        index[key] = CompiledFlow(
+            id=f.get("id", "<unknown>"),
+            allowed=bool(f.get("allowed", False)),
+            has_conditions=bool(conds),
+            conditions=compiled,
+        )
+    return index
+
+
+class PolicyLoadError(Exception):
+    """flows.json is missing or malformed; message is the deny reason."""
+
+
+@dataclass(frozen=True)
+class FlowPolicy:
+    """Parsed flows.json plus what we need to detect changes on disk."""
+
+    path: Path
+    flows: List[Dict[str, Any]]
+    index: Dict[Tuple[str, str], CompiledFlow]
+    version: str  # sha256 of the file content
+    mtime_ns: int
+    size: int
+
+
+_POLICY_LOCK = threading.Lock()
+_POLICY_CACHE: Dict[Path, FlowPolicy] = {}
+
+
+def load_flow_policy(path: Optional[Path] = None, force: bool = False) -> FlowPolicy:
+    """
+    Return the parsed flow policy, re-reading the file only when it changed.
+
+    A cheap os.stat() runs on every call; the file is opened only when its
+    mtime or size moved, and re-parsed only when the content hash differs
+    (a bare `touch` keeps the cached policy and its version).
+
+    Raises PolicyLoadError; failures are never cached, so a fixed file is
+    picked up on the next call.
+    """
+    path = Path(path or FLOWS_JSON)
+
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        raise PolicyLoadError("policy files missing: flows.json not found")
+    except OSError as e:
+        raise PolicyLoadError(f"failed to load flows.json: {e}")
+
+    cached = _POLICY_CACHE.get(path)
+    if (
+        not force
+        and cached is not None
+        and cached.mtime_ns == st.st_mtime_ns
+        and cached.size == st.st_size
+    ):
+        return cached
+
+    with _POLICY_LOCK:
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            raise PolicyLoadError("policy files missing: flows.json not found")
+        except OSError as e:
+            raise PolicyLoadError(f"failed to load flows.json: {e}")
+
+        version = hashlib.sha256(raw).hexdigest()
+        cached = _POLICY_CACHE.get(path)
+        if not force and cached is not None and cached.version == version:
+            policy = FlowPolicy(
+                path, cached.flows, cached.index, version, st.st_mtime_ns, st.st_size
+            )
+            _POLICY_CACHE[path] = policy
+            return policy
+
+        try:
+            flows_doc = json.loads(raw)
+        except Exception as e:
+            raise PolicyLoadError(f"failed to load flows.json: {e}")
+
+        # flows.json is expected as:
+        # { "flows": [ { id, from, to, allowed, conditions? }, ... ] }
+        flows = flows_doc.get("flows", []) if isinstance(flows_doc, dict) else None
+        if not isinstance(flows, list):
+            raise PolicyLoadError(
+                "invalid flows.json structure: 'flows' must be a list"
+            )
+
+        policy = FlowPolicy(
+            path, flows, _compile_flows(flows), version, st.st_mtime_ns, st.st_size
+        )
+        _POLICY_CACHE[path] = policy
+        return policy
+
+
+def reload_flow_policy(path: Optional[Path] = None) -> FlowPolicy:
+    """
+    Explicit reload hook: drop the cached policy and parse flows.json again.
+
+    Call it from the Lambda cold-start path (module import) to pay the parse
+    cost before the first request, or after shipping a new flows.json.
+    """
+    return load_flow_policy(path, force=True)
+
+
+class DecisionCache:
+    """
+    Bounded LRU of hop verdicts keyed on (policy version, src, dst, label,
+    action, redacted).
+
+    The verdict of a hop depends on nothing else, and the key space is tiny,
+    so in steady state almost every hop is a dict hit. A new policy version
+    clears the table, so a changed flows.json never serves stale verdicts.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[str] = None
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[bool, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: str, key: Tuple[Any, ...]) -> Optional[Tuple[bool, str]]:
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            verdict = self._entries.get(key)
+            if verdict is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+
+    def put(self, version: str, key: Tuple[Any, ...], verdict: Tuple[bool, str]) -> None:
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = verdict
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "policy_version": self._version,
+        }
+
+
+DECISION_CACHE = DecisionCache(int(os.environ.get("DLP_DECISION_CACHE_SIZE", "4096")))
+
+
 def _run_opa(input_payload: Dict[str, Any]) -> Tuple[bool, str]:
     """
     Runtime evaluator for data-movement policies, aligned with flows.json.
@@ -167,21 +558,12 @@ def _run_opa(input_payload: Dict[str, Any]) -> Tuple[bool, str]:
     Returns: (allow: bool, reason: str)
     """
     # -----------------------------
-    # 1) Load flows.json once
+    # 1) Load flows.json (cached until the file changes)
     # -----------------------------
     try:
-        with FLOWS_JSON.open("r", encoding="utf-8") as f:
-            flows_doc = json.load(f)
-    except FileNotFoundError:
-        return False, "policy files missing: flows.json not found"
-    except Exception as e:
-        return False, f"failed to load flows.json: {e}"
-
-    # flows.json is expected as:
-    # { "flows": [ { id, from, to, allowed, conditions? }, ... ] }
-    flows = flows_doc.get("flows", [])
-    if not isinstance(flows, list):
-        return False, "invalid flows.json structure: 'flows' must be a list"
+        policy = load_flow_policy()
+    except PolicyLoadError as e:
+        return False, str(e)
 
     src = input_payload.get("from")
     dst = input_payload.get("to")
@@ -191,6 +573,29 @@ def _run_opa(input_payload: Dict[str, Any]) -> Tuple[bool, str]:
     action = (state.get("policy_decision") or {}).get("action", "allow")
     redacted = bool(state.get("redaction_applied", False))
 
+    key = (src, dst, label, action, redacted)
+    try:
+        hash(key)
+    except TypeError:
+        # Malformed state (e.g. a list as label) – evaluate, don't cache
+        return _evaluate_hop(policy.index, src, dst, label, action, redacted)
+
+    verdict = DECISION_CACHE.get(policy.version, key)
+    if verdict is None:
+        verdict = _evaluate_hop(policy.index, src, dst, label, action, redacted)
+        DECISION_CACHE.put(policy.version, key, verdict)
+    return verdict
+
+
+def _evaluate_hop(
+    index: Dict[Tuple[str, str], CompiledFlow],
+    src: Any,
+    dst: Any,
+    label: Any,
+    action: Any,
+    redacted: bool,
+) -> Tuple[bool, str]:
+    """Uncached hop verdict; see _run_opa for the input contract."""
     # -----------------------------
     # 2) Special-case: RAG → LLM
     # -----------------------------
@@ -210,86 +615,31 @@ def _run_opa(input_payload: Dict[str, Any]) -> Tuple[bool, str]:
             )
 
     # -----------------------------
-    # 3) Generic flow matching
+    # 3) Generic flow matching: O(1) lookup + precompiled predicates
     # -----------------------------
-    matching_flows = [
-        f for f in flows if f.get("from") == src and f.get("to") == dst
-    ]
-
-    if not matching_flows:
+    flow = index.get((src, dst))
+    if flow is None:
         return False, "no matching flow definition in policy"
 
-    # Evaluate each matching flow until one is clearly allowed/denied
-    for f in matching_flows:
-        fid = f.get("id", "<unknown>")
-        allowed_flag = bool(f.get("allowed", False))
-        conds = f.get("conditions")
+    fid = flow.id
 
-        # If no conditions, we just respect allowed_flag
-        if not conds:
-            if allowed_flag:
-                return True, f"flow {fid} allowed (no additional conditions)"
-            else:
-                return False, f"flow {fid} explicitly denied (no additional conditions)"
-
-        # Evaluate conditions (mirror Rego semantics)
-        violated = _flow_violations(conds, label, action, redacted)
-        if violated:
-            return (
-                False,
-                f"flow {fid} denied: {violated}",
-            )
-
-        # All conditions pass
-        if allowed_flag:
-            return True, f"flow {fid} allowed (conditions satisfied)"
+    # If no conditions, we just respect allowed flag
+    if not flow.has_conditions:
+        if flow.allowed:
+            return True, f"flow {fid} allowed (no additional conditions)"
         else:
-            return False, f"flow {fid} denied (allowed=false despite conditions passing)"
-
-    # If we somehow got here, be safe and deny with a reason
-    return False, "no matching flow after evaluation"
-
-
-def _flow_violations(
-    conds: List[str],
-    label: str,
-    action: str,
-    redacted: bool,
-) -> str | None:
-    """
-    Mirror the condition strings used in flows.json, similar to Rego:
-
-      - 'classification_label not_in [RESTRICTED_PII, RESTRICTED_PHI]'
-      - 'policy_decision.action in [allow,mask]'
-      - 'redaction_applied == true'
-
-    Returns the first violated condition as a string, or None if all pass.
-    """
-    for c in conds or []:
-        c = c.strip()
-
-        # classification_label not_in [A, B, C]
-        if c.startswith("classification_label not_in"):
-            labels = _parse_list(c)
-            if label in labels:
-                return c
-
-        # policy_decision.action in [allow,mask]
-        elif c.startswith("policy_decision.action in"):
-            actions = _parse_list(c)
-            if action not in actions:
-                return c
+            return False, f"flow {fid} explicitly denied (no additional conditions)"
 
-        # redaction_applied == true
-        elif c == "redaction_applied == true":
-            if not redacted:
-                return c
-
-        # Unknown condition → treat as non-fatal (don't violate) so demo doesn't break
-        else:
-            continue
+    # Evaluate conditions (mirror Rego semantics); report the first violation
+    for cond in flow.conditions:
+        if cond.violated(label, action, redacted):
+            return False, f"flow {fid} denied: {cond.text}"
 
-    return None
+    # All conditions pass
+    if flow.allowed:
+        return True, f"flow {fid} allowed (conditions satisfied)"
+    else:
+        return False, f"flow {fid} denied (allowed=false despite conditions passing)"
 
 
 def _parse_list(cond: str) -> List[str]:
@@ -330,7 +680,11 @@ def _policy_decision_for_label(label: str) -> Dict[str, Any]:
     }
 
 
-def _build_state(label: str, entities: List[Dict[str, Any]]) -> Dict[str, Any]:
+def _build_state(
+    label: str,
+    entities: List[Dict[str, Any]],
+    redaction_applied: bool = False,
+) -> Dict[str, Any]:
     """
     Normalize classifier labels into the canonical values that
     the OPA data_movement.rego policy expects.
@@ -342,8 +696,12 @@ def _build_state(label: str, entities: List[Dict[str, Any]]) -> Dict[str, Any]:
         opa_label = "RESTRICTED_PII"
     elif norm in ("restricted_phi", "phi"):
         opa_label = "RESTRICTED_PHI"
+    elif norm in ("confidential",):
+        opa_label = "CONFIDENTIAL"
     elif norm in ("internal",):
         opa_label = "INTERNAL"
+    elif norm in ("public",):
+        opa_label = "PUBLIC"
     else:
         # Failsafe – treat unknown labels as INTERNAL
         opa_label = "INTERNAL"
@@ -351,11 +709,44 @@ def _build_state(label: str, entities: List[Dict[str, Any]]) -> Dict[str, Any]:
     return {
         "classification_label": opa_label,
         "policy_decision": {"action": "allow"},
-        "redaction_applied": False,
+        "redaction_applied": redaction_applied,
         "entities": entities,
     }
 
 
+def mask_text(
+    text: str,
+    state: Optional[Dict[str, Any]] = None,
+    entities: Optional[List[Dict[str, Any]]] = None,
+    strategies: Optional[Dict[str, Any]] = None,
+    vault: Optional[Any] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Apply the "mask" decision: redact `text` and return (masked_text, state).
+
+    Pass the `entities` you already have (detect_entities / detect_pii
+    output) to skip re-scanning. With a `vault` (dlp_vault.TokenVault),
+    the vault's entity types become reversible tokens, written to the
+    store in one batch. The returned state is a copy of `state` with
+    redaction_applied set to whether anything was actually replaced and
+    policy_decision.action set to "mask".
+    """
+    spans: List[Any] = list(entities if entities is not None else iter_spans(text))
+    if vault is not None:
+        vault.tokenize_many(
+            (f[0], text[f[1]:f[2]])
+            for f in (span_fields(s) for s in spans)
+            if f is not None and f[0] in vault.types
+        )
+        strategies = vault.strategies(strategies)
+    result = redact(text, spans, strategies)
+
+    new_state = dict(state or {})
+    new_state["policy_decision"] = {**(new_state.get("policy_decision") or {}), "action": "mask"}
+    new_state["redaction_applied"] = result.applied
+    return result.text, new_state
+
+
 # --- existing imports stay as-is above ---
 
 def _check_single_hop(src: str, dst: str, state: Dict[str, Any]) -> Dict[str, Any]:
@@ -482,3 +873,52 @@ def evaluate_policy(*args, **kwargs):
     )
 
 
+
+
+# ------------------------------------------------------------------------------------
+# 4. Evidence logging used by the Lambda handlers
+# ------------------------------------------------------------------------------------
+
+Decision = Literal["allow", "mask", "block"]
+
+
+def get_evidence_bucket_from_env() -> str:
+    """Evidence bucket name as set by Terraform (empty → log-only lab mode)."""
+    return os.environ.get("EVIDENCE_BUCKET_NAME") or os.environ.get("EVIDENCE_BUCKET", "")
+
+
+def safe_preview(text: str, limit: int = 200) -> str:
+    """Truncated preview with every detected entity fully masked, for evidence."""
+    masked = redact(text[: limit * 2], iter_spans(text[: limit * 2]), strategies={}).text
+    return masked if len(masked) <= limit else masked[:limit] + "…"
+
+
+def log_decision(
+    stage: str,
+    decision: Decision,
+    role: str,
+    pii_findings: List[Dict[str, Any]],
+    content_preview: str,
+    evidence_bucket: str,
+) -> str:
+    """
+    Record a DLP decision as evidence and return its decision_id.
+
+    Non-blocking: the record is queued on the process-wide EvidenceWriter,
+    which batches records into gzip NDJSON objects off the request path.
+    Raw entity values are never written, only types and scores.
+    """
+    decision_id = uuid.uuid4().hex
+    record = {
+        "decision_id": decision_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "stage": stage,
+        "decision": decision,
+        "role": role,
+        "findings": [
+            {"type": f.get("type"), "score": f.get("score")} for f in pii_findings
+        ],
+        "content_preview": content_preview,
+    }
+    get_evidence_writer(evidence_bucket).submit(record)
+    return decision_id
@@ -0,0 +1,232 @@
+# dlp_vault.py
+"""
+Deterministic tokenization vault for reversible pseudonymization.
+
+Masked flows swap sensitive values (SSN, MRN, passport, ...) for stable
+tokens on ingress and restore them on egress for authorized roles:
+
+    TOK_SSN_k5v3q2m7x4c6b2na
+
+Tokens are keyed HMAC-SHA256 digests of (entity_type, value), so the same
+value always gets the same token without a lookup. The token -> value
+mapping lives in a local SQLite store with an in-memory LRU in front;
+batch calls (tokenize_many / detokenize_many) hit SQLite once per batch.
+
+The store holds the ORIGINAL values: point DLP_VAULT_PATH at an encrypted
+volume and keep DLP_TOKEN_KEY in Secrets Manager / KMS-encrypted env vars.
+
+Tokens minted by the gateway can only be restored by a process that shares
+its key and its store. With the in-process transport that is the same
+vault; when the orchestrator runs elsewhere (DLP_RAG_TRANSPORT=lambda or
+http) both sides must set DLP_TOKEN_KEY and point DLP_VAULT_PATH at a
+volume they both mount (e.g. EFS), and get_vault(shared=True) refuses to
+fall back to an ephemeral key or an in-memory store. The gateway then
+masks without reversible tokens and the orchestrator leaves tokens as
+they are.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from dlp_redact import DEFAULT_STRATEGIES, Strategy
+
+logger = logging.getLogger(__name__)
+
+# Entity types swapped for reversible tokens when a vault is in play
+TOKENIZED_TYPES = frozenset({"SSN", "MRN", "PASSPORT"})
+
+# Roles allowed to see originals on egress (same privileged role as evaluate_policy)
+DETOKENIZE_ROLES = frozenset({"dlp-admin"})
+
+TOKEN_RE = re.compile(r"\bTOK_(?P<type>[A-Z][A-Z0-9_]*)_(?P<digest>[a-z2-7]{16})\b")
+
+_SQLITE_BATCH = 500  # stay well under SQLite's bound-parameter limit
+
+
+class VaultConfigError(RuntimeError):
+    """The vault can't be shared with the process that has to read it."""
+
+
+class TokenVault:
+    """HMAC token generator + SQLite token store with an LRU front cache."""
+
+    def __init__(
+        self,
+        key: bytes,
+        path: str = ":memory:",
+        cache_size: int = 10_000,
+        types: Iterable[str] = TOKENIZED_TYPES,
+    ):
+        if not key:
+            raise ValueError("TokenVault requires a non-empty key")
+        self._key = key
+        self.types = frozenset(types)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()  # token -> value
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            " token TEXT PRIMARY KEY, entity_type TEXT NOT NULL, value TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    # ------------------------------------------------------------------
+    # Token generation
+    # ------------------------------------------------------------------
+
+    def token_for(self, entity_type: str, value: str) -> str:
+        """Pure function of (key, type, value); no store access."""
+        digest = hmac.new(
+            self._key, f"{entity_type}\x00{value}".encode("utf-8"), hashlib.sha256
+        ).digest()
+        code = base64.b32encode(digest[:10]).decode("ascii").lower()
+        return f"TOK_{entity_type}_{code}"
+
+    def _remember(self, token: str, value: str) -> None:
+        self._cache[token] = value
+        self._cache.move_to_end(token)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Tokenize
+    # ------------------------------------------------------------------
+
+    def tokenize(self, entity_type: str, value: str) -> str:
+        return self.tokenize_many([(entity_type, value)])[0]
+
+    def tokenize_many(self, items: Iterable[Tuple[str, str]]) -> List[str]:
+        """Tokenize a batch; new mappings are written with one executemany."""
+        tokens: List[str] = []
+        new_rows: Dict[str, Tuple[str, str, str]] = {}
+        with self._lock:
+            for entity_type, value in items:
+                token = self.token_for(entity_type, value)
+                tokens.append(token)
+                if token in self._cache:
+                    self._cache.move_to_end(token)
+                    continue
+                new_rows[token] = (token, entity_type, value)
+                self._remember(token, value)
+            if new_rows:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO tokens (token, entity_type, value) VALUES (?, ?, ?)",
+                    list(new_rows.values()),
+                )
+                self._db.commit()
+        return tokens
+
+    # ------------------------------------------------------------------
+    # Detokenize
+    # ------------------------------------------------------------------
+
+    def detokenize(self, token: str) -> Optional[str]:
+        return self.detokenize_many([token])[0]
+
+    def detokenize_many(self, tokens: Sequence[str]) -> List[Optional[str]]:
+        """Resolve a batch of tokens; unknown tokens come back as None."""
+        found: Dict[str, str] = {}
+        with self._lock:
+            missing = []
+            for token in tokens:
+                value = self._cache.get(token)
+                if value is None:
+                    missing.append(token)
+                else:
+                    self._cache.move_to_end(token)
+                    found[token] = value
+
+            unique = list(dict.fromkeys(missing))
+            for i in range(0, len(unique), _SQLITE_BATCH):
+                chunk = unique[i:i + _SQLITE_BATCH]
+                marks = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT token, value FROM tokens WHERE token IN ({marks})", chunk
+                ).fetchall()
+                for token, value in rows:
+                    found[token] = value
+                    self._remember(token, value)
+
+        return [found.get(t) for t in tokens]
+
+    def detokenize_text(self, text: str) -> str:
+        """Restore every known token in `text` (one regex pass, one batch lookup)."""
+        tokens = [m.group(0) for m in TOKEN_RE.finditer(text)]
+        if not tokens:
+            return text
+        values = dict(zip(tokens, self.detokenize_many(tokens)))
+        unresolved = sum(1 for v in values.values() if v is None)
+        if unresolved:
+            logger.warning(
+                "%d vault token(s) could not be resolved; is the vault shared "
+                "with the gateway that minted them?",
+                unresolved,
+            )
+        return TOKEN_RE.sub(lambda m: values.get(m.group(0)) or m.group(0), text)
+
+    def detokenize_for_role(self, text: str, role: str) -> str:
+        """Egress helper: only DETOKENIZE_ROLES get originals back."""
+        if role not in DETOKENIZE_ROLES:
+            return text
+        return self.detokenize_text(text)
+
+    # ------------------------------------------------------------------
+    # dlp_redact integration
+    # ------------------------------------------------------------------
+
+    def strategies(
+        self, base: Optional[Mapping[str, Optional[Strategy]]] = None
+    ) -> Dict[str, Optional[Strategy]]:
+        """Redaction strategies with self.types swapped for vault tokens."""
+        table: Dict[str, Optional[Strategy]] = dict(
+            DEFAULT_STRATEGIES if base is None else base
+        )
+        for entity_type in self.types:
+            table[entity_type] = self.tokenize
+        return table
+
+    def close(self) -> None:
+        self._db.close()
+
+
+_VAULT_LOCK = threading.Lock()
+_VAULT: Optional[TokenVault] = None
+
+
+def get_vault(shared: bool = False) -> TokenVault:
+    """
+    Process-wide vault configured from the environment:
+
+      DLP_TOKEN_KEY   HMAC key (tokens are only stable per process without it)
+      DLP_VAULT_PATH  SQLite file (default: in-memory)
+
+    shared=True (gateway and orchestrator in separate processes) raises
+    VaultConfigError unless both are set, instead of minting tokens the
+    other side can never resolve.
+    """
+    global _VAULT
+    if shared and not (
+        os.environ.get("DLP_TOKEN_KEY")
+        and (os.environ.get("DLP_VAULT_PATH") or ":memory:") != ":memory:"
+    ):
+        raise VaultConfigError(
+            "DLP_TOKEN_KEY and a shared DLP_VAULT_PATH are required when the "
+            "RAG orchestrator runs outside the gateway process"
+        )
+    if _VAULT is None:
+        with _VAULT_LOCK:
+            if _VAULT is None:
+                key = os.environ.get("DLP_TOKEN_KEY", "").encode("utf-8")
+                if not key:
+                    logger.warning("DLP_TOKEN_KEY not set; using an ephemeral vault key.")
+                    key = os.urandom(32)
+                _VAULT = TokenVault(key, os.environ.get("DLP_VAULT_PATH") or ":memory:")
+    return _VAULT
@@ -0,0 +1,259 @@
+# embedding_cache.py
+"""
+Persistent embedding cache shared by the query path and the S3 sync job.
+
+Vectors are keyed by (model, sha256(text)), so a re-sync of an unchanged
+corpus or a repeated query never pays for a second embeddings API call.
+
+On disk (EMBED_CACHE_DIR, default ~/.cache/genai-dlp-gateway/embeddings, or
+the temp directory under Lambda, whose filesystem is read-only elsewhere):
+
+  index.sqlite                 (model, sha256) -> (dim, row)
+  <model>-<dim>.f32            append-only float32 rows, read via mmap
+
+An in-memory LRU sits in front of both. Writers serialize on a SQLite
+IMMEDIATE transaction, so the Streamlit app and a sync run can share one
+directory. Row files use native byte order – the cache is a local
+accelerator, not an interchange format. If the directory can't be
+created or opened, get_embedding_cache() logs a warning and falls back to
+calling the embeddings API uncached.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Vector = List[float]
+EmbedFn = Callable[[List[str]], List[Vector]]
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_dir() -> Path:
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        return Path(tempfile.gettempdir()) / "genai-dlp-gateway" / "embeddings"
+    return Path.home() / ".cache" / "genai-dlp-gateway" / "embeddings"
+
+
+DEFAULT_CACHE_DIR = default_cache_dir()
+
+_SQLITE_BATCH = 500
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class _RowFile:
+    """Append-only float32 rows of one (model, dim), mapped read-only."""
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self.row_bytes = 4 * dim
+        self._mm: Optional[mmap.mmap] = None
+
+    def rows(self) -> int:
+        try:
+            return self.path.stat().st_size // self.row_bytes
+        except FileNotFoundError:
+            return 0
+
+    def append(self, vectors: Sequence[Vector]) -> int:
+        """Append rows; returns the index of the first one. Caller holds the write lock."""
+        first = self.rows()
+        with open(self.path, "ab") as fh:
+            fh.truncate(first * self.row_bytes)  # drop a torn tail from a crashed writer
+            for vec in vectors:
+                fh.write(array("f", vec).tobytes())
+        return first
+
+    def read(self, row: int) -> Vector:
+        end = (row + 1) * self.row_bytes
+        if self._mm is None or len(self._mm) < end:
+            self._remap()
+        out = array("f")
+        out.frombytes(self._mm[row * self.row_bytes:end])
+        return out.tolist()
+
+    def _remap(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        with open(self.path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class EmbeddingCache:
+    def __init__(self, root: Optional[Path] = None, lru_size: int = 4096):
+        self.root = Path(root or os.environ.get("EMBED_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[Tuple[str, str], Vector]" = OrderedDict()
+        self._files: Dict[Tuple[str, int], _RowFile] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            str(self.root / "index.sqlite"), timeout=30, check_same_thread=False,
+            isolation_level=None,  # explicit BEGIN IMMEDIATE below
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, digest TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " row INTEGER NOT NULL, PRIMARY KEY (model, digest))"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def _row_file(self, model: str, dim: int) -> _RowFile:
+        rf = self._files.get((model, dim))
+        if rf is None:
+            safe = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+            rf = self._files[(model, dim)] = _RowFile(self.root / f"{safe}-{dim}.f32", dim)
+        return rf
+
+    def _remember(self, key: Tuple[str, str], vec: Vector) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _index_rows(self, model: str, digests: Sequence[str]) -> Dict[str, Tuple[int, int]]:
+        """digest -> (dim, row) for the digests present in the index."""
+        out: Dict[str, Tuple[int, int]] = {}
+        unique = list(dict.fromkeys(digests))
+        for i in range(0, len(unique), _SQLITE_BATCH):
+            chunk = unique[i:i + _SQLITE_BATCH]
+            marks = ",".join("?" * len(chunk))
+            for d, dim, row in self._db.execute(
+                f"SELECT digest, dim, row FROM embeddings WHERE model = ? AND digest IN ({marks})",
+                [model, *chunk],
+            ):
+                out[d] = (dim, row)
+        return out
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[Vector]]:
+        digests = [text_digest(t) for t in texts]
+        found: Dict[str, Vector] = {}
+        with self._lock:
+            missing = []
+            for d in digests:
+                vec = self._lru.get((model, d))
+                if vec is None:
+                    missing.append(d)
+                else:
+                    self._lru.move_to_end((model, d))
+                    found[d] = vec
+
+            for d, (dim, row) in self._index_rows(model, missing).items():
+                vec = self._row_file(model, dim).read(row)
+                found[d] = vec
+                self._remember((model, d), vec)
+
+        out = [found.get(d) for d in digests]
+        hits = sum(v is not None for v in out)
+        self.hits += hits
+        self.misses += len(out) - hits
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Vector]) -> None:
+        if len(texts) != len(vectors):
+            raise ValueError("texts and vectors must have the same length")
+        by_dim: Dict[int, Dict[str, Vector]] = {}
+        for text, vec in zip(texts, vectors):
+            by_dim.setdefault(len(vec), {})[text_digest(text)] = list(vec)
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")  # cross-process writer lock
+            try:
+                for dim, items in by_dim.items():
+                    known = self._index_rows(model, list(items))
+                    new = [(d, v) for d, v in items.items() if d not in known]
+                    if not new:
+                        continue
+                    first = self._row_file(model, dim).append([v for _d, v in new])
+                    self._db.executemany(
+                        "INSERT INTO embeddings (model, digest, dim, row) VALUES (?, ?, ?, ?)",
+                        [(model, d, dim, first + i) for i, (d, _v) in enumerate(new)],
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            for items in by_dim.values():
+                for d, vec in items.items():
+                    self._remember((model, d), vec)
+
+    def embed(self, model: str, texts: Sequence[str], embed_fn: EmbedFn) -> List[Vector]:
+        """
+        Vectors for `texts`, calling embed_fn (one call, deduplicated) only
+        for texts not cached yet under `model`.
+        """
+        vectors = self.get_many(model, texts)
+        todo = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if todo:
+            fresh = embed_fn(todo)
+            self.put_many(model, todo, fresh)
+            by_text = dict(zip(todo, fresh))
+            vectors = [v if v is not None else list(by_text[t]) for t, v in zip(texts, vectors)]
+        return vectors  # type: ignore[return-value]
+
+    def info(self) -> Dict[str, int]:
+        (rows,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "lru": len(self._lru), "stored": rows}
+
+    def close(self) -> None:
+        with self._lock:
+            for rf in self._files.values():
+                rf.close()
+            self._db.close()
+
+
+class UncachedEmbeddings:
+    """EmbeddingCache.embed without a cache, for when no directory is writable."""
+
+    def embed(self, model: str, texts: Sequence[str], embed_fn: EmbedFn) -> List[Vector]:
+        todo = list(dict.fromkeys(texts))
+        by_text = dict(zip(todo, embed_fn(todo))) if todo else {}
+        return [list(by_text[t]) for t in texts]
+
+    def info(self) -> Dict[str, int]:
+        return {"hits": 0, "misses": 0, "lru": 0, "stored": 0}
+
+    def close(self) -> None:
+        pass
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache rooted at EMBED_CACHE_DIR (uncached if that fails)."""
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                try:
+                    _CACHE = EmbeddingCache(
+                        lru_size=int(os.environ.get("EMBED_CACHE_LRU_SIZE", "4096"))
+                    )
+                except (OSError, sqlite3.Error) as exc:
+                    logger.warning("Embedding cache unavailable (%s); embedding uncached.", exc)
+                    _CACHE = UncachedEmbeddings()  # type: ignore[assignment]
+    return _CACHE
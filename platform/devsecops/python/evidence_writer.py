@@ -0,0 +1,326 @@
+# evidence_writer.py
+"""
+Buffered, non-blocking evidence writer for DLP decision records.
+
+log_decision() used to sit on the request's critical path; now it only puts
+the record on an in-process queue. A background thread batches records into
+gzip-compressed newline-delimited JSON objects and PUTs one S3 object per
+batch, when the batch reaches `max_records` / `max_bytes`, or when the
+oldest buffered record is `max_age_s` old.
+
+Lambda note: the environment is frozen between invocations. Batches keep
+spanning requests; what must not happen is a batch being frozen mid-write
+or sitting in a frozen environment until it is recycled:
+
+  * install_lambda_hooks() (called at init by the handlers) registers an
+    internal Lambda extension, so Lambda sends SIGTERM before shutting the
+    environment down, and the SIGTERM/atexit hook flushes every writer.
+  * At the end of an invocation the handlers call flush_aged_writers(),
+    which waits (at most EVIDENCE_FLUSH_TIMEOUT seconds) only for batches
+    already older than max_age_s – those the writer thread would be
+    putting to S3 right now. Fresh records stay buffered, off the request
+    path.
+
+Objects land under:
+
+  s3://<bucket>/<prefix>/YYYY/MM/DD/<utc-ts>-<uuid>.ndjson.gz
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Sink = Callable[[str, bytes], None]
+
+
+class _Flush:
+    """Queue marker: write whatever is buffered, then set `done`."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class EvidenceWriter:
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "evidence/decisions",
+        max_records: int = 500,
+        max_bytes: int = 1_000_000,
+        max_age_s: float = 5.0,
+        queue_size: int = 10_000,
+        sink: Optional[Sink] = None,
+        retries: int = 3,
+    ):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.retries = retries
+        self._sink = sink or self._s3_sink
+        self._s3 = None
+        # Bounded: if S3 stalls, submit() blocks instead of growing memory
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        # monotonic time of the oldest record buffered or being written
+        self.buffered_since: Optional[float] = None
+        self.objects_written = 0
+        self.records_written = 0
+        self._thread = threading.Thread(
+            target=self._run, name="evidence-writer", daemon=True
+        )
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        """Enqueue one decision record (serialization happens off-thread)."""
+        if self._closed:
+            raise RuntimeError("EvidenceWriter is closed")
+        self._queue.put(record)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything submitted so far is written."""
+        if self._closed:
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def flush_aged(self, timeout: Optional[float] = None) -> bool:
+        """flush() if the buffered batch is already max_age_s old, else return."""
+        since = self.buffered_since
+        if since is None or time.monotonic() - since < self.max_age_s:
+            return True
+        return self.flush(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush and stop the background thread (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # Background thread
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        lines: List[bytes] = []
+        size = 0
+        oldest = 0.0
+
+        while True:
+            wait = None
+            if lines:
+                wait = max(0.0, oldest + self.max_age_s - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None  # batch aged out
+
+            if item is None or item is _STOP or isinstance(item, _Flush):
+                if lines:
+                    self._write_batch(lines)
+                    lines, size = [], 0
+                    self.buffered_since = None
+                if isinstance(item, _Flush):
+                    item.done.set()
+                if item is _STOP:
+                    return
+                continue
+
+            try:
+                line = (json.dumps(item, default=str) + "\n").encode("utf-8")
+            except (TypeError, ValueError):
+                logger.exception("Dropping unserializable evidence record")
+                continue
+            if not lines:
+                oldest = time.monotonic()
+                self.buffered_since = oldest
+            lines.append(line)
+            size += len(line)
+
+            if len(lines) >= self.max_records or size >= self.max_bytes:
+                self._write_batch(lines)
+                lines, size = [], 0
+                self.buffered_since = None
+
+    def _write_batch(self, lines: List[bytes]) -> None:
+        now = datetime.now(timezone.utc)
+        key = (
+            f"{self.prefix}/{now:%Y/%m/%d}/"
+            f"{now:%Y%m%dT%H%M%S%fZ}-{uuid.uuid4().hex}.ndjson.gz"
+        )
+        body = gzip.compress(b"".join(lines))
+
+        for attempt in range(1, self.retries + 1):
+            try:
+                self._sink(key, body)
+                self.objects_written += 1
+                self.records_written += len(lines)
+                return
+            except Exception:
+                logger.exception(
+                    "Evidence batch write failed (attempt %d/%d, %d records)",
+                    attempt,
+                    self.retries,
+                    len(lines),
+                )
+                time.sleep(min(2.0, 0.1 * 2 ** attempt))
+        logger.error("Evidence batch dropped after retries: %s (%d records)", key, len(lines))
+
+    def _s3_sink(self, key: str, body: bytes) -> None:
+        if not self.bucket:
+            # Lab mode: no bucket configured, keep evidence in the logs
+            logger.info(json.dumps({"event": "evidence_batch", "key": key, "bytes": len(body)}))
+            return
+        if self._s3 is None:
+            import boto3
+
+            self._s3 = boto3.client("s3")
+        self._s3.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=body,
+            ContentType="application/x-ndjson",
+            ContentEncoding="gzip",
+        )
+
+
+_WRITERS: Dict[str, EvidenceWriter] = {}
+_WRITERS_LOCK = threading.Lock()
+_HOOKS_INSTALLED = False
+
+
+def get_evidence_writer(bucket: str) -> EvidenceWriter:
+    """Process-wide writer per bucket; installs the shutdown hooks once."""
+    writer = _WRITERS.get(bucket)
+    if writer is None:
+        with _WRITERS_LOCK:
+            writer = _WRITERS.get(bucket)
+            if writer is None:
+                writer = EvidenceWriter(
+                    bucket,
+                    max_age_s=float(os.environ.get("EVIDENCE_FLUSH_SECONDS", "5")),
+                )
+                _WRITERS[bucket] = writer
+                install_shutdown_hooks()
+    return writer
+
+
+def flush_aged_writers(timeout: Optional[float] = None) -> bool:
+    """
+    Finish every writer's batch that is already max_age_s old, waiting at
+    most `timeout` seconds in total (default EVIDENCE_FLUSH_TIMEOUT, 2s).
+    Returns at once when nothing has aged.
+    """
+    if timeout is None:
+        timeout = float(os.environ.get("EVIDENCE_FLUSH_TIMEOUT", "2"))
+    deadline = time.monotonic() + timeout
+    done = True
+    for writer in list(_WRITERS.values()):
+        done = writer.flush_aged(max(0.0, deadline - time.monotonic())) and done
+    if not done:
+        logger.warning("Evidence flush timed out after %.1fs; records still buffered.", timeout)
+    return done
+
+
+def close_all_writers() -> None:
+    for writer in list(_WRITERS.values()):
+        writer.close()
+
+
+def install_shutdown_hooks() -> None:
+    """Flush buffered evidence at interpreter exit and on SIGTERM."""
+    global _HOOKS_INSTALLED
+    if _HOOKS_INSTALLED:
+        return
+    _HOOKS_INSTALLED = True
+    atexit.register(close_all_writers)
+
+    if threading.current_thread() is not threading.main_thread():
+        return  # signal handlers can only be set from the main thread
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def on_sigterm(signum, frame):
+        close_all_writers()
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+
+_EXTENSION_REGISTERED = False
+
+
+def register_lambda_extension() -> bool:
+    """
+    Register an internal Lambda extension (no events) so Lambda sends the
+    runtime SIGTERM before shutting the environment down. Must run during
+    init; False outside Lambda or if registration fails.
+    """
+    global _EXTENSION_REGISTERED
+    api = os.environ.get("AWS_LAMBDA_RUNTIME_API")
+    if _EXTENSION_REGISTERED or not api:
+        return _EXTENSION_REGISTERED
+    import urllib.request
+
+    base = f"http://{api}/2020-01-01/extension"
+    req = urllib.request.Request(
+        f"{base}/register",
+        data=json.dumps({"events": []}).encode("utf-8"),
+        headers={"Lambda-Extension-Name": "evidence-writer"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=2) as resp:  # nosec B310
+            extension_id = resp.headers["Lambda-Extension-Identifier"]
+    except Exception:
+        logger.warning("Lambda extension registration failed; no SIGTERM flush", exc_info=True)
+        return False
+
+    def wait_for_events() -> None:
+        # /event/next signals the extension is ready; with no events it
+        # just blocks until the environment goes away
+        poll = urllib.request.Request(
+            f"{base}/event/next", headers={"Lambda-Extension-Identifier": extension_id}
+        )
+        while True:
+            try:
+                urllib.request.urlopen(poll).read()  # nosec B310
+            except Exception:
+                logger.warning("Lambda extension event poll failed", exc_info=True)
+                return
+
+    threading.Thread(target=wait_for_events, name="evidence-extension", daemon=True).start()
+    _EXTENSION_REGISTERED = True
+    return True
+
+
+def install_lambda_hooks() -> None:
+    """At Lambda init: SIGTERM/atexit flushing, and the extension that enables SIGTERM."""
+    if os.environ.get("AWS_LAMBDA_RUNTIME_API"):
+        install_shutdown_hooks()
+        register_lambda_extension()
+
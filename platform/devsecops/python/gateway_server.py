@@ -0,0 +1,310 @@
+# gateway_server.py
+"""
+Async HTTP front end for the DLP pipeline – a plain ASGI app, no framework.
+
+  GET  /healthz
+  POST /classify   {"text": "..."}                    -> classify_text(text)
+  POST /evaluate   {"prompt": "..."}                  -> check_data_movement(prompt)
+                   {"from": .., "to": .., "state": {..}} -> single-hop decision
+  POST /gateway    {"prompt": "...", "role": "..."}   -> screen, mask, RAG answer
+
+The event loop only parses requests and awaits. Regex scanning goes to a
+worker pool – a process pool for bodies of DLP_PROCESS_SCAN_CHARS or more
+(the GIL would serialize them on threads), a thread pool for short ones
+where pickling would cost more than the scan. Policy evaluation, evidence
+logging, masking and the RAG call (retrieval + LLM, via rag_transport) run
+on a bounded I/O thread pool, so one node keeps thousands of prompts in
+flight while only DLP_IO_THREADS of them block on the orchestrator.
+
+Repeated prompts are served from a ResultCache (DLP_RESULT_CACHE_SIZE /
+DLP_RESULT_CACHE_TTL) keyed by an HMAC of the content, and concurrent
+identical requests share one scan. Policy decisions and evidence records
+are still produced per request.
+
+Runs locally with no AWS dependency: RAG is in-process unless
+DLP_RAG_TRANSPORT says otherwise, and evidence goes to the log when no
+bucket is configured.
+
+  pip install uvicorn
+  python gateway_server.py                  # GATEWAY_HOST / GATEWAY_PORT
+  uvicorn gateway_server:app --port 8080
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from dlp_handler import screen_prompt
+from dlp_utils import PolicyLoadError, check_data_movement, classify_text, load_flow_policy
+from rag_transport import (
+    RagTransport,
+    RagTransportError,
+    transport_from_env,
+    transport_mode_from_env,
+)
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+Result = Tuple[int, Dict[str, Any]]
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class _Disconnected(Exception):
+    """The client went away before sending the whole body."""
+
+
+class GatewayApp:
+    """ASGI application; one instance per process (see `app` below)."""
+
+    def __init__(
+        self,
+        transport: Optional[RagTransport] = None,
+        scan_workers: Optional[int] = None,
+        io_threads: Optional[int] = None,
+        process_scan_chars: Optional[int] = None,
+        max_body_bytes: int = 1_048_576,
+        cache: Optional[ResultCache] = None,
+    ):
+        self._transport = transport
+        self.cache = cache or ResultCache.from_env("DLP_RESULT_CACHE")
+        self.scan_workers = (
+            int(os.environ.get("DLP_SCAN_WORKERS", os.cpu_count() or 1))
+            if scan_workers is None
+            else scan_workers
+        )
+        self.io_threads = (
+            int(os.environ.get("DLP_IO_THREADS", "256")) if io_threads is None else io_threads
+        )
+        self.process_scan_chars = (
+            int(os.environ.get("DLP_PROCESS_SCAN_CHARS", "4096"))
+            if process_scan_chars is None
+            else process_scan_chars
+        )
+        self.max_body_bytes = max_body_bytes
+        self._cpu_pool: Optional[Executor] = None
+        self._io_pool: Optional[Executor] = None
+        self._routes: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Awaitable[Result]]] = {
+            ("POST", "/classify"): self.classify,
+            ("POST", "/evaluate"): self.evaluate,
+            ("POST", "/gateway"): self.gateway,
+        }
+
+    # ------------------------------------------------------------------
+    # Resources
+    # ------------------------------------------------------------------
+
+    @property
+    def transport(self) -> RagTransport:
+        if self._transport is None:
+            self._transport = transport_from_env(default="inprocess")
+        return self._transport
+
+    @property
+    def io_pool(self) -> Executor:
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(
+                max_workers=self.io_threads, thread_name_prefix="gateway-io"
+            )
+        return self._io_pool
+
+    @property
+    def cpu_pool(self) -> Optional[Executor]:
+        if self._cpu_pool is None and self.scan_workers > 1:
+            # spawn, not fork: the parent already runs I/O and evidence threads
+            self._cpu_pool = ProcessPoolExecutor(
+                max_workers=self.scan_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._cpu_pool
+
+    def close(self) -> None:
+        for pool in (self._cpu_pool, self._io_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        self._cpu_pool = self._io_pool = None
+
+    async def _run_io(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.io_pool, fn, *args)
+
+    async def _run_cpu(self, text: str, fn: Callable[..., Any], *args: Any) -> Any:
+        pool = self.cpu_pool if len(text) >= self.process_scan_chars else None
+        return await asyncio.get_running_loop().run_in_executor(
+            pool or self.io_pool, fn, *args
+        )
+
+    async def _classify(self, text: str) -> Dict[str, Any]:
+        key = self.cache.key_for("classify", text)
+        return await self.cache.get_or_compute_async(
+            key, lambda: self._run_cpu(text, classify_text, text)
+        )
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    async def classify(self, body: Dict[str, Any]) -> Result:
+        text = _require_str(body, "text")
+        return 200, await self._classify(text)
+
+    async def evaluate(self, body: Dict[str, Any]) -> Result:
+        if "prompt" in body:
+            prompt = _require_str(body, "prompt")
+            # Hop verdicts depend on flows.json too: a new policy version is a new key
+            try:
+                version = load_flow_policy().version
+            except PolicyLoadError:
+                # Not cached: every hop is denied with the load error as reason
+                return 200, await self._run_cpu(prompt, check_data_movement, prompt)
+            key = self.cache.key_for("evaluate", version, prompt)
+            return 200, await self.cache.get_or_compute_async(
+                key, lambda: self._run_cpu(prompt, check_data_movement, prompt)
+            )
+
+        src, dst = _require_str(body, "from"), _require_str(body, "to")
+        state = body.get("state")
+        if not isinstance(state, dict):
+            raise HttpError(400, "'state' must be an object")
+        return 200, await self._run_io(check_data_movement, src, dst, state)
+
+    async def gateway(self, body: Dict[str, Any]) -> Result:
+        prompt = _require_str(body, "prompt")
+        role = body.get("role") or "unknown"
+
+        classification = await self._classify(prompt)
+        shared_vault = transport_mode_from_env(default="inprocess") != "inprocess"
+        screened = await self._run_io(screen_prompt, prompt, role, classification, shared_vault)
+        decision_id = screened["decision_id"]
+
+        if screened["decision"] == "block":
+            return 400, {"error": "Prompt blocked by DLP policy.", "decision_id": decision_id}
+
+        try:
+            answer = await self._run_io(self.transport.send, screened["forward_payload"])
+        except RagTransportError as exc:
+            logger.exception("Failed to call RAG orchestrator")
+            return 500, {
+                "error": "Internal error invoking RAG orchestrator.",
+                "details": str(exc),
+                "decision_id": decision_id,
+            }
+        return 200, answer
+
+    # ------------------------------------------------------------------
+    # ASGI plumbing
+    # ------------------------------------------------------------------
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"]
+        try:
+            if (method, path) == ("GET", "/healthz"):
+                status, payload = 200, {"status": "ok"}
+            else:
+                handler = self._routes.get((method, path))
+                if handler is None:
+                    if any(p == path for _m, p in self._routes):
+                        raise HttpError(405, "Method not allowed")
+                    raise HttpError(404, "Not found")
+                status, payload = await handler(await self._read_json(receive))
+        except _Disconnected:
+            return
+        except HttpError as exc:
+            status, payload = exc.status, {"error": exc.message}
+        except Exception:
+            logger.exception("Unhandled error on %s %s", method, path)
+            status, payload = 500, {"error": "Internal server error"}
+
+        await _send_json(send, status, payload)
+
+    async def _read_json(self, receive: Receive) -> Dict[str, Any]:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise _Disconnected()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise HttpError(413, "Request body too large")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        try:
+            body = json.loads(b"".join(chunks) or b"{}")
+        except ValueError:
+            raise HttpError(400, "Request body must be JSON") from None
+        if not isinstance(body, dict):
+            raise HttpError(400, "Request body must be a JSON object")
+        return body
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await asyncio.get_running_loop().run_in_executor(None, self.close)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def _require_str(body: Dict[str, Any], field: str) -> str:
+    value = body.get(field)
+    if not isinstance(value, str) or not value:
+        raise HttpError(400, f"Missing '{field}' in request body")
+    return value
+
+
+async def _send_json(send: Send, status: int, payload: Dict[str, Any]) -> None:
+    data = json.dumps(payload, default=str).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(data)).encode("ascii")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": data})
+
+
+app = GatewayApp()
+
+
+def main() -> None:
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required to serve the gateway: pip install uvicorn")
+
+    uvicorn.run(
+        app,
+        host=os.environ.get("GATEWAY_HOST", "127.0.0.1"),
+        port=int(os.environ.get("GATEWAY_PORT", "8080")),
+        backlog=int(os.environ.get("GATEWAY_BACKLOG", "4096")),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# hybrid_retrieval.py
+"""
+Hybrid lexical + vector retrieval for the RAG query path.
+
+    matches, mode = hybrid_query(
+        prompt, top_k=5, namespace=ns, filter=acl_filter,
+        index=vector_index, embed=embed_fn, lexical=get_lexical_index(),
+    )
+
+RAG_RETRIEVAL_MODE selects the strategy:
+
+  vector   embed the prompt and query the vector index (previous behaviour)
+  hybrid   query both and fuse the two rankings with reciprocal rank fusion
+           (score = sum of 1 / (RAG_RRF_K + rank)); the default
+  lexical  BM25 only, never calls the embedding API
+
+In hybrid mode a prompt that is nothing but identifiers (ATLAS "AML.T0051",
+control "AI-03" / "LLM01", policy "dlp05_rag_acl") is answered from the
+BM25 index alone when it has hits, skipping the embedding round trip.
+Without a lexical index (no sync has written one) every mode falls back to
+vector retrieval, and without a vector index (index=None, e.g. no embedding
+API key) to lexical retrieval; in hybrid mode, so does a failing embedding
+call or vector query. The same metadata filter (the retrieval ACL) is
+applied to both sides.
+"""
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from lexical_index import LexicalIndex
+
+logger = logging.getLogger(__name__)
+
+Match = Dict[str, Any]
+EmbedFn = Callable[[str], Sequence[float]]
+
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+RRF_K = int(os.environ.get("RAG_RRF_K", "60"))
+# Candidates taken from each ranking before fusion, per requested result
+FUSION_DEPTH = 4
+
+# Control ids must be upper case, so words like "gpt4" or "mp3" are not ids
+_ID_TOKEN_RE = re.compile(
+    r"""
+    (?i:AML\.[TM])\d{4}(?:\.\d{3})?      # MITRE ATLAS technique / mitigation
+    | [A-Z]{2,8}-?\d{1,4}(?:\.\d{1,3})*   # control ids: AI-03, DLP-05, LLM01, CC6.1
+    | (?i:[A-Z][A-Z0-9]*(?:_[A-Z0-9]+)+(?:\.rego)?)  # policy names: dlp05_rag_acl
+    """,
+    re.VERBOSE,
+)
+_MAX_ID_TOKENS = 4
+
+
+def retrieval_mode_from_env() -> str:
+    mode = os.environ.get("RAG_RETRIEVAL_MODE", "hybrid").strip().lower()
+    if mode not in RETRIEVAL_MODES:
+        raise RuntimeError(f"unknown RAG_RETRIEVAL_MODE: {mode!r}")
+    return mode
+
+
+def is_id_query(prompt: str) -> bool:
+    """True for prompts made only of identifiers, e.g. "AML.T0051" or "AI-03, AI-07"."""
+    tokens = [t.strip(",;:()[]\"'?") for t in prompt.split()]
+    tokens = [t for t in tokens if t]
+    return 0 < len(tokens) <= _MAX_ID_TOKENS and all(_ID_TOKEN_RE.fullmatch(t) for t in tokens)
+
+
+def as_matches(result: Any) -> List[Match]:
+    """[{"id", "score", "metadata"}] from a local-store dict or a Pinecone response."""
+    if isinstance(result, Mapping):
+        raw = result.get("matches") or []
+        return [
+            {"id": m["id"], "score": m["score"], "metadata": m.get("metadata") or {}} for m in raw
+        ]
+    return [
+        {"id": m.id, "score": m.score, "metadata": getattr(m, "metadata", {}) or {}}
+        for m in result.matches
+    ]
+
+
+def rrf_fuse(
+    rankings: Sequence[Sequence[Match]], top_k: int, k: int = RRF_K
+) -> List[Match]:
+    """Reciprocal rank fusion of best-first match lists; score is the fused score."""
+    fused: Dict[str, Match] = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking, start=1):
+            entry = fused.get(match["id"])
+            if entry is None:
+                entry = fused[match["id"]] = {
+                    "id": match["id"],
+                    "score": 0.0,
+                    "metadata": match.get("metadata") or {},
+                }
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda m: -m["score"])[:top_k]
+
+
+def hybrid_query(
+    prompt: str,
+    top_k: int,
+    *,
+    namespace: str,
+    filter: Optional[Mapping[str, Any]],
+    index: Any,
+    embed: EmbedFn,
+    lexical: Optional[LexicalIndex],
+    mode: Optional[str] = None,
+    rrf_k: int = RRF_K,
+) -> Tuple[List[Match], str]:
+    """(matches best first, strategy used: "lexical" | "vector" | "hybrid")."""
+    mode = mode or retrieval_mode_from_env()
+    if lexical is None:
+        mode = "vector"
+
+    def lexical_matches(k: int) -> List[Match]:
+        return as_matches(lexical.query(prompt, top_k=k, namespace=namespace, filter=filter))
+
+    def vector_matches(k: int) -> List[Match]:
+        result = index.query(
+            vector=list(embed(prompt)),
+            top_k=k,
+            namespace=namespace,
+            filter=filter,
+            include_metadata=True,
+        )
+        return as_matches(result)
+
+    if mode == "lexical" or (index is None and lexical is not None):
+        return lexical_matches(top_k), "lexical"
+    if mode == "hybrid" and is_id_query(prompt):
+        hits = lexical_matches(top_k)
+        if hits:
+            return hits, "lexical"
+    if mode == "vector":
+        return (vector_matches(top_k) if index is not None else []), "vector"
+
+    depth = max(FUSION_DEPTH * top_k, 20)
+    try:
+        vector = vector_matches(depth)
+    except Exception as exc:
+        logger.warning("Vector retrieval failed, using BM25 only: %s", exc)
+        return lexical_matches(top_k), "lexical"
+    return rrf_fuse([lexical_matches(depth), vector], top_k, rrf_k), "hybrid"
@@ -0,0 +1,116 @@
+# ingest_gate.py
+"""
+DLP gate for RAG ingestion: classify documents before they are embedded.
+
+Every document is bulk-classified (dlp_utils.classify_texts, one scanner
+pass per text) and tagged with flat, filterable vector metadata:
+
+  dlp_label         "internal" | "confidential" | "restricted_pii" | "phi"
+  dlp_entity_types  ["DOB", "SSN", ...]
+  dlp_entity_count  total detections
+  dlp_redacted      True when the embedded text was redacted
+
+RESTRICTED documents (RESTRICTED_LABELS) are then handled per mode
+(INGEST_RESTRICTED_MODE):
+
+  namespace  embed as-is into a separate namespace (default:
+             "<namespace>-restricted") that the default query path never
+             reads
+  redact     replace detected values (dlp_redact) and embed the redacted
+             text into the regular namespace
+  drop       don't embed at all
+
+Documents that will be embedded are then split with chunk_gated_doc(): each
+chunk keeps the label and routing, and carries its own text in metadata
+["text"] – the field rag_handler and the BM25 path build context from.
+
+gate_documents() and chunk_gated_doc() are plain module-level functions so
+the sync pipeline can run them in its process pool.
+"""
+import os
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dlp_redact import redact
+from dlp_utils import classify_texts
+from rag_chunker import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_chunks
+
+RESTRICTED_LABELS = frozenset({"phi", "restricted_pii"})
+
+MODES = ("namespace", "redact", "drop")
+
+Doc = Tuple[str, str, Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class GateConfig:
+    namespace: str
+    mode: str = "namespace"
+    restricted_namespace: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.mode not in MODES:
+            raise ValueError(f"unknown ingest mode {self.mode!r}; expected one of {MODES}")
+
+    @property
+    def quarantine_namespace(self) -> str:
+        return self.restricted_namespace or f"{self.namespace}-restricted"
+
+    @classmethod
+    def from_env(cls, namespace: str) -> "GateConfig":
+        return cls(
+            namespace=namespace,
+            mode=os.environ.get("INGEST_RESTRICTED_MODE", "namespace").strip().lower(),
+            restricted_namespace=os.environ.get("INGEST_RESTRICTED_NAMESPACE") or None,
+        )
+
+
+@dataclass(frozen=True)
+class GatedDoc:
+    doc_id: str
+    text: str
+    metadata: Dict[str, Any]
+    # None: dropped, don't embed
+    namespace: Optional[str]
+    label: str
+    entity_counts: Dict[str, int]
+
+
+def gate_documents(docs: Sequence[Doc], config: GateConfig) -> List[GatedDoc]:
+    """Classify, tag and route a batch of (doc_id, text, metadata)."""
+    result = classify_texts([text for _id, text, _meta in docs])
+    out: List[GatedDoc] = []
+    for (doc_id, text, metadata), label, counts, spans in zip(
+        docs, result["labels"], result["entity_counts"], result["spans"]
+    ):
+        metadata = dict(metadata)
+        metadata["dlp_label"] = label
+        metadata["dlp_entity_types"] = sorted(counts)
+        metadata["dlp_entity_count"] = sum(counts.values())
+        metadata["dlp_redacted"] = False
+        namespace: Optional[str] = config.namespace
+
+        if label in RESTRICTED_LABELS:
+            if config.mode == "namespace":
+                namespace = config.quarantine_namespace
+            elif config.mode == "redact":
+                redacted = redact(text, spans)
+                text = redacted.text
+                metadata["dlp_redacted"] = redacted.applied
+            else:
+                namespace = None
+
+        out.append(GatedDoc(doc_id, text, metadata, namespace, label, counts))
+    return out
+
+
+def chunk_gated_doc(
+    gated: GatedDoc,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> List[GatedDoc]:
+    """Split a gated doc into chunk docs that keep its label and routing."""
+    return [
+        replace(gated, doc_id=c.chunk_id, text=c.text, metadata={**c.metadata, "text": c.text})
+        for c in iter_chunks(gated.doc_id, gated.text, gated.metadata, max_tokens, overlap_tokens)
+    ]
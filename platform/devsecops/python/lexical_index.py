@@ -0,0 +1,316 @@
+# lexical_index.py
+"""
+BM25 inverted index over the RAG corpus, built by the S3 sync alongside
+the vector upserts (same chunk ids, namespaces and metadata).
+
+    index = LexicalIndex.load(LEXICAL_INDEX_PATH)
+    index.upsert([("doc-7#0", "AML.T0051 LLM prompt injection ...", {...})], namespace="default")
+    index.query("AML.T0051", top_k=5, namespace="default", filter=acl_filter)
+    # -> {"namespace": "default", "matches": [{"id", "score", "metadata"}, ...]}
+
+query() returns the same shape as LocalVectorStore.query and takes the
+same metadata filters (indexed fields through metadata_index bitmaps), so
+the hybrid retriever (hybrid_retrieval.py) treats both alike.
+
+Tokens are lower-cased alphanumeric runs; identifiers joined by . _ - /
+(ATLAS "AML.T0051", control "AI-03", policy "dlp05_rag_acl") are indexed
+whole and by their parts. A query for a whole identifier matches it
+exactly (so "AML.T0051" doesn't pull in every "AML.*" chunk); its parts
+are only searched when the identifier itself isn't indexed.
+
+Each namespace keeps term -> {row: term frequency} postings plus per-row
+lengths; a query scores only the rows in its terms' postings. Postings are
+turned into numpy arrays on first use after a change.
+
+Persisted as one JSON file (RAG_LEXICAL_INDEX, default
+.rag_lexical_index.json next to this module) holding per-row term
+frequencies, so loading does not re-tokenize the corpus.
+"""
+import json
+import math
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from metadata_index import DEFAULT_INDEXED_FIELDS, BitmapIndex, compile_filter
+
+Metadata = Dict[str, Any]
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+
+LEXICAL_INDEX_PATH = Path(
+    os.environ.get("RAG_LEXICAL_INDEX")
+    or Path(__file__).resolve().parent / ".rag_lexical_index.json"
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+_PART_RE = re.compile(r"[._\-/]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; compound identifiers also yield their parts."""
+    terms: List[str] = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(_PART_RE.split(token))
+    return terms
+
+
+def _query_terms(text: str, postings: Mapping[str, Any]) -> List[str]:
+    terms: List[str] = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token.isalnum() or token in postings:
+            terms.append(token)
+        else:
+            terms.extend(_PART_RE.split(token))
+    return list(dict.fromkeys(terms))
+
+
+class _Namespace:
+    """Rows are reused after deletes; row_of maps live ids to rows."""
+
+    def __init__(self, indexed_fields: Sequence[str]):
+        self.ids: List[Optional[str]] = []
+        self.metadata: List[Metadata] = []
+        self.term_freqs: List[Dict[str, int]] = []
+        self.lengths = np.zeros(16, dtype=np.float32)
+        self.row_of: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.total_length = 0
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.bitmaps = BitmapIndex(indexed_fields)
+
+    def put(self, doc_id: str, term_freqs: Dict[str, int], metadata: Metadata) -> None:
+        self.remove(doc_id)
+        if self.free:
+            row = self.free.pop()
+            self.ids[row] = doc_id
+            self.metadata[row] = metadata
+            self.term_freqs[row] = term_freqs
+        else:
+            row = len(self.ids)
+            self.ids.append(doc_id)
+            self.metadata.append(metadata)
+            self.term_freqs.append(term_freqs)
+            if row == self.lengths.shape[0]:
+                self.lengths = np.concatenate([self.lengths, np.zeros_like(self.lengths)])
+        length = sum(term_freqs.values())
+        self.lengths[row] = length
+        self.total_length += length
+        self.row_of[doc_id] = row
+        self.bitmaps.add(row, metadata)
+        for term, tf in term_freqs.items():
+            self.postings.setdefault(term, {})[row] = tf
+            self._arrays.pop(term, None)
+
+    def remove(self, doc_id: str) -> None:
+        row = self.row_of.pop(doc_id, None)
+        if row is None:
+            return
+        for term in self.term_freqs[row]:
+            posting = self.postings[term]
+            del posting[row]
+            if not posting:
+                del self.postings[term]
+            self._arrays.pop(term, None)
+        self.bitmaps.discard(row, self.metadata[row])
+        self.total_length -= int(self.lengths[row])
+        self.lengths[row] = 0
+        self.ids[row] = None
+        self.metadata[row] = {}
+        self.term_freqs[row] = {}
+        self.free.append(row)
+
+    def arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(rows, term frequencies) of a term's postings."""
+        cached = self._arrays.get(term)
+        if cached is None:
+            posting = self.postings.get(term)
+            if not posting:
+                return None
+            rows = np.fromiter(posting.keys(), dtype=np.intp, count=len(posting))
+            tfs = np.fromiter(posting.values(), dtype=np.float32, count=len(posting))
+            cached = self._arrays[term] = (rows, tfs)
+        return cached
+
+
+class LexicalIndex:
+    """BM25 over tokenized chunks, one inverted index per namespace."""
+
+    def __init__(
+        self,
+        indexed_fields: Sequence[str] = DEFAULT_INDEXED_FIELDS,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+    ):
+        self.indexed_fields = tuple(indexed_fields)
+        self.k1 = k1
+        self.b = b
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            ns = self._namespaces[namespace] = _Namespace(self.indexed_fields)
+        return ns
+
+    def upsert(
+        self, docs: Iterable[Tuple[str, str, Metadata]], namespace: str = ""
+    ) -> Dict[str, int]:
+        """Insert or replace (id, text, metadata) documents."""
+        prepared = []
+        for doc_id, text, metadata in docs:
+            term_freqs: Dict[str, int] = {}
+            for term in tokenize(text):
+                term_freqs[term] = term_freqs.get(term, 0) + 1
+            prepared.append((str(doc_id), term_freqs, dict(metadata or {})))
+        with self._lock:
+            ns = self._namespace(namespace)
+            for doc_id, term_freqs, metadata in prepared:
+                ns.put(doc_id, term_freqs, metadata)
+        return {"upserted_count": len(prepared)}
+
+    def delete(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        namespace: str = "",
+        delete_all: bool = False,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+            elif namespace in self._namespaces:
+                ns = self._namespaces[namespace]
+                for doc_id in ids or ():
+                    ns.remove(doc_id)
+        return {}
+
+    def query(
+        self,
+        text: str,
+        top_k: int = 5,
+        namespace: str = "",
+        filter: Optional[Mapping[str, Any]] = None,
+        include_metadata: bool = True,
+    ) -> Dict[str, Any]:
+        compile_filter(filter)  # reject bad filters even on an empty namespace
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or not ns.row_of or top_k <= 0:
+                return {"namespace": namespace, "matches": []}
+            terms = _query_terms(text, ns.postings)
+
+            n_docs = len(ns.row_of)
+            avg_length = ns.total_length / n_docs or 1.0
+            scores = np.zeros(len(ns.ids), dtype=np.float32)
+            hit = np.zeros(len(ns.ids), dtype=bool)
+            for term in terms:
+                postings = ns.arrays(term)
+                if postings is None:
+                    continue
+                rows, tfs = postings
+                idf = math.log(1.0 + (n_docs - rows.shape[0] + 0.5) / (rows.shape[0] + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * ns.lengths[rows] / avg_length)
+                scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+                hit[rows] = True
+
+            mask, residual = ns.bitmaps.resolve(filter, len(ns.ids))
+            if mask is not None:
+                hit &= mask
+            candidates = np.flatnonzero(hit)
+            if residual is not None:
+                keep = [residual(ns.metadata[row]) for row in candidates]
+                candidates = candidates[np.asarray(keep, dtype=bool)]
+            if candidates.size == 0:
+                return {"namespace": namespace, "matches": []}
+
+            k = min(top_k, candidates.shape[0])
+            cand_scores = scores[candidates]
+            top = np.argpartition(-cand_scores, k - 1)[:k]
+            top = top[np.argsort(-cand_scores[top], kind="stable")]
+
+            matches = []
+            for pos in top:
+                row = candidates[pos]
+                match: Dict[str, Any] = {"id": ns.ids[row], "score": float(cand_scores[pos])}
+                if include_metadata:
+                    match["metadata"] = dict(ns.metadata[row])
+                matches.append(match)
+        return {"namespace": namespace, "matches": matches}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {
+                name: {"vector_count": len(ns.row_of), "term_count": len(ns.postings)}
+                for name, ns in self._namespaces.items()
+            }
+        return {
+            "namespaces": namespaces,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values()),
+        }
+
+    # ---- persistence ---------------------------------------------------------
+
+    def save(self, path: Union[str, Path] = LEXICAL_INDEX_PATH) -> None:
+        path = Path(path)
+        with self._lock:
+            data = {
+                "k1": self.k1,
+                "b": self.b,
+                "indexed_fields": list(self.indexed_fields),
+                "namespaces": {
+                    name: [
+                        {
+                            "id": ns.ids[row],
+                            "metadata": ns.metadata[row],
+                            "terms": ns.term_freqs[row],
+                        }
+                        for row in sorted(ns.row_of.values())
+                    ]
+                    for name, ns in self._namespaces.items()
+                },
+            }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(data, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path] = LEXICAL_INDEX_PATH) -> "LexicalIndex":
+        """The index saved at `path`, or an empty one if there is none."""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        index = cls(
+            data.get("indexed_fields", DEFAULT_INDEXED_FIELDS),
+            data.get("k1", DEFAULT_K1),
+            data.get("b", DEFAULT_B),
+        )
+        for name, docs in (data.get("namespaces") or {}).items():
+            ns = index._namespace(name)
+            for doc in docs:
+                ns.put(doc["id"], doc["terms"], doc["metadata"])
+        return index
+
+
+_INDEX_LOCK = threading.Lock()
+_INDEX: Optional[LexicalIndex] = None
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """Process-wide index loaded from RAG_LEXICAL_INDEX, or None if no sync wrote one."""
+    global _INDEX
+    if _INDEX is None and LEXICAL_INDEX_PATH.exists():
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = LexicalIndex.load(LEXICAL_INDEX_PATH)
+    return _INDEX
@@ -0,0 +1,240 @@
+# metadata_index.py
+"""
+Metadata filtering for the local vector indexes.
+
+compile_filter() turns a Pinecone-style filter ($eq, $ne, $gt, $gte, $lt,
+$lte, $in, $nin, $exists, $and, $or; list-valued fields match if any
+element does) into a predicate over one metadata dict.
+
+BitmapIndex keeps an inverted bitmap per (field, value) of a few
+low-cardinality fields (DLP label, record type, source), one bit per row.
+BitmapIndex.resolve() answers the indexed part of a filter with bitwise
+and/or/not over those bitmaps, so the index scores only rows that pass
+(restricted chunks are never scored for a caller not cleared for them),
+and hands back whatever it could not answer (range operators, unindexed
+fields) as a residual predicate to run on the surviving rows only.
+
+High-cardinality fields (ids, S3 keys) don't belong in the indexed fields: a
+bitmap costs rows/8 bytes per distinct value.
+"""
+from collections.abc import Hashable
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+Predicate = Callable[[Mapping[str, Any]], bool]
+
+DEFAULT_INDEXED_FIELDS = ("dlp_label", "dlp_entity_types", "record_type", "source")
+
+_MISSING = object()
+
+
+def _values(field_value: Any) -> List[Any]:
+    return list(field_value) if isinstance(field_value, (list, tuple, set)) else [field_value]
+
+
+def _field_predicate(field: str, condition: Any) -> Predicate:
+    if not isinstance(condition, Mapping):
+        condition = {"$eq": condition}
+
+    checks: List[Predicate] = []
+    for op, arg in condition.items():
+        if op == "$eq":
+            checks.append(lambda m, a=arg: a in _values(m.get(field, _MISSING)))
+        elif op == "$ne":
+            checks.append(lambda m, a=arg: a not in _values(m.get(field, _MISSING)))
+        elif op == "$in":
+            checks.append(lambda m, a=arg: any(v in a for v in _values(m.get(field, _MISSING))))
+        elif op == "$nin":
+            checks.append(lambda m, a=arg: not any(v in a for v in _values(m.get(field, _MISSING))))
+        elif op == "$exists":
+            checks.append(lambda m, a=arg: (field in m) == bool(a))
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            checks.append(_range_check(field, op, arg))
+        else:
+            raise ValueError(f"unsupported filter operator {op!r} on field {field!r}")
+    return lambda m: all(check(m) for check in checks)
+
+
+def _range_check(field: str, op: str, arg: Any) -> Predicate:
+    compare = {
+        "$gt": lambda v: v > arg,
+        "$gte": lambda v: v >= arg,
+        "$lt": lambda v: v < arg,
+        "$lte": lambda v: v <= arg,
+    }[op]
+
+    def check(m: Mapping[str, Any]) -> bool:
+        value = m.get(field)
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and compare(value)
+
+    return check
+
+
+def compile_filter(flt: Optional[Mapping[str, Any]]) -> Optional[Predicate]:
+    """Turn a Pinecone-style metadata filter into a predicate over metadata dicts."""
+    if not flt:
+        return None
+    parts: List[Predicate] = []
+    for key, value in flt.items():
+        if key in ("$and", "$or"):
+            subs = [compile_filter(f) or (lambda m: True) for f in value]
+            combine = all if key == "$and" else any
+            parts.append(lambda m, subs=subs, combine=combine: combine(s(m) for s in subs))
+        elif key.startswith("$"):
+            raise ValueError(f"unsupported top-level filter operator {key!r}")
+        else:
+            parts.append(_field_predicate(key, value))
+    return lambda m: all(p(m) for p in parts)
+
+
+class _Unindexed(Exception):
+    """This part of the filter can't be answered from the bitmaps."""
+
+
+class BitmapIndex:
+    """Packed (field, value) -> row bitmaps over `fields`."""
+
+    def __init__(self, fields: Sequence[str] = DEFAULT_INDEXED_FIELDS):
+        self.fields = frozenset(fields)
+        self._nbytes = 8
+        self._bits: Dict[Tuple[str, Hashable], np.ndarray] = {}
+        self._present: Dict[str, np.ndarray] = {}
+
+    def _grow(self, row: int) -> None:
+        if row < 8 * self._nbytes:
+            return
+        nbytes = max(2 * self._nbytes, row // 8 + 1)
+        pad = np.zeros(nbytes - self._nbytes, dtype=np.uint8)
+        for table in (self._bits, self._present):
+            for key, bits in table.items():
+                table[key] = np.concatenate([bits, pad])
+        self._nbytes = nbytes
+
+    def _bitmap(self, table: Dict, key: Any) -> np.ndarray:
+        bits = table.get(key)
+        if bits is None:
+            bits = table[key] = np.zeros(self._nbytes, dtype=np.uint8)
+        return bits
+
+    def _indexed_values(self, metadata: Mapping[str, Any]):
+        for field in self.fields:
+            value = metadata.get(field, _MISSING)
+            if value is _MISSING:
+                continue
+            values = [v for v in _values(value) if isinstance(v, Hashable)]
+            yield field, values
+
+    def add(self, row: int, metadata: Mapping[str, Any]) -> None:
+        self._grow(row)
+        byte, bit = row >> 3, np.uint8(0x80 >> (row & 7))
+        for field, values in self._indexed_values(metadata):
+            self._bitmap(self._present, field)[byte] |= bit
+            for value in values:
+                self._bitmap(self._bits, (field, value))[byte] |= bit
+
+    def discard(self, row: int, metadata: Mapping[str, Any]) -> None:
+        if row >= 8 * self._nbytes:
+            return
+        byte, bit = row >> 3, np.uint8(~(0x80 >> (row & 7)) & 0xFF)
+        for field, values in self._indexed_values(metadata):
+            self._present[field][byte] &= bit
+            for value in values:
+                self._bits[(field, value)][byte] &= bit
+
+    def rebuild(self, metadata: Sequence[Mapping[str, Any]]) -> None:
+        self._bits.clear()
+        self._present.clear()
+        self._nbytes = max(8, (len(metadata) + 7) // 8)
+        for row, meta in enumerate(metadata):
+            self.add(row, meta)
+
+    # ---- filter evaluation -------------------------------------------------
+
+    def _all(self, size: int) -> np.ndarray:
+        bits = np.zeros(self._nbytes, dtype=np.uint8)
+        packed = np.packbits(np.ones(size, dtype=bool))
+        bits[: packed.shape[0]] = packed
+        return bits
+
+    def _lookup(self, field: str, value: Any) -> np.ndarray:
+        if not isinstance(value, Hashable):
+            raise _Unindexed()
+        bits = self._bits.get((field, value))
+        return bits if bits is not None else np.zeros(self._nbytes, dtype=np.uint8)
+
+    def _any_of(self, field: str, values: Any) -> np.ndarray:
+        out = np.zeros(self._nbytes, dtype=np.uint8)
+        for value in values:
+            out |= self._lookup(field, value)
+        return out
+
+    def _field(self, field: str, condition: Any, size: int) -> np.ndarray:
+        if field not in self.fields:
+            raise _Unindexed()
+        if not isinstance(condition, Mapping):
+            condition = {"$eq": condition}
+        out = self._all(size)
+        for op, arg in condition.items():
+            if op == "$eq":
+                out &= self._lookup(field, arg)
+            elif op == "$in":
+                out &= self._any_of(field, arg)
+            elif op == "$ne":
+                out &= ~self._lookup(field, arg)
+            elif op == "$nin":
+                out &= ~self._any_of(field, arg)
+            elif op == "$exists":
+                present = self._present.get(field, np.zeros(self._nbytes, dtype=np.uint8))
+                out &= present if arg else ~present
+            else:
+                raise _Unindexed()
+        return out
+
+    def _eval(self, flt: Mapping[str, Any], size: int) -> np.ndarray:
+        out = self._all(size)
+        for key, value in flt.items():
+            if key == "$and":
+                for sub in value:
+                    out &= self._eval(sub, size)
+            elif key == "$or":
+                any_bits = np.zeros(self._nbytes, dtype=np.uint8)
+                for sub in value:
+                    any_bits |= self._eval(sub, size)
+                out &= any_bits
+            else:
+                out &= self._field(key, value, size)
+        return out
+
+    def resolve(
+        self, flt: Optional[Mapping[str, Any]], size: int
+    ) -> Tuple[Optional[np.ndarray], Optional[Predicate]]:
+        """
+        (bool mask over rows [0, size) or None for "all rows", residual
+        predicate or None) for a filter; raises ValueError for bad filters.
+        """
+        if not flt:
+            return None, None
+        # flatten top-level $and so each clause is indexed or not on its own
+        clauses: List[Tuple[str, Any]] = []
+        pending = list(flt.items())
+        while pending:
+            key, value = pending.pop(0)
+            if key == "$and":
+                pending.extend(item for sub in value for item in sub.items())
+            else:
+                clauses.append((key, value))
+
+        bits: Optional[np.ndarray] = None
+        residual: Dict[str, Any] = {"$and": []}
+        for key, value in clauses:
+            try:
+                clause = self._eval({key: value}, size)
+            except _Unindexed:
+                residual["$and"].append({key: value})
+                continue
+            bits = clause if bits is None else bits & clause
+
+        predicate = compile_filter(residual) if residual["$and"] else None
+        mask = None if bits is None else np.unpackbits(bits, count=size).astype(bool)
+        return mask, predicate
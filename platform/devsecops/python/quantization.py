@@ -0,0 +1,154 @@
+# quantization.py
+"""
+Vector quantizers for the local ANN index (ann_index.py).
+
+  int8  ScalarQuantizer: one byte per dimension (4x smaller than float32),
+        per-dimension min/step trained on the corpus
+  pq    ProductQuantizer: the vector is cut into `m` sub-vectors, each
+        replaced by the id of its nearest of 256 sub-centroids, so a vector
+        costs m bytes (1536-dim, default m=192: 32x smaller)
+
+Both score codes against a float query without decoding them: the int8
+inner product is one (codes @ weights) product, PQ uses a per-query
+(m x 256) lookup table (asymmetric distance computation). Scores are
+approximate inner products; the index re-ranks its best candidates with
+the float vectors when asked to.
+"""
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+Scorer = Callable[[np.ndarray], np.ndarray]
+
+_ENCODE_BLOCK = 65536
+
+
+class ScalarQuantizer:
+    kind = "int8"
+
+    def __init__(self, vmin: Optional[np.ndarray] = None, step: Optional[np.ndarray] = None):
+        self.vmin = vmin
+        self.step = step
+
+    def train(self, x: np.ndarray, seed: int = 0) -> None:
+        x = np.asarray(x, dtype=np.float32)
+        self.vmin = x.min(axis=0)
+        span = x.max(axis=0) - self.vmin
+        self.step = np.where(span > 0, span / 255.0, 1.0).astype(np.float32)
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        out = np.empty(x.shape, dtype=np.uint8)
+        for start in range(0, x.shape[0], _ENCODE_BLOCK):
+            block = np.asarray(x[start:start + _ENCODE_BLOCK], dtype=np.float32)
+            codes = np.rint((block - self.vmin) / self.step)
+            out[start:start + len(block)] = np.clip(codes, 0, 255)
+        return out
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.step + self.vmin
+
+    def scorer(self, q: np.ndarray) -> Scorer:
+        weights = (q * self.step).astype(np.float32)
+        bias = float(q @ self.vmin)
+        return lambda codes: codes.astype(np.float32) @ weights + bias
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"vmin": self.vmin, "step": self.step}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "ScalarQuantizer":
+        return cls(state["vmin"], state["step"])
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain (Euclidean) k-means; x is small (one sub-space of a sample)."""
+    centroids = x[rng.choice(x.shape[0], k, replace=False)].copy()
+    for _ in range(iters):
+        labels = np.argmax(2 * x @ centroids.T - (centroids ** 2).sum(axis=1), axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(x[order], starts[nonempty], axis=0)
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        empty = ~nonempty
+        if empty.any():
+            centroids[empty] = x[rng.choice(x.shape[0], int(empty.sum()), replace=False)]
+    return centroids
+
+
+class ProductQuantizer:
+    kind = "pq"
+
+    def __init__(self, m: int, codebooks: Optional[np.ndarray] = None, ksub: int = 256):
+        if ksub > 256:
+            raise ValueError("ksub must fit in one byte (<= 256)")
+        self.m = m
+        self.ksub = ksub
+        self.codebooks = codebooks  # (m, ksub, dsub)
+
+    def train(self, x: np.ndarray, seed: int = 0, iters: int = 15) -> None:
+        x = np.asarray(x, dtype=np.float32)
+        n, d = x.shape
+        if d % self.m:
+            raise ValueError(f"dimension {d} is not divisible by m={self.m}")
+        ksub = min(self.ksub, n)
+        rng = np.random.default_rng(seed)
+        sample = x[rng.choice(n, min(n, 256 * ksub), replace=False)]
+        subs = sample.reshape(sample.shape[0], self.m, d // self.m)
+        self.ksub = ksub
+        self.codebooks = np.stack(
+            [_kmeans(subs[:, j], ksub, iters, rng) for j in range(self.m)]
+        ).astype(np.float32)
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        out = np.empty((x.shape[0], self.m), dtype=np.uint8)
+        sq_norms = (self.codebooks ** 2).sum(axis=2)  # (m, ksub)
+        dsub = self.codebooks.shape[2]
+        for start in range(0, x.shape[0], _ENCODE_BLOCK):
+            block = np.asarray(x[start:start + _ENCODE_BLOCK], dtype=np.float32)
+            subs = block.reshape(block.shape[0], self.m, dsub)
+            for j in range(self.m):
+                dots = subs[:, j] @ self.codebooks[j].T
+                out[start:start + len(block), j] = np.argmax(2 * dots - sq_norms[j], axis=1)
+        return out
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.m)]
+        return np.concatenate(parts, axis=1)
+
+    def scorer(self, q: np.ndarray) -> Scorer:
+        lut = np.einsum("jkd,jd->jk", self.codebooks, q.reshape(self.m, -1)).astype(np.float32)
+        cols = np.arange(self.m)
+        return lambda codes: lut[cols, codes].sum(axis=1)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "ProductQuantizer":
+        codebooks = state["codebooks"]
+        return cls(codebooks.shape[0], codebooks, ksub=codebooks.shape[1])
+
+
+def default_pq_m(dim: int) -> int:
+    """Largest divisor of dim giving sub-vectors of at least 8 dimensions."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def make_quantizer(kind: Optional[str], dim: int, pq_m: Optional[int] = None):
+    if not kind or kind == "none":
+        return None
+    if kind == "int8":
+        return ScalarQuantizer()
+    if kind == "pq":
+        return ProductQuantizer(pq_m or default_pq_m(dim))
+    raise ValueError(f"unknown quantizer {kind!r}; expected none, int8 or pq")
+
+
+def quantizer_from_state(kind: str, state: Dict[str, np.ndarray]):
+    return {"int8": ScalarQuantizer, "pq": ProductQuantizer}[kind].from_state(state)
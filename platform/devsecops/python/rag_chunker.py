@@ -0,0 +1,202 @@
+# rag_chunker.py
+"""
+Token-budgeted document chunker for RAG ingestion.
+
+    for chunk in iter_chunks("doc-42", text_or_stream, {"source": "s3"}):
+        chunk.chunk_id   # "doc-42#1830"  (doc id + character offset)
+        chunk.text
+        chunk.metadata   # parent metadata + parent_id, chunk_index, offsets
+
+Text is split into whitespace-delimited pieces that are packed into chunks
+of at most `max_tokens` tokens, preferring to cut after a sentence or
+paragraph end near the budget; consecutive chunks share ~`overlap_tokens`
+tokens so a fact on a boundary is retrievable from either side. Runs of
+more than 256 non-whitespace characters are split, so a single piece only
+exceeds a (very small) budget on its own.
+
+iter_chunks() is a generator over a str, a text file object or any
+iterable of str pieces, holding only the current window in memory. Chunk
+ids are the parent id plus the chunk's start offset, so editing the tail
+of a document leaves the ids (and, through the embedding cache, the
+vectors) of the chunks before it unchanged.
+
+Token counts use tiktoken's cl100k_base (the text-embedding-3-* encoding)
+when tiktoken is installed, and a ~4-characters-per-token estimate
+otherwise.
+"""
+import re
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+DEFAULT_MAX_TOKENS = 512
+DEFAULT_OVERLAP_TOKENS = 64
+
+TokenCounter = Callable[[str], int]
+
+_PIECE_RE = re.compile(r"\S+\s*|\s+")
+_APPROX_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?:[.!?]['\")\]]*\s|\n)\s*$")
+
+# Split runs of non-whitespace longer than this (base64 blobs, minified JSON)
+_MAX_PIECE_CHARS = 256
+_READ_CHARS = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Chunk:
+    chunk_id: str
+    text: str
+    start: int  # character offsets in the parent document
+    end: int
+    index: int
+    tokens: int
+    metadata: Dict[str, Any]
+
+
+def approx_token_count(text: str) -> int:
+    return len(_APPROX_TOKEN_RE.findall(text))
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(encoding: str = "cl100k_base") -> TokenCounter:
+    """tiktoken counter when available (and its BPE file loads), else the estimate."""
+    try:
+        import tiktoken
+
+        enc = tiktoken.get_encoding(encoding)
+    except Exception:
+        return approx_token_count
+    return lambda text: len(enc.encode_ordinary(text))
+
+
+def _iter_source(source: Union[str, Iterable[str], Any]) -> Iterator[str]:
+    if isinstance(source, str):
+        yield source
+        return
+    if hasattr(source, "read"):
+        while True:
+            block = source.read(_READ_CHARS)
+            if not block:
+                return
+            yield block
+        return
+    yield from source
+
+
+def _iter_pieces(source: Union[str, Iterable[str], Any]) -> Iterator[Tuple[int, str]]:
+    """(offset, piece) for each whitespace-delimited piece, across input blocks."""
+    carry = ""
+    offset = 0  # document offset of carry[0]
+    for block in _iter_source(source):
+        buf = carry + block
+        pieces = [m.group(0) for m in _PIECE_RE.finditer(buf)]
+        # The last piece may continue in the next block: hold it back
+        carry = pieces.pop() if pieces else ""
+        if len(carry) > _MAX_PIECE_CHARS:
+            # Don't let one huge whitespace-free run grow the carry unbounded
+            head = len(carry) - len(carry) % _MAX_PIECE_CHARS
+            pieces.append(carry[:head])
+            carry = carry[head:]
+        for piece in pieces:
+            yield from _split_long(offset, piece)
+            offset += len(piece)
+    if carry:
+        yield from _split_long(offset, carry)
+
+
+def _split_long(offset: int, piece: str) -> Iterator[Tuple[int, str]]:
+    for i in range(0, len(piece), _MAX_PIECE_CHARS):
+        yield offset + i, piece[i:i + _MAX_PIECE_CHARS]
+
+
+def iter_chunks(
+    doc_id: str,
+    source: Union[str, Iterable[str], Any],
+    metadata: Optional[Dict[str, Any]] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    count_tokens: Optional[TokenCounter] = None,
+) -> Iterator[Chunk]:
+    """Yield Chunks of `source` (see module docstring)."""
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError("overlap_tokens must be in [0, max_tokens)")
+    count = count_tokens or get_token_counter()
+    parent = dict(metadata or {})
+
+    window: Deque[Tuple[int, str, int]] = deque()  # (offset, piece, tokens)
+    total = 0
+    fresh = 0  # pieces not yet part of any emitted chunk
+    index = 0
+
+    def make(n: int) -> Chunk:
+        pieces = [window[i] for i in range(n)]
+        start = pieces[0][0]
+        text = "".join(p[1] for p in pieces)
+        meta = dict(parent)
+        meta.update(
+            {
+                "parent_id": doc_id,
+                "chunk_index": index,
+                "chunk_start": start,
+                "chunk_end": start + len(text),
+            }
+        )
+        return Chunk(
+            chunk_id=f"{doc_id}#{start}",
+            text=text,
+            start=start,
+            end=start + len(text),
+            index=index,
+            tokens=sum(p[2] for p in pieces),
+            metadata=meta,
+        )
+
+    for offset, piece in _iter_pieces(source):
+        n = count(piece)
+        window.append((offset, piece, n))
+        total += n
+        fresh += 1
+
+        while total > max_tokens and len(window) > 1:
+            cut = _cut_point(window, max_tokens)
+            yield make(cut)
+            index += 1
+
+            # Keep the tail of the emitted chunk (up to overlap_tokens) as
+            # the head of the next one; always drop at least one piece
+            keep, kept = cut, 0
+            while keep > 1 and kept + window[keep - 1][2] <= overlap_tokens:
+                keep -= 1
+                kept += window[keep][2]
+            for _ in range(keep):
+                total -= window.popleft()[2]
+            fresh = len(window) - (cut - keep)
+
+    if window and fresh:
+        yield make(len(window))
+
+
+def _cut_point(window: Deque[Tuple[int, str, int]], max_tokens: int) -> int:
+    """
+    Number of leading pieces for the next chunk: as many as fit the budget,
+    pulled back to the last sentence/paragraph end in the final quarter.
+    """
+    fit, total = 0, 0
+    for _offset, _piece, n in window:
+        if fit and total + n > max_tokens:
+            break
+        total += n
+        fit += 1
+
+    floor, running = 0.75 * max_tokens, total
+    for i in range(fit, 0, -1):
+        if running < floor:
+            break
+        if _SENTENCE_END_RE.search(window[i - 1][1]):
+            return i
+        running -= window[i - 1][2]
+    return fit
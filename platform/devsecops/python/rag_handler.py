@@ -1,10 +1,8 @@
 import json
 import logging
 import os
-from typing import Any, Dict, Optional
-
-import boto3
-import pinecone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 from dlp_utils import (
     Decision,
@@ -12,53 +10,148 @@ from dlp_utils import (
     evaluate_policy,
     get_evidence_bucket_from_env,
     log_decision,
+    mask_text,
     safe_preview,
 )
+from dlp_vault import DETOKENIZE_ROLES, TOKEN_RE, VaultConfigError, get_vault
+from evidence_writer import flush_aged_writers, install_lambda_hooks
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 EVIDENCE_BUCKET = get_evidence_bucket_from_env()
+install_lambda_hooks()
 
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
 PINECONE_ENV = os.environ.get("PINECONE_ENVIRONMENT")
 PINECONE_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME")
+PINECONE_NAMESPACE = os.environ.get("PINECONE_NAMESPACE", "")
+# pinecone | local (in-process vector_store, LOCAL_VECTOR_STORE_PATH)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "pinecone").strip().lower()
+OPENAI_EMBED_MODEL = os.environ.get("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "3"))
 MODEL_ID = os.environ.get("MODEL_ID", "stub-model")
+MODEL_ERROR_PREFIX = "[ERROR CALLING MODEL]"
+
+# Clients, caches and the retrieval stack (numpy via the lexical index,
+# the embedding cache, the ACL) are created on first use and cached for the
+# life of the container, so cold starts (and requests that never reach
+# retrieval / the model) don't pay for their imports and setup.
+
+
+@lru_cache(maxsize=None)
+def get_answer_cache() -> Any:
+    """
+    Retrieval + LLM answers for repeated (role, prompt) pairs; concurrent
+    identical calls share one computation. Egress DLP still runs per call.
+    """
+    from result_cache import ResultCache
+
+    return ResultCache.from_env("RAG_ANSWER_CACHE", max_entries=1024)
+
+
+@lru_cache(maxsize=None)
+def get_bedrock_client() -> Any:
+    """Bedrock client (can be stubbed if you don't have Bedrock)."""
+    import boto3
+
+    return boto3.client(
+        "bedrock-runtime",
+        region_name=os.environ.get("AWS_REGION", "us-east-1"),
+    )
 
-# Bedrock client (can be stubbed if you don't have Bedrock)
-bedrock = boto3.client(
-    "bedrock-runtime",
-    region_name=os.environ.get("AWS_REGION", "us-east-1"),
-)
 
-# Initialize Pinecone (lab-friendly; in prod you'd handle errors more strictly)
-if PINECONE_API_KEY and PINECONE_ENV and PINECONE_INDEX_NAME:
+@lru_cache(maxsize=None)
+def get_pinecone_index() -> Optional[Any]:
+    """Pinecone index, or None when not configured (lab-friendly)."""
+    if not (PINECONE_API_KEY and PINECONE_ENV and PINECONE_INDEX_NAME):
+        logger.warning("Pinecone environment variables not fully set; RAG will use empty context.")
+        return None
+
+    import pinecone
+
     pinecone.init(api_key=PINECONE_API_KEY, environment=PINECONE_ENV)
-    pinecone_index = pinecone.Index(PINECONE_INDEX_NAME)
-else:
-    pinecone_index = None
-    logger.warning("Pinecone environment variables not fully set; RAG will use empty context.")
+    return pinecone.Index(PINECONE_INDEX_NAME)
 
 
-def retrieve_context(prompt: str) -> str:
-    """
-    RAG context retrieval: queries Pinecone by a dummy vector in this lab.
+def get_vector_index() -> Optional[Any]:
+    """The index selected by VECTOR_BACKEND (query()-compatible), or None."""
+    if VECTOR_BACKEND == "local":
+        from vector_store import get_vector_store
+
+        return get_vector_store()
+    return get_pinecone_index()
+
+
+@lru_cache(maxsize=None)
+def get_openai_client() -> Optional[Any]:
+    """OpenAI client for query embeddings, or None when not configured."""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        logger.warning("OPENAI_API_KEY not set; RAG will skip vector retrieval.")
+        return None
+
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key)
+
+
+def _embed_api(texts: List[str]) -> List[List[float]]:
+    resp = get_openai_client().embeddings.create(model=OPENAI_EMBED_MODEL, input=texts)
+    return [item.embedding for item in resp.data]
+
 
-    PRODUCTION NOTE:
-      Replace with real embedding generation and vector query.
+def _embed_prompt(prompt: str) -> List[float]:
+    from embedding_cache import get_embedding_cache
+
+    return get_embedding_cache().embed(OPENAI_EMBED_MODEL, [prompt], _embed_api)[0]
+
+
+def retrieve_context(prompt: str, role: str) -> str:
+    """RAG context for `prompt` as `role` may see it; see _retrieve."""
+    return _retrieve(prompt, role)[0]
+
+
+def _retrieve(prompt: str, role: str) -> Tuple[str, bool]:
     """
-    if pinecone_index is None:
-        return ""
+    (context, complete); complete is False when the query failed and the
+    context is empty because of it, not because nothing matched.
+
 
-    dummy_vector = [0.0] * 16  # dimension must match index; for demo only
+    RAG context retrieval, filtered index-side to the chunks `role` may
+    read (retrieval_acl / dlp05_rag_acl.rego). RAG_RETRIEVAL_MODE picks
+    vector, BM25 or fused hybrid retrieval (hybrid_retrieval.py); ID-only
+    prompts such as "AML.T0051" skip the embedding call. Prompts are
+    embedded through the shared embedding cache.
+    """
+    from hybrid_retrieval import hybrid_query
+    from lexical_index import get_lexical_index
+    from retrieval_acl import get_retrieval_acl
+
+    acl_filter = get_retrieval_acl().filter_for(role)
+    if acl_filter is None:
+        logger.info("Role %r may not read any RAG records; empty context.", role)
+        return "", True
+    lexical = get_lexical_index()
+    index = get_vector_index() if get_openai_client() is not None else None
+    if index is None and lexical is None:
+        return "", True
 
     try:
-        results = pinecone_index.query(vector=dummy_vector, top_k=3, include_metadata=True)
+        matches, mode = hybrid_query(
+            prompt,
+            RAG_TOP_K,
+            namespace=PINECONE_NAMESPACE,
+            filter=acl_filter,
+            index=index,
+            embed=_embed_prompt,
+            lexical=lexical,
+        )
     except Exception as exc:
-        logger.warning("Pinecone query failed: %s", exc)
-        return ""
+        logger.warning("RAG query failed: %s", exc)
+        return "", False
+    logger.info("RAG retrieval: %d matches (%s)", len(matches), mode)
 
-    matches = results.get("matches") or []
     snippets = []
 
     for m in matches:
@@ -67,7 +160,7 @@ def retrieve_context(prompt: str) -> str:
         if text:
             snippets.append(text)
 
-    return "\n---\n".join(snippets)
+    return "\n---\n".join(snippets), True
 
 
 def call_llm(prompt: str, context_text: str) -> str:
@@ -84,43 +177,32 @@ def call_llm(prompt: str, context_text: str) -> str:
     }
 
     try:
-        resp = bedrock.invoke_model(modelId=MODEL_ID, body=json.dumps(body))
+        resp = get_bedrock_client().invoke_model(modelId=MODEL_ID, body=json.dumps(body))
         raw = resp["body"].read()
         data = json.loads(raw)
     except Exception as exc:
         logger.exception("Bedrock invocation failed: %s", exc)
-        return f"[ERROR CALLING MODEL]: {exc}"
+        return f"{MODEL_ERROR_PREFIX}: {exc}"
 
     # Adjust based on model output schema; generic fallback here
     return data.get("output_text") or json.dumps(data)
 
-def handle_egress(response_text, user_role="anonymous"):
-    entities = detect_pii(response_text)
-    label = classify_text(entities)
-
-    movement = check_data_movement(
-        "dlp_gateway",
-        "user",
-        {
-            "classification_label": label,
-            "policy_decision": {"action": "allow"},
-            "redaction_applied": True
-        }
-    )
-
-    decision = evaluate_dlp_policy(
-        direction="egress",
-        user_role=user_role,
-        text=response_text,
-        entities=entities,
-        classification_label=label,
-        movement=movement
-    )
 
-    return decision, entities, label
+def _answer(prompt: str, role: str) -> Any:
+    """
+    call_llm on the retrieved context. An answer from a failed retrieval or
+    a failed model call is returned as result_cache.Uncached, so an outage
+    isn't served from the answer cache after it is over.
+    """
+    from result_cache import Uncached
 
+    context_text, complete = _retrieve(prompt, role)
+    answer = call_llm(prompt, context_text)
+    if not complete or answer.startswith(MODEL_ERROR_PREFIX):
+        return Uncached(answer)
+    return answer
 
-def lambda_handler(event, context):
+def _handle(event, context):
     """
     Invoked by DLP Lambda.
 
@@ -128,7 +210,8 @@ def lambda_handler(event, context):
       {
         "prompt": "...",
         "user_role": "...",
-        "original_decision_id": "..."
+        "original_decision_id": "...",
+        "dlp_classification": {"label": "...", "entity_types": [...]}  # optional
       }
     """
     logger.info(json.dumps({"event": "rag_invoke", "payload_preview": str(event)[:300]}))
@@ -139,11 +222,17 @@ def lambda_handler(event, context):
     if not prompt:
         return {"error": "Missing 'prompt' in event payload"}
 
-    # 1) Retrieve context from Pinecone (RAG)
-    context_text = retrieve_context(prompt)
+    # The gateway forwards its classification; it is only echoed back, so a
+    # direct invocation without one reports no ingress label rather than
+    # paying for a second scan of the prompt
+    ingress = event.get("dlp_classification") or {}
 
-    # 2) Call LLM (Bedrock or stub)
-    answer = call_llm(prompt, context_text)
+    # 1) + 2) Retrieve context from Pinecone (RAG), call LLM (Bedrock or stub)
+    answer_cache = get_answer_cache()
+    answer = answer_cache.get_or_compute(
+        answer_cache.key_for("answer", MODEL_ID, role, prompt),
+        lambda: _answer(prompt, role),
+    )
 
     # 3) DLP on response
     pii_findings = detect_pii(answer)
@@ -159,15 +248,44 @@ def lambda_handler(event, context):
         evidence_bucket=EVIDENCE_BUCKET,
     )
 
+    redaction_applied = False
     if decision == "block":
         safe_answer = "Response blocked by DLP policy."
     elif decision == "mask":
-        safe_answer = "[PII REDACTED] " + answer
+        safe_answer, state = mask_text(answer, entities=pii_findings)
+        redaction_applied = state["redaction_applied"]
     else:
         safe_answer = answer
 
+    # Restore vault tokens minted on ingress, for authorized roles only. A
+    # context means the Lambda runtime invoked this function on its own, so
+    # the vault must be the one the gateway shares (see dlp_vault).
+    if decision != "block" and role in DETOKENIZE_ROLES and TOKEN_RE.search(safe_answer):
+        try:
+            vault = get_vault(shared=context is not None)
+        except VaultConfigError as exc:
+            logger.warning("%s; vault tokens left in the answer.", exc)
+        else:
+            safe_answer = vault.detokenize_text(safe_answer)
+
     return {
         "answer": safe_answer,
         "decision_id": decision_id,
         "role": role,
+        "redaction_applied": redaction_applied,
+        "ingress_label": ingress.get("label"),
     }
+
+
+def lambda_handler(event, context):
+    """
+    Entry point for the DLP gateway (see _handle). When the Lambda runtime
+    invoked it (context set) the environment is frozen once this returns,
+    so an evidence batch that is already due is written first (fresh
+    records stay buffered; see evidence_writer).
+    """
+    try:
+        return _handle(event, context)
+    finally:
+        if context is not None:
+            flush_aged_writers()
@@ -0,0 +1,266 @@
+# rag_pipeline.py
+"""
+Bounded, back-pressured stage pipeline for the RAG sync job.
+
+    source -> [fetch] -> [parse/classify] -> [embed] -> [upsert] -> results
+               threads    process pool      threads     threads
+                          (batched)         rate-limited rate-limited
+
+Each Stage gets `workers` threads pulling from a bounded input queue, so a
+slow stage blocks its producers instead of buffering the whole corpus, and
+wall-clock time tends to the slowest stage rather than the sum of every
+network latency. Stages with executor="process" hand their (batched) work
+to a shared spawn-context process pool – the function must be importable
+at module level.
+
+A failing item is logged, counted against its stage and dropped; the rest
+of the run continues and the caller decides what a non-zero error count
+means (the sync job only records manifest rows for items that made it
+through every stage).
+"""
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class RateLimiter:
+    """Token bucket shared by all workers of a stage (calls per second)."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                wait = (n - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+@dataclass
+class Stage:
+    """
+    One pipeline step. With batch_size == 1, fn(item) -> result; with
+    batch_size > 1, fn(items) -> results (same length, same order). A None
+    result drops the item.
+    """
+
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    batch_size: int = 1
+    executor: str = "thread"  # "thread" | "process"
+    rate_limiter: Optional[RateLimiter] = None
+    queue_size: int = 64
+    # how long a worker waits to top up a partial batch
+    batch_wait_s: float = 0.05
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_s: float = 0.0
+    first_at: Optional[float] = None
+    last_at: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def wall_s(self) -> float:
+        if self.first_at is None or self.last_at is None:
+            return 0.0
+        return self.last_at - self.first_at
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of stage wall time."""
+        return self.items_out / self.wall_s if self.wall_s > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "in": self.items_in,
+            "out": self.items_out,
+            "errors": self.errors,
+            "busy_s": round(self.busy_s, 3),
+            "wall_s": round(self.wall_s, 3),
+            "items_per_s": round(self.throughput, 1),
+        }
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], process_workers: Optional[int] = None):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.stats = [StageStats(s.name) for s in stages]
+        self.errors: List[Tuple[str, BaseException]] = []
+        self._process_workers = process_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def run(self, source: Iterable[Any]) -> Iterator[Any]:
+        """Stream `source` through every stage; yields final-stage results."""
+        if any(s.executor == "process" for s in self.stages):
+            # spawn: the parent is already multi-threaded
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        queues = [queue.Queue(maxsize=s.queue_size) for s in self.stages]
+        out_q: "queue.Queue[Any]" = queue.Queue(maxsize=self.stages[-1].queue_size)
+        queues.append(out_q)
+
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for w in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(i, queues[i], queues[i + 1], remaining, lock),
+                        name=f"{stage.name}-{w}",
+                        daemon=True,
+                    )
+                )
+        for t in threads:
+            t.start()
+
+        finished = False
+        try:
+            while True:
+                item = out_q.get()
+                if item is _DONE:
+                    finished = True
+                    break
+                yield item
+        finally:
+            # Consumer stopped early: let the stages run out instead of deadlocking
+            while not finished:
+                finished = out_q.get() is _DONE
+            for t in threads:
+                t.join()
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _feed(self, source: Iterable[Any], q: "queue.Queue[Any]") -> None:
+        try:
+            for item in source:
+                q.put(item)
+        except Exception as exc:
+            logger.exception("Pipeline source failed")
+            self.errors.append(("source", exc))
+        finally:
+            for _ in range(self.stages[0].workers):
+                q.put(_DONE)
+
+    def _next_batch(self, stage: Stage, q: "queue.Queue[Any]") -> Tuple[List[Any], bool]:
+        """Block for one item, then top up to batch_size. Returns (batch, saw_done)."""
+        first = q.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + stage.batch_wait_s
+        while len(batch) < stage.batch_size:
+            try:
+                item = q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _work(self, i, in_q, out_q, remaining, lock) -> None:
+        stage, stats = self.stages[i], self.stats[i]
+        next_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+        done = False
+        while not done:
+            batch, done = self._next_batch(stage, in_q)
+            if not batch:
+                continue
+            started = time.monotonic()
+            with stats._lock:
+                stats.items_in += len(batch)
+                if stats.first_at is None:
+                    stats.first_at = started
+            try:
+                if stage.rate_limiter is not None:
+                    stage.rate_limiter.acquire()
+                results = self._call(stage, batch)
+            except Exception as exc:
+                logger.exception("Stage %s failed on a batch of %d", stage.name, len(batch))
+                self.errors.append((stage.name, exc))
+                with stats._lock:
+                    stats.errors += len(batch)
+                continue
+            finally:
+                ended = time.monotonic()
+                with stats._lock:
+                    stats.busy_s += ended - started
+                    stats.last_at = ended
+
+            kept = [r for r in results if r is not None]
+            with stats._lock:
+                stats.items_out += len(kept)
+            for r in kept:
+                out_q.put(r)
+
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(next_workers):
+                out_q.put(_DONE)
+
+    def _call(self, stage: Stage, batch: List[Any]) -> List[Any]:
+        if stage.batch_size == 1:
+            if stage.executor == "process":
+                return [self._pool.submit(stage.fn, batch[0]).result()]
+            return [stage.fn(batch[0])]
+        if stage.executor == "process":
+            results = self._pool.submit(stage.fn, batch).result()
+        else:
+            results = stage.fn(batch)
+        if len(results) != len(batch):
+            raise RuntimeError(
+                f"stage {stage.name} returned {len(results)} results for {len(batch)} items"
+            )
+        return list(results)
+
+    def report(self) -> str:
+        lines = [
+            f"{'stage':<12} {'in':>7} {'out':>7} {'err':>5} "
+            f"{'busy s':>8} {'wall s':>8} {'items/s':>9}"
+        ]
+        for s in self.stats:
+            d = s.as_dict()
+            lines.append(
+                f"{d['stage']:<12} {d['in']:>7} {d['out']:>7} {d['errors']:>5} "
+                f"{d['busy_s']:>8.2f} {d['wall_s']:>8.2f} {d['items_per_s']:>9.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,134 @@
+# rag_transport.py
+"""
+Pluggable DLP gateway → RAG orchestrator transport.
+
+The gateway hands the (already classified, possibly masked) request to the
+RAG orchestrator through one of:
+
+  inprocess  call rag_handler.lambda_handler directly in this process
+             (single deployment, no second cold start, no network hop)
+  lambda     synchronous lambda:Invoke of RAG_LAMBDA_NAME (the original
+             two-function deployment)
+  http       POST JSON to RAG_HTTP_URL, an endpoint that takes the forward
+             payload below and returns rag_handler.lambda_handler's result
+             (not the gateway server's /gateway, which expects a raw
+             {"prompt", "role"} request and would screen it again)
+
+Selected with DLP_RAG_TRANSPORT (default: lambda; the ASGI gateway server
+defaults to inprocess). Every transport takes
+and returns the same JSON-friendly dicts, so handlers don't care which one
+is in use. Every failure, including missing configuration and exceptions
+raised by the in-process orchestrator, surfaces as RagTransportError.
+
+The forward payload (dlp_handler.screen_prompt):
+
+  {"prompt": masked prompt, "user_role": ..., "original_decision_id": ...,
+   "redaction_applied": bool, "dlp_classification": {"label", "entity_types"}}
+"""
+import json
+import os
+from typing import Any, Dict, Optional, Protocol
+
+
+class RagTransportError(RuntimeError):
+    """
+    The RAG orchestrator is misconfigured, could not be reached, failed,
+    or returned garbage.
+    """
+
+
+class RagTransport(Protocol):
+    def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+
+class InProcessTransport:
+    """Run the RAG orchestrator in this process."""
+
+    def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        # Imported on first use: blocked prompts never pay for the RAG stack
+        import rag_handler
+
+        try:
+            return rag_handler.lambda_handler(payload, None)
+        except Exception as exc:
+            raise RagTransportError(f"in-process RAG orchestrator failed: {exc}") from exc
+
+
+class LambdaTransport:
+    """Synchronous lambda:Invoke (RequestResponse)."""
+
+    def __init__(self, function_name: str, client: Optional[Any] = None):
+        if not function_name:
+            raise RagTransportError("RAG_LAMBDA_NAME environment variable is required")
+        self.function_name = function_name
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("lambda")
+        return self._client
+
+    def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            resp = self.client.invoke(
+                FunctionName=self.function_name,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(payload).encode("utf-8"),
+            )
+        except Exception as exc:
+            raise RagTransportError(f"lambda invoke failed: {exc}") from exc
+        try:
+            return json.loads(resp["Payload"].read())
+        except Exception as exc:
+            raise RagTransportError("invalid response from RAG orchestrator") from exc
+
+
+class HttpTransport:
+    """POST the payload as JSON to an HTTP RAG endpoint."""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        if not url:
+            raise RagTransportError("RAG_HTTP_URL environment variable is required")
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import urllib.request  # ~30 ms at import; only the http mode needs it
+
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:  # nosec B310
+                body = resp.read()
+        except Exception as exc:
+            raise RagTransportError(f"http call failed: {exc}") from exc
+        try:
+            return json.loads(body)
+        except ValueError as exc:
+            raise RagTransportError("invalid response from RAG orchestrator") from exc
+
+
+def transport_mode_from_env(default: str = "lambda") -> str:
+    return os.environ.get("DLP_RAG_TRANSPORT", default).strip().lower()
+
+
+def transport_from_env(default: str = "lambda") -> RagTransport:
+    mode = transport_mode_from_env(default)
+    if mode == "inprocess":
+        return InProcessTransport()
+    if mode == "http":
+        return HttpTransport(
+            os.environ.get("RAG_HTTP_URL", ""),
+            timeout=float(os.environ.get("RAG_HTTP_TIMEOUT", "30")),
+        )
+    if mode == "lambda":
+        return LambdaTransport(os.environ.get("RAG_LAMBDA_NAME", ""))
+    raise RagTransportError(f"unknown DLP_RAG_TRANSPORT: {mode!r}")
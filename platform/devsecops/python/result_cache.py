@@ -0,0 +1,207 @@
+# result_cache.py
+"""
+Content-addressed result cache with request coalescing.
+
+Identical prompts (retries, templated agent calls, dashboards) should cost
+one scan / one retrieval + LLM call, not one per request:
+
+  * results are kept in a bounded LRU with a TTL, keyed by an HMAC-SHA256
+    of the request parts (endpoint, role, prompt, ...) – the raw prompt is
+    never stored as a key, and the key can't be reversed or brute-forced
+    without the cache key;
+  * concurrent misses on the same key are coalesced: one caller computes,
+    the others wait for its result (threads via get_or_compute, asyncio
+    tasks via get_or_compute_async). Failures are shared with the waiters
+    but never cached, and neither is a result fn wraps in Uncached (e.g.
+    an answer built while a dependency was down).
+
+Cached values are shared between callers – treat them as read-only.
+Evidence logging stays per request: callers cache the expensive pure parts
+(classification, retrieval + answer), not the decision record.
+"""
+import asyncio
+import functools
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+_MISS = object()
+
+
+@dataclass(frozen=True)
+class Uncached:
+    """Return Uncached(value) from fn to hand out `value` without caching it."""
+
+    value: Any
+
+
+class _Pending:
+    """A computation in flight on another thread."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ResultCache:
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl_s: float = 300.0,
+        key: Optional[bytes] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        # Per-process key unless shared: keys only need to be stable here
+        self._key = key or os.urandom(32)
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _Pending] = {}
+        self._tasks: Dict[str, "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls, prefix: str, max_entries: int = 10_000, ttl_s: float = 300.0) -> "ResultCache":
+        """<prefix>_SIZE / <prefix>_TTL override the defaults; DLP_CACHE_KEY is shared."""
+        return cls(
+            max_entries=int(os.environ.get(f"{prefix}_SIZE", max_entries)),
+            ttl_s=float(os.environ.get(f"{prefix}_TTL", ttl_s)),
+            key=os.environ.get("DLP_CACHE_KEY", "").encode("utf-8") or None,
+        )
+
+    def key_for(self, *parts: str) -> str:
+        """Opaque cache key for the given request parts."""
+        msg = "\x00".join(parts).encode("utf-8")
+        return hmac.new(self._key, msg, hashlib.sha256).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _lookup(self, key: str) -> Any:
+        """Caller holds the lock. Returns _MISS for absent or expired keys."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISS
+        expires, value = entry
+        if expires <= self._clock():
+            del self._entries[key]
+            return _MISS
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is _MISS else value
+
+    def put(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0 or self.ttl_s <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.coalesced = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+        }
+
+    # ------------------------------------------------------------------
+    # Coalescing front doors
+    # ------------------------------------------------------------------
+
+    def get_or_compute(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Thread-safe: at most one fn() per key runs at a time."""
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISS:
+                self.hits += 1
+                return value
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = _Pending()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            result = fn()
+            if isinstance(result, Uncached):
+                pending.value = result.value
+            else:
+                pending.value = result
+                self.put(key, result)
+            return pending.value
+        except BaseException as exc:
+            pending.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.done.set()
+
+    async def get_or_compute_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        asyncio flavour: the first caller starts fn() as a task, later
+        callers await the same task. A caller that is cancelled (client
+        went away) doesn't cancel the computation for the others.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISS:
+                self.hits += 1
+                return value
+            task = self._tasks.get(key)
+            if task is None:
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._settle, key))
+        result = await asyncio.shield(task)
+        return result.value if isinstance(result, Uncached) else result
+
+    def _settle(self, key: str, task: "asyncio.Future[Any]") -> None:
+        self._tasks.pop(key, None)
+        # .exception() also marks a failure as retrieved when nobody is left waiting
+        if (
+            not task.cancelled()
+            and task.exception() is None
+            and not isinstance(task.result(), Uncached)
+        ):
+            self.put(key, task.result())
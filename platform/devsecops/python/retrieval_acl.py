@@ -0,0 +1,135 @@
+# retrieval_acl.py
+"""
+Role-based retrieval ACL, applied as a vector-index filter at query time.
+
+dlp05_rag_acl.rego decides whether a role may see one embedding: the
+embedding's record_type must list the role, and its dlp_label (stamped by
+ingest_gate) must be one the role is cleared for. The same data file
+(dlp05_rag_acl_data.json) is compiled here into a Pinecone-style metadata
+filter, so unauthorized chunks are excluded by the index before scoring
+instead of being fetched in the top-k and thrown away:
+
+    acl = get_retrieval_acl()
+    index.query(vector=q, top_k=5, filter=acl.filter_for("analyst"))
+
+A role the data does not know (or one cleared for nothing) gets no filter
+at all from filter_for (None) and must not query the index.
+
+The data file is optional at runtime (the Lambda zip does not ship the
+governance tree); BUILTIN_ACL mirrors it.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+RAG_ACL_PATH = Path(
+    os.environ.get("RAG_ACL_PATH")
+    or REPO_ROOT
+    / "platform"
+    / "governance"
+    / "policies_as_code"
+    / "opa"
+    / "dlp"
+    / "dlp05_rag_acl_data.json"
+)
+
+# Mirror of dlp05_rag_acl_data.json, used when it can't be read at runtime
+BUILTIN_ACL: Dict[str, Any] = {
+    "roles": {
+        "allowed": {
+            "clean": ["analyst", "dlp-admin"],
+            "sensitive": ["dlp-admin"],
+        },
+        "labels": {
+            "analyst": ["public", "internal", "confidential"],
+            "dlp-admin": ["public", "internal", "confidential", "restricted_pii", "phi"],
+        },
+    }
+}
+
+
+def _as_list(value: Any) -> Tuple[str, ...]:
+    # dlp05_rag_acl.rego also accepts a single string in place of either list
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value or ())
+
+
+@dataclass(frozen=True)
+class RetrievalAcl:
+    """role -> record_types it may read, role -> dlp_labels it is cleared for."""
+
+    record_types: Dict[str, Tuple[str, ...]]
+    labels: Dict[str, Tuple[str, ...]]
+
+    @classmethod
+    def from_data(cls, data: Mapping[str, Any]) -> "RetrievalAcl":
+        roles = data.get("roles") or {}
+        record_types: Dict[str, Tuple[str, ...]] = {}
+        for record_type, allowed in sorted((roles.get("allowed") or {}).items()):
+            for role in _as_list(allowed):
+                record_types[role] = record_types.get(role, ()) + (record_type,)
+        labels = {role: _as_list(cleared) for role, cleared in (roles.get("labels") or {}).items()}
+        return cls(record_types, labels)
+
+    def record_types_for(self, role: str) -> Tuple[str, ...]:
+        return self.record_types.get(role, ())
+
+    def labels_for(self, role: str) -> Tuple[str, ...]:
+        return self.labels.get(role, ())
+
+    def allows(self, role: str, metadata: Mapping[str, Any]) -> bool:
+        """dlp05_rag_acl.rego's decision for one embedding's metadata."""
+        return (
+            metadata.get("record_type") in self.record_types_for(role)
+            and metadata.get("dlp_label") in self.labels_for(role)
+        )
+
+    def filter_for(
+        self, role: str, labels: Optional[Iterable[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Metadata filter admitting exactly what `role` may read, optionally
+        narrowed further to `labels`; None when that is nothing.
+        """
+        record_types = self.record_types_for(role)
+        cleared = self.labels_for(role)
+        if labels is not None:
+            wanted = {label.lower() for label in labels}
+            cleared = tuple(label for label in cleared if label in wanted)
+        if not (record_types and cleared):
+            return None
+        return {
+            "$and": [
+                {"record_type": {"$in": list(record_types)}},
+                {"dlp_label": {"$in": list(cleared)}},
+            ]
+        }
+
+
+def load_acl(path: Optional[Path] = None) -> RetrievalAcl:
+    path = Path(path or RAG_ACL_PATH)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        data = BUILTIN_ACL
+    return RetrievalAcl.from_data(data)
+
+
+_ACL_LOCK = threading.Lock()
+_ACL: Optional[RetrievalAcl] = None
+
+
+def get_retrieval_acl() -> RetrievalAcl:
+    """Process-wide ACL, loaded from RAG_ACL_PATH on first use."""
+    global _ACL
+    if _ACL is None:
+        with _ACL_LOCK:
+            if _ACL is None:
+                _ACL = load_acl()
+    return _ACL
@@ -9,7 +9,7 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from dlp_utils import classify_text, detect_entities
+from dlp_utils import classify_texts
 
 load_dotenv()
 
@@ -24,13 +24,15 @@ samples = [
     "Patient MRN 998877, chest pain since 3am."
 ]
 
-for s in samples:
-    entities = detect_entities(s)          # <-- detect first
-    result   = classify_text(entities)     # <-- THEN classify
+# One batch call: scanner setup is paid once for the whole list
+batch = classify_texts(samples)
 
+for s, label, counts, spans in zip(
+    samples, batch["labels"], batch["entity_counts"], batch["spans"]
+):
     print("\n--- SAMPLE ---")
     print(s)
     print("--- ENTITIES ---")
-    print(json.dumps(entities, indent=2))
+    print(json.dumps([span._asdict() for span in spans], indent=2))
     print("--- RESULT ---")
-    print(json.dumps(result, indent=2))
+    print(json.dumps({"label": label, "entity_counts": counts}, indent=2))
@@ -0,0 +1,88 @@
+"""
+Import-time profiler for the Lambda entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter
+(so nothing is already cached in sys.modules) and reports the slowest
+modules by cumulative and self time, plus the total.
+
+Usage:
+  python scripts/import_profile.py                      # dlp_handler, rag_handler
+  python scripts/import_profile.py dlp_utils --top 15
+  python scripts/import_profile.py rag_handler --budget-ms 150   # exit 1 if over
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# (self_us, cumulative_us, module)
+Row = Tuple[int, int, str]
+
+
+def profile_import(module: str) -> List[Row]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows: List[Row] = []
+    for line in proc.stderr.splitlines():
+        # "import time:       123 |        456 |   package.module"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((int(self_us), int(cum_us), name.rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def report(module: str, rows: List[Row], top: int) -> int:
+    total_us = next((cum for _s, cum, name in rows if name.strip() == module), 0)
+    print(f"\n=== {module}: {total_us / 1000:.1f} ms total import time ===")
+
+    print(f"\n-- top {top} by cumulative --")
+    for self_us, cum_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"{cum_us / 1000:9.1f} ms  {name}")
+
+    print(f"\n-- top {top} by self --")
+    for self_us, cum_us, name in sorted(rows, key=lambda r: r[0], reverse=True)[:top]:
+        print(f"{self_us / 1000:9.1f} ms  {name.strip()}")
+    return total_us
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=["dlp_handler", "rag_handler"])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="fail (exit 1) if any module's total import time exceeds this",
+    )
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.modules:
+        total_us = report(module, profile_import(module), args.top)
+        if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+            print(f"!! {module} exceeds the {args.budget_ms:.0f} ms import budget")
+            over_budget = True
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
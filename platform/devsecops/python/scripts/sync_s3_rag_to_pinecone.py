@@ -1,12 +1,56 @@
+"""
+Sync RAG JSON documents from S3 into Pinecone.
+
+  python scripts/sync_s3_rag_to_pinecone.py            # incremental (default)
+  python scripts/sync_s3_rag_to_pinecone.py --full     # re-embed + upsert everything
+  python scripts/sync_s3_rag_to_pinecone.py --dry-run  # print the plan only
+
+Incremental runs diff a paginated listing against a local manifest
+(RAG_SYNC_MANIFEST, see sync_manifest.py): only new or changed objects are
+fetched, embedded and upserted, and vectors of removed keys are deleted.
+
+The changed objects stream through a bounded pipeline (rag_pipeline.py):
+
+  S3 GET (threads) -> parse + DLP classify (process pool)
+    -> embed (threads, rate-limited) -> upsert (threads, rate-limited)
+
+tuned with SYNC_FETCH_WORKERS, SYNC_PROCESS_WORKERS, SYNC_EMBED_WORKERS,
+SYNC_UPSERT_WORKERS, EMBED_RPS and UPSERT_RPS. The rate limits count API
+requests (each embeddings request, each Pinecone upsert request), not
+pipeline batches. A per-stage throughput table is printed at the end of
+the run.
+
+Documents are split into overlapping, token-budgeted chunks (rag_chunker.py,
+RAG_CHUNK_TOKENS / RAG_CHUNK_OVERLAP) after the DLP gate, one vector per
+chunk with id "<doc id>#<offset>" and the chunk's text in metadata["text"].
+
+The same chunks (ids, namespaces, metadata) are indexed into the BM25
+index the query path uses for hybrid / ID lookups (lexical_index.py,
+RAG_LEXICAL_INDEX). If that file does not exist yet, the run re-fetches
+every object to build it; only changed documents are re-embedded.
+"""
+import argparse
 import os
+import sys
 import json
-from typing import List, Tuple, Dict
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 
 import boto3
-from pinecone import Pinecone
-from openai import OpenAI
 from dotenv import load_dotenv  # ✅ add this
 
+# Ensure parent (python dir) is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from embedding_cache import get_embedding_cache
+from ingest_gate import GateConfig, GatedDoc, chunk_gated_doc, gate_documents
+from lexical_index import LEXICAL_INDEX_PATH, LexicalIndex
+from rag_pipeline import Pipeline, RateLimiter, Stage
+from sync_manifest import ManifestEntry, SyncManifest, content_hash, plan_sync
+
 load_dotenv()  
 
 DEMO_BUCKET = os.getenv("DEMO_BUCKET", "vhc-dlp-demo-data-dev")
@@ -27,94 +71,155 @@ PINECONE_INDEX_NAME = (
 )
 PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE", "default")
 
+# Restricted docs: INGEST_RESTRICTED_MODE=namespace|redact|drop (see ingest_gate.py)
+GATE = GateConfig.from_env(PINECONE_NAMESPACE)
+
 OPENAI_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 
+RAG_SYNC_MANIFEST = os.getenv("RAG_SYNC_MANIFEST", str(ROOT / ".rag_sync_manifest.sqlite"))
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
-    """
-    Simple embedding helper. Uses OpenAI for now.
-    Swap this out if you prefer another provider.
-    """
+SYNC_FETCH_WORKERS = int(os.getenv("SYNC_FETCH_WORKERS", "16"))
+SYNC_PROCESS_WORKERS = int(os.getenv("SYNC_PROCESS_WORKERS", str(os.cpu_count() or 2)))
+SYNC_EMBED_WORKERS = int(os.getenv("SYNC_EMBED_WORKERS", "4"))
+SYNC_UPSERT_WORKERS = int(os.getenv("SYNC_UPSERT_WORKERS", "4"))
+EMBED_RPS = float(os.getenv("EMBED_RPS", "8"))  # embedding API calls per second
+UPSERT_RPS = float(os.getenv("UPSERT_RPS", "20"))  # Pinecone upsert calls per second
+BATCH_SIZE = 32
+RAG_CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "512"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "64"))
+EMBED_API_BATCH = 256  # texts per embeddings request
+UPSERT_API_BATCH = 100  # vectors per Pinecone upsert request
+
+# Shared by every worker; one token per API request
+EMBED_LIMITER = RateLimiter(EMBED_RPS)
+UPSERT_LIMITER = RateLimiter(UPSERT_RPS)
+
+Doc = Tuple[str, str, Dict]
+
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> Any:
+    """One OpenAI client for the whole run (imported on first embed)."""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY must be set to embed texts")
 
-    client = OpenAI(api_key=api_key)
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key)
 
-    resp = client.embeddings.create(
-        model=OPENAI_MODEL,
-        input=texts,
-    )
-    # ordered list of embeddings
-    return [item.embedding for item in resp.data]
+
+def _embed_api(texts: List[str]) -> List[List[float]]:
+    vectors: List[List[float]] = []
+    for i in range(0, len(texts), EMBED_API_BATCH):
+        EMBED_LIMITER.acquire()
+        resp = get_openai_client().embeddings.create(
+            model=OPENAI_MODEL,
+            input=texts[i:i + EMBED_API_BATCH],
+        )
+        # ordered list of embeddings
+        vectors.extend(item.embedding for item in resp.data)
+    return vectors
 
 
-def load_rag_docs_from_s3() -> List[Tuple[str, str, Dict]]:
+def embed_texts(texts: List[str]) -> List[List[float]]:
     """
-    Read RAG JSON docs from S3:DEMO_BUCKET/{prefixes}.
-    Each object is expected to be JSON; we are tolerant about the text key:
-      - "text"
-      - "content"
-      - "body"
-      - "prompt"/"question"/"answer" (joined)
+    Simple embedding helper. Uses OpenAI for now.
+    Swap this out if you prefer another provider.
+
+    Goes through the shared embedding cache: unchanged documents (and
+    prompts the Streamlit app already embedded) never hit the API twice.
     """
-    s3 = boto3.client("s3")
+    return get_embedding_cache().embed(OPENAI_MODEL, texts, _embed_api)
 
-    docs: List[Tuple[str, str, Dict]] = []
 
-    for prefix in RAG_PREFIXES:
+def iter_rag_objects(s3: Any, prefixes: Iterable[str] = RAG_PREFIXES) -> Iterator[Dict[str, Any]]:
+    """
+    Yield listing entries ({"Key", "ETag", "LastModified", ...}) of the JSON
+    objects under each prefix, following list_objects_v2 pagination.
+    """
+    paginator = s3.get_paginator("list_objects_v2")
+    for prefix in prefixes:
         prefix = prefix.strip()
         if not prefix:
             continue
 
         print(f"[RAG] Listing S3 objects from {DEMO_BUCKET}/{prefix}")
-        resp = s3.list_objects_v2(Bucket=DEMO_BUCKET, Prefix=prefix)
+        for page in paginator.paginate(Bucket=DEMO_BUCKET, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                # ignore folder “keys”
+                if key.endswith("/") or not key.endswith(".json"):
+                    continue
+                yield obj
 
-        contents = resp.get("Contents", [])
-        if not contents:
-            continue
 
-        for obj in contents:
-            key = obj["Key"]
-            # ignore folder “keys”
-            if key.endswith("/") or not key.endswith(".json"):
-                continue
-
-            body = s3.get_object(Bucket=DEMO_BUCKET, Key=key)["Body"].read()
-            try:
-                record = json.loads(body)
-            except json.JSONDecodeError:
-                print(f"[RAG] Skipping non-JSON object: {key}")
-                continue
-
-            # ---- tolerant text extraction ----
-            text = None
-
-            # primary candidates
-            for field in ("text", "content", "body"):
-                v = record.get(field)
-                if isinstance(v, str) and v.strip():
-                    text = v.strip()
-                    break
-
-            # fallback: join Q/A style fields if no single text field exists
-            if text is None:
-                q = record.get("question") or record.get("prompt")
-                a = record.get("answer") or record.get("response")
-                pieces = [p for p in [q, a] if isinstance(p, str) and p.strip()]
-                if pieces:
-                    text = "\n\n".join(pieces)
-
-            if not text:
-                # keep this log but do NOT treat it as fatal
-                print(f"[RAG] Skipping {key}, no usable text field.")
-                continue
-
-            doc_id = record.get("id") or key
-            metadata = record.get("metadata", {})
-            metadata.setdefault("s3_key", key)
-
-            docs.append((doc_id, text, metadata))
+def parse_rag_doc(key: str, body: bytes) -> Optional[Doc]:
+    """
+    Turn one S3 JSON object into (doc_id, text, metadata).
+    We are tolerant about the text key:
+      - "text"
+      - "content"
+      - "body"
+      - "prompt"/"question"/"answer" (joined)
+    """
+    try:
+        record = json.loads(body)
+    except json.JSONDecodeError:
+        print(f"[RAG] Skipping non-JSON object: {key}")
+        return None
+
+    # ---- tolerant text extraction ----
+    text = None
+
+    # primary candidates
+    for field in ("text", "content", "body"):
+        v = record.get(field)
+        if isinstance(v, str) and v.strip():
+            text = v.strip()
+            break
+
+    # fallback: join Q/A style fields if no single text field exists
+    if text is None:
+        q = record.get("question") or record.get("prompt")
+        a = record.get("answer") or record.get("response")
+        pieces = [p for p in [q, a] if isinstance(p, str) and p.strip()]
+        if pieces:
+            text = "\n\n".join(pieces)
+
+    if not text:
+        # keep this log but do NOT treat it as fatal
+        print(f"[RAG] Skipping {key}, no usable text field.")
+        return None
+
+    doc_id = record.get("id") or key
+    metadata = record.get("metadata", {})
+    metadata.setdefault("s3_key", key)
+    # record_type drives the retrieval ACL (dlp05_rag_acl.rego); default to
+    # the top-level prefix the doc was synced from ("clean", "sensitive")
+    record_type = record.get("record_type") or (key.split("/", 1)[0] if "/" in key else None)
+    if record_type:
+        metadata.setdefault("record_type", record_type)
+    return doc_id, text, metadata
+
+
+def fetch_rag_docs(
+    s3: Any, objects: Iterable[Mapping[str, Any]]
+) -> List[Tuple[Mapping[str, Any], Optional[Doc]]]:
+    """GET and parse each listed object; unusable objects come back as None."""
+    out = []
+    for obj in objects:
+        body = s3.get_object(Bucket=DEMO_BUCKET, Key=obj["Key"])["Body"].read()
+        out.append((obj, parse_rag_doc(obj["Key"], body)))
+    return out
+
+
+def load_rag_docs_from_s3() -> List[Doc]:
+    """
+    Read every RAG JSON doc from S3:DEMO_BUCKET/{prefixes} (no manifest).
+    """
+    s3 = boto3.client("s3")
+    docs = [doc for _obj, doc in fetch_rag_docs(s3, iter_rag_objects(s3)) if doc]
 
     if not docs:
         print(f"[RAG] No RAG docs found across all prefixes; nothing to sync.")
@@ -124,49 +229,311 @@ def load_rag_docs_from_s3() -> List[Tuple[str, str, Dict]]:
     return docs
 
 
-def upsert_docs_to_pinecone(docs: List[Tuple[str, str, Dict]]):
-    """
-    Embed docs and upsert into Pinecone.
-    """
-    if not docs:
-        print("[PINECONE] No docs to upsert; exiting.")
-        return
-
+@lru_cache(maxsize=1)
+def get_pinecone_index() -> Any:
     if not PINECONE_API_KEY:
         raise RuntimeError("PINECONE_API_KEY must be set")
 
+    from pinecone import Pinecone
+
     # New Pinecone client (no global init)
     pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(PINECONE_INDEX_NAME)
+    return pc.Index(PINECONE_INDEX_NAME)
+
+
+def upsert_gated_docs(gated: List[GatedDoc], vectors: List[List[float]]):
+    """Upsert embedded docs, one call per target namespace."""
+    by_ns: Dict[str, List[Tuple[str, List[float], Dict]]] = {}
+    for doc, vec in zip(gated, vectors):
+        by_ns.setdefault(doc.namespace, []).append((doc.doc_id, vec, doc.metadata))
+
+    index = get_pinecone_index()
+    for namespace, payload in by_ns.items():
+        print(
+            f"[PINECONE] Upserting {len(payload)} vectors into "
+            f"index '{PINECONE_INDEX_NAME}' namespace '{namespace}'"
+        )
+        for i in range(0, len(payload), UPSERT_API_BATCH):
+            UPSERT_LIMITER.acquire()
+            index.upsert(
+                vectors=payload[i:i + UPSERT_API_BATCH],
+                namespace=namespace,
+            )
+
+
+def upsert_docs_to_pinecone(docs: List[Doc]):
+    """
+    DLP-gate, embed and upsert docs into Pinecone.
+    """
+    if not docs:
+        print("[PINECONE] No docs to upsert; exiting.")
+        return
 
     batch_size = 32
     for i in range(0, len(docs), batch_size):
-        batch = docs[i:i + batch_size]
-        ids = [d[0] for d in batch]
-        texts = [d[1] for d in batch]
-        metas = [d[2] for d in batch]
+        gated = [d for d in gate_documents(docs[i:i + batch_size], GATE) if d.namespace]
+        chunks = [
+            c for d in gated for c in chunk_gated_doc(d, RAG_CHUNK_TOKENS, RAG_CHUNK_OVERLAP)
+        ]
+        if not chunks:
+            continue
 
-        print(f"[PINECONE] Embedding batch {i}–{i+len(batch)-1}")
-        vectors = embed_texts(texts)
+        print(f"[PINECONE] Embedding batch {i}–{i+len(gated)-1} ({len(chunks)} chunks)")
+        upsert_gated_docs(chunks, embed_texts([c.text for c in chunks]))
 
-        payload = [
-            (ids[j], vectors[j], metas[j])
-            for j in range(len(batch))
-        ]
 
-        print(
-            f"[PINECONE] Upserting {len(payload)} vectors into "
-            f"index '{PINECONE_INDEX_NAME}' namespace '{PINECONE_NAMESPACE}'"
+def delete_vectors_from_pinecone(ids: List[Tuple[str, str]]):
+    """Delete (namespace, vector_id) pairs."""
+    if not ids:
+        return
+    by_ns: Dict[str, List[str]] = {}
+    for namespace, vec_id in ids:
+        by_ns.setdefault(namespace, []).append(vec_id)
+
+    index = get_pinecone_index()
+    for namespace, ns_ids in by_ns.items():
+        for i in range(0, len(ns_ids), 1000):
+            batch = ns_ids[i:i + 1000]
+            print(
+                f"[PINECONE] Deleting {len(batch)} vectors of removed/replaced docs "
+                f"from namespace '{namespace}'"
+            )
+            index.delete(ids=batch, namespace=namespace)
+
+
+def parse_and_gate(
+    batch: List[Dict[str, Any]],
+    gate: GateConfig,
+    max_tokens: int = RAG_CHUNK_TOKENS,
+    overlap_tokens: int = RAG_CHUNK_OVERLAP,
+) -> List[Dict[str, Any]]:
+    """
+    Process-pool stage: parse fetched objects, DLP-classify, tag and route
+    them (ingest_gate) with one classify_texts call per batch, then chunk
+    the documents that will be embedded.
+    """
+    items = [
+        {"obj": item["obj"], "doc": parse_rag_doc(item["obj"]["Key"], item["body"])}
+        for item in batch
+    ]
+    parsed = [item for item in items if item["doc"] is not None]
+    gated_docs = gate_documents([item["doc"] for item in parsed], gate)
+    for item in items:
+        item["gated"] = None
+    for item, gated in zip(parsed, gated_docs):
+        item["gated"] = gated
+
+    for item in items:
+        del item["doc"]
+        gated = item["gated"]
+        # Hash what is actually stored: text after redaction, metadata,
+        # routing and chunking, so a changed gate mode or chunk size
+        # re-syncs unchanged documents
+        item["digest"] = (
+            content_hash(
+                gated.text,
+                {
+                    **gated.metadata,
+                    "_namespace": gated.namespace,
+                    "_chunking": [max_tokens, overlap_tokens],
+                },
+            )
+            if gated
+            else ""
         )
-        index.upsert(
-            vectors=payload,
-            namespace=PINECONE_NAMESPACE,
+        item["chunks"] = (
+            chunk_gated_doc(gated, max_tokens, overlap_tokens)
+            if gated and gated.namespace
+            else []
+        )
+    return items
+
+
+def _vector_ids(entry: Optional[ManifestEntry]) -> List[Tuple[str, str]]:
+    if entry is None:
+        return []
+    return [(entry.namespace or PINECONE_NAMESPACE, v) for v in entry.vector_ids]
+
+
+def index_lexical(lexical: LexicalIndex, chunks: List[GatedDoc]) -> None:
+    """(Re)index chunks into the BM25 index, one call per target namespace."""
+    by_ns: Dict[str, List[Tuple[str, str, Dict]]] = {}
+    for chunk in chunks:
+        by_ns.setdefault(chunk.namespace, []).append((chunk.doc_id, chunk.text, chunk.metadata))
+    for namespace, docs in by_ns.items():
+        lexical.upsert(docs, namespace=namespace)
+
+
+def delete_lexical(lexical: LexicalIndex, ids: List[Tuple[str, str]]) -> None:
+    by_ns: Dict[str, List[str]] = {}
+    for namespace, vec_id in ids:
+        by_ns.setdefault(namespace, []).append(vec_id)
+    for namespace, ns_ids in by_ns.items():
+        lexical.delete(ids=ns_ids, namespace=namespace)
+
+
+def build_sync_pipeline(
+    s3: Any,
+    entries: Mapping[str, ManifestEntry],
+    full: bool = False,
+    lexical: Optional[LexicalIndex] = None,
+) -> Pipeline:
+    """
+    fetch -> parse/classify/gate -> embed -> upsert. The last stage yields
+    one item per object that made it through, carrying its ManifestEntry
+    ("entry"), replaced (namespace, vector_id) pairs ("stale_ids"), whether
+    it was upserted and its DLP-gated document. With a `lexical` index,
+    the chunks of every fetched document are (re)indexed into it as well.
+    """
+
+    def fetch(obj: Dict[str, Any]) -> Dict[str, Any]:
+        body = s3.get_object(Bucket=DEMO_BUCKET, Key=obj["Key"])["Body"].read()
+        return {"obj": obj, "body": body}
+
+    def embed(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for item in batch:
+            gated, prev = item["gated"], entries.get(item["obj"]["Key"])
+            # ETag moved but the content didn't, nothing usable, or dropped
+            # by the gate: no embed
+            item["upsert"] = bool(gated and gated.namespace) and (
+                full or prev is None or prev.content_hash != item["digest"]
+            )
+        # Unchanged chunks of an edited document are embedding-cache hits
+        chunks = [c for item in batch if item["upsert"] for c in item["chunks"]]
+        if chunks:
+            vectors = iter(embed_texts([c.text for c in chunks]))
+            for item in batch:
+                if item["upsert"]:
+                    item["vectors"] = [next(vectors) for _ in item["chunks"]]
+        return batch
+
+    def upsert(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        todo = [item for item in batch if item["upsert"]]
+        if todo:
+            upsert_gated_docs(
+                [c for item in todo for c in item["chunks"]],
+                [v for item in todo for v in item.pop("vectors")],
+            )
+        if lexical is not None:
+            # Cheap next to embedding, so also for content-unchanged docs:
+            # that is how a missing BM25 index gets (re)built
+            index_lexical(lexical, [c for item in batch for c in item["chunks"]])
+
+        for item in batch:
+            gated = item["gated"]
+            kept = gated is not None and gated.namespace is not None
+            # Chunks that disappeared (shorter doc, moved offsets) go stale
+            ids = tuple(c.doc_id for c in item.pop("chunks")) if kept else ()
+            namespace = gated.namespace if kept else ""
+            current = {(namespace, v) for v in ids}
+            previous = _vector_ids(entries.get(item["obj"]["Key"]))
+            item["stale_ids"] = [pair for pair in previous if pair not in current]
+            item["entry"] = SyncManifest.record(item["obj"], item["digest"], ids, namespace)
+        return batch
+
+    classify = partial(
+        parse_and_gate, gate=GATE, max_tokens=RAG_CHUNK_TOKENS, overlap_tokens=RAG_CHUNK_OVERLAP
+    )
+    return Pipeline(
+        [
+            Stage("fetch", fetch, workers=SYNC_FETCH_WORKERS, queue_size=4 * SYNC_FETCH_WORKERS),
+            Stage("classify", classify, workers=SYNC_PROCESS_WORKERS,
+                  batch_size=16, executor="process"),
+            Stage("embed", embed, workers=SYNC_EMBED_WORKERS, batch_size=BATCH_SIZE),
+            Stage("upsert", upsert, workers=SYNC_UPSERT_WORKERS, batch_size=BATCH_SIZE),
+        ],
+        process_workers=SYNC_PROCESS_WORKERS,
+    )
+
+
+def sync_incremental(full: bool = False, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Sync only what changed since the last run (see sync_manifest.py).
+    full=True re-fetches, re-embeds and re-upserts every listed object.
+    """
+    s3 = boto3.client("s3")
+    manifest = SyncManifest(
+        RAG_SYNC_MANIFEST, target=f"{DEMO_BUCKET}|{PINECONE_INDEX_NAME}|{PINECONE_NAMESPACE}"
+    )
+    lexical_missing = not LEXICAL_INDEX_PATH.exists()
+    lexical = LexicalIndex.load(LEXICAL_INDEX_PATH)
+    try:
+        entries = manifest.entries()
+        # Unchanged objects aren't fetched, so a new BM25 index needs them all
+        refetch = full or (lexical_missing and bool(entries))
+        plan = plan_sync(iter_rag_objects(s3), entries, prefixes=RAG_PREFIXES, force=refetch)
+        stats = {
+            "listed_unchanged": plan.unchanged,
+            "fetched": len(plan.fetch),
+            "upserted": 0,
+            "content_unchanged": 0,
+            "removed": len(plan.removed),
+            "errors": 0,
+        }
+        print(
+            f"[RAG] Plan: {plan.unchanged} unchanged, {len(plan.fetch)} to fetch, "
+            f"{len(plan.removed)} removed"
         )
+        if dry_run:
+            return stats
+
+        if lexical_missing:
+            print(f"[RAG] No BM25 index at {LEXICAL_INDEX_PATH}; building it from every object")
+        pipeline = build_sync_pipeline(s3, entries, full=full, lexical=lexical)
+
+        def checkpoint(done: List[ManifestEntry], stale: List[Tuple[str, str]]) -> None:
+            # Deletes, then the BM25 index, then the manifest: the manifest
+            # must never be ahead of either, or a crash in between would
+            # forget stale vectors that were never deleted
+            delete_vectors_from_pinecone(stale)
+            delete_lexical(lexical, stale)
+            lexical.save(LEXICAL_INDEX_PATH)
+            manifest.upsert(done)
+
+        stale_ids: List[Tuple[str, str]] = []
+        done: List[ManifestEntry] = []
+        labels: Dict[str, int] = {}
+        for item in pipeline.run(plan.fetch):
+            entry = item["entry"]
+            done.append(entry)
+            stale_ids.extend(item["stale_ids"])
+            gated = item["gated"]
+            if gated is not None:
+                route = gated.label if gated.namespace else f"{gated.label} (dropped)"
+                labels[route] = labels.get(route, 0) + 1
+            if item["upsert"]:
+                stats["upserted"] += 1
+            elif entry.vector_ids:
+                stats["content_unchanged"] += 1
+            if len(done) >= 500:
+                checkpoint(done, stale_ids)
+                done, stale_ids = [], []
+        checkpoint(done, stale_ids)
+        print(pipeline.report())
+        print(f"[RAG] DLP labels of fetched docs: {labels} (mode: {GATE.mode})")
+
+        stats["errors"] = len(pipeline.errors)
+
+        # Removed keys: same order, their rows go only once the deletes ran
+        gone = [pair for e in plan.removed for pair in _vector_ids(e)]
+        delete_vectors_from_pinecone(gone)
+        delete_lexical(lexical, gone)
+        lexical.save(LEXICAL_INDEX_PATH)
+        manifest.delete(e.key for e in plan.removed)
+        return stats
+    finally:
+        manifest.close()
 
 
 def main():
-    docs = load_rag_docs_from_s3()
-    upsert_docs_to_pinecone(docs)
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="re-embed and upsert every object")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan, change nothing")
+    args = parser.parse_args()
+
+    stats = sync_incremental(full=args.full, dry_run=args.dry_run)
+    print(f"[RAG] {stats}")
+    print(f"[RAG] Embedding cache: {get_embedding_cache().info()}")
     print("[RAG] Sync complete ✅")
 
 
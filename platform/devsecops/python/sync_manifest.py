@@ -0,0 +1,167 @@
+# sync_manifest.py
+"""
+Local manifest for the incremental S3 -> vector store sync.
+
+One row per synced S3 object and sync target (bucket/index/namespace):
+
+  key, etag, last_modified, content_hash, vector_ids, namespace
+
+A sync run lists the bucket (paginated) and diffs the listing against the
+manifest with plan_sync():
+
+  * new keys, or keys whose ETag/LastModified moved  -> fetch
+  * fetched objects whose content hash is unchanged   -> manifest update only
+  * manifest keys missing from the listing            -> delete their vectors
+
+so a re-sync touches only what changed. Rows are written after the upsert
+(or delete) succeeded, so a crashed run is simply retried next time.
+"""
+import hashlib
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    key: str
+    etag: str
+    last_modified: str
+    content_hash: str
+    # ids of the vectors upserted for this object (deleted when it goes away)
+    vector_ids: Tuple[str, ...] = ()
+    # namespace the vectors went to ("" = the target's default namespace)
+    namespace: str = ""
+
+
+@dataclass
+class SyncPlan:
+    # listing entries ({"Key", "ETag", "LastModified"}) that need a GET
+    fetch: List[Dict[str, Any]] = field(default_factory=list)
+    unchanged: int = 0
+    removed: List[ManifestEntry] = field(default_factory=list)
+
+
+def content_hash(text: str, metadata: Mapping[str, Any]) -> str:
+    """Hash of what actually gets embedded/upserted for a document."""
+    doc = json.dumps({"text": text, "metadata": metadata}, sort_keys=True, default=str)
+    return hashlib.sha256(doc.encode("utf-8")).hexdigest()
+
+
+def _stamp(obj: Mapping[str, Any]) -> Dict[str, str]:
+    last_modified = obj.get("LastModified", "")
+    if hasattr(last_modified, "isoformat"):
+        last_modified = last_modified.isoformat()
+    return {"etag": str(obj.get("ETag", "")).strip('"'), "last_modified": str(last_modified)}
+
+
+def plan_sync(
+    listing: Iterable[Mapping[str, Any]],
+    entries: Mapping[str, ManifestEntry],
+    prefixes: Optional[Sequence[str]] = None,
+    force: bool = False,
+) -> SyncPlan:
+    """
+    Diff an S3 listing against the manifest. Removals are only reported for
+    keys under `prefixes` (when given), so syncing one prefix never deletes
+    another prefix's vectors. force=True fetches every listed object.
+    """
+    plan = SyncPlan()
+    seen = set()
+    for obj in listing:
+        key = obj["Key"]
+        seen.add(key)
+        entry = entries.get(key)
+        stamp = _stamp(obj)
+        if (
+            not force
+            and entry is not None
+            and entry.etag == stamp["etag"]
+            and entry.last_modified == stamp["last_modified"]
+        ):
+            plan.unchanged += 1
+        else:
+            plan.fetch.append(dict(obj))
+
+    for key, entry in entries.items():
+        if key in seen:
+            continue
+        if prefixes and not any(key.startswith(p) for p in prefixes):
+            continue
+        plan.removed.append(entry)
+    return plan
+
+
+class SyncManifest:
+    """SQLite-backed manifest scoped to one sync target."""
+
+    def __init__(self, path: Union[str, Path], target: str):
+        self.target = target
+        self._db = sqlite3.connect(str(path))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            " target TEXT NOT NULL, key TEXT NOT NULL, etag TEXT NOT NULL,"
+            " last_modified TEXT NOT NULL, content_hash TEXT NOT NULL,"
+            " vector_ids TEXT NOT NULL, namespace TEXT NOT NULL DEFAULT '',"
+            " PRIMARY KEY (target, key))"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(manifest)")}
+        if "namespace" not in columns:  # manifests written before ingestion routing
+            self._db.execute("ALTER TABLE manifest ADD COLUMN namespace TEXT NOT NULL DEFAULT ''")
+        self._db.commit()
+
+    def entries(self) -> Dict[str, ManifestEntry]:
+        rows = self._db.execute(
+            "SELECT key, etag, last_modified, content_hash, vector_ids, namespace"
+            " FROM manifest WHERE target = ?",
+            (self.target,),
+        )
+        return {
+            key: ManifestEntry(key, etag, modified, digest, tuple(json.loads(ids)), ns)
+            for key, etag, modified, digest, ids, ns in rows
+        }
+
+    @staticmethod
+    def record(
+        obj: Mapping[str, Any],
+        content_hash: str,
+        vector_ids: Sequence[str],
+        namespace: str = "",
+    ) -> ManifestEntry:
+        """Build the entry for a listed object (persist with upsert())."""
+        stamp = _stamp(obj)
+        return ManifestEntry(
+            obj["Key"], stamp["etag"], stamp["last_modified"], content_hash,
+            tuple(vector_ids), namespace,
+        )
+
+    def upsert(self, entries: Iterable[ManifestEntry]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO manifest"
+            " (target, key, etag, last_modified, content_hash, vector_ids, namespace)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    self.target, e.key, e.etag, e.last_modified, e.content_hash,
+                    json.dumps(list(e.vector_ids)), e.namespace,
+                )
+                for e in entries
+            ],
+        )
+        self._db.commit()
+
+    def delete(self, keys: Iterable[str]) -> None:
+        self._db.executemany(
+            "DELETE FROM manifest WHERE target = ? AND key = ?",
+            [(self.target, k) for k in keys],
+        )
+        self._db.commit()
+
+    def clear(self) -> None:
+        self._db.execute("DELETE FROM manifest WHERE target = ?", (self.target,))
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,177 @@
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex, IVFVectorStore
+
+
+def _clustered(n=3000, d=16, clusters=30, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, d))
+    x = centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, d))
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _index(x, **kwargs):
+    kwargs.setdefault("min_train", 10**9)
+    index = IVFIndex(x.shape[1], **kwargs)
+    index.add((f"v{i}", v, {"i": i}) for i, v in enumerate(x))
+    index.build(seed=1)
+    return index
+
+
+def _ids(index, hits):
+    return [index.ids[row] for row, _score in hits]
+
+
+def _exact(x, q, k):
+    return [f"v{i}" for i in np.argsort(-(x @ q))[:k]]
+
+
+def test_recall_improves_with_nprobe_and_full_probe_is_exact():
+    x = _clustered()
+    index = _index(x, nlist=32)
+    queries = _clustered(n=50, seed=9)
+
+    def recall(nprobe):
+        hits = [
+            len(set(_ids(index, index.search(q, 10, nprobe=nprobe))) & set(_exact(x, q, 10)))
+            for q in queries
+        ]
+        return sum(hits) / (10 * len(queries))
+
+    assert recall(8) >= 0.9
+    assert recall(1) <= recall(8)
+    assert recall(32) == 1.0
+
+
+def test_untrained_index_is_exhaustive_and_trains_at_min_train():
+    x = _clustered(n=300)
+    index = IVFIndex(16, min_train=200)
+    index.add((f"v{i}", v, {}) for i, v in enumerate(x[:100]))
+    assert not index.trained
+    assert _ids(index, index.search(x[5], 3)) == _exact(x[:100], x[5], 3)
+
+    index.add((f"v{i}", v, {}) for i, v in enumerate(x[100:], start=100))
+    assert index.trained
+    assert len(index) == 300
+
+
+def test_inserts_after_build_are_searchable_then_compacted():
+    x = _clustered()
+    index = _index(x[:2000], nlist=16)
+    index.add([("new", x[2500], {})])
+
+    assert index.tail_size == 1
+    assert _ids(index, index.search(x[2500], 1, nprobe=16)) == ["new"]
+
+    index.add((f"v{i}", v, {}) for i, v in enumerate(x[2001:], start=2001))
+    assert index.tail_size == 0  # tail outgrew compact_ratio of the base
+    assert set(_ids(index, index.search(x[2500], 2, nprobe=16))) == {"v2500", "new"}
+
+
+def test_delete_and_overwrite_use_tombstones():
+    x = _clustered(n=500)
+    index = _index(x, nlist=8)
+    index.remove(["v3"])
+    index.add([("v4", x[10], {"moved": True})])
+
+    hits = index.search(x[3], 500, nprobe=8)
+    assert "v3" not in _ids(index, hits)
+    assert len(hits) == 499
+    row = index.row_of["v4"]
+    assert index.metadata[row] == {"moved": True}
+
+    index.compact()
+    assert len(index.ids) == 499
+    assert index.row_of["v4"] == index.ids.index("v4")
+
+
+def test_filtered_search():
+    x = _clustered(n=500)
+    index = _index(x, nlist=8)
+
+    hits = index.search(x[0], 5, nprobe=8, filter={"i": {"$in": list(range(1, 500, 2))}})
+
+    assert len(hits) == 5
+    assert all(index.metadata[row]["i"] % 2 == 1 for row, _ in hits)
+
+
+def test_selective_filter_scans_matching_rows_outside_probed_lists():
+    x = _clustered(n=1000)
+    index = IVFIndex(16, nlist=16, min_train=10**9)
+    index.add(
+        (f"v{i}", v, {"dlp_label": "phi" if i % 100 == 0 else "internal"})
+        for i, v in enumerate(x)
+    )
+    index.build(seed=1)
+
+    hits = index.search(x[1], 20, nprobe=1, filter={"dlp_label": "phi"})
+
+    assert sorted(_ids(index, hits)) == sorted(f"v{i}" for i in range(0, 1000, 100))
+    index.remove(["v100"])
+    hits = index.search(x[1], 20, nprobe=1, filter={"dlp_label": {"$in": ["phi"]}})
+    assert "v100" not in _ids(index, hits) and len(hits) == 9
+
+
+def test_save_and_open_memory_maps_vectors(tmp_path):
+    x = _clustered(n=1000)
+    index = _index(x, nlist=16)
+    index.remove(["v7"])
+    index.save(tmp_path / "ix")
+
+    reopened = IVFIndex.open(tmp_path / "ix")
+    assert isinstance(reopened.base, np.memmap)
+    assert len(reopened) == 999
+    assert _ids(reopened, reopened.search(x[1], 5)) == _ids(index, index.search(x[1], 5))
+
+    reopened.add([("extra", x[7], {})])  # inserts still work on a mapped base
+    assert _ids(reopened, reopened.search(x[7], 1, nprobe=16)) == ["extra"]
+
+
+def test_store_interface_and_persistence(tmp_path):
+    x = _clustered(n=600)
+    store = IVFVectorStore(tmp_path, min_train=100, nprobe=4)
+    store.upsert([(f"v{i}", v.tolist(), {"i": i}) for i, v in enumerate(x)], namespace="kb")
+    store.upsert([("other", x[0].tolist())])
+
+    result = store.query(vector=x[42].tolist(), top_k=3, namespace="kb", filter={"i": {"$gte": 40}})
+    assert result["matches"][0]["id"] == "v42"
+    assert result["matches"][0]["metadata"] == {"i": 42}
+    assert store.query(vector=x[0].tolist(), namespace="")["matches"][0]["id"] == "other"
+
+    store.delete(ids=["v42"], namespace="kb")
+    store.save()
+    reopened = IVFVectorStore(tmp_path)
+    assert reopened.describe_index_stats()["namespaces"] == {
+        "": {"vector_count": 1},
+        "kb": {"vector_count": 599},
+    }
+    with pytest.raises(ValueError):
+        reopened.query(vector=[1.0, 0.0], namespace="kb")
+
+
+@pytest.mark.parametrize("quantizer", ["int8", "pq"])
+def test_quantized_index_reranks_and_maps_codes(tmp_path, quantizer):
+    x = _clustered(n=2000)
+    index = _index(x, nlist=16, quantizer=quantizer, pq_m=4, rerank=8)
+    queries = _clustered(n=30, seed=5)
+
+    hits = [index.search(q, 5, nprobe=16) for q in queries]
+    recall = sum(
+        len(set(_ids(index, h)) & set(_exact(x, q, 5))) for h, q in zip(hits, queries)
+    ) / (5 * len(queries))
+    assert recall >= 0.9
+    # re-ranked scores are exact inner products
+    row, score = hits[0][0]
+    assert score == pytest.approx(float(index.base[row] @ queries[0]), abs=1e-5)
+
+    index.save(tmp_path / "ix")
+    reopened = IVFIndex.open(tmp_path / "ix")
+    assert isinstance(reopened.codes, np.memmap)
+    assert reopened.codes.dtype == np.uint8
+    expected = _ids(index, index.search(queries[0], 5))
+    assert _ids(reopened, reopened.search(queries[0], 5)) == expected
+
+    reopened.add([("extra", x[9], {})])
+    reopened.compact()
+    assert "extra" in _ids(reopened, reopened.search(x[9], 2, nprobe=16))
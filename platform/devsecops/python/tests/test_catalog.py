@@ -0,0 +1,31 @@
+from dlp_catalog import BUILTIN_CATALOG, compile_catalog, get_catalog, load_catalog
+from dlp_utils import classify_text
+
+
+def test_yaml_catalog_matches_builtin_mirror():
+    from_yaml = load_catalog()
+    builtin = compile_catalog(BUILTIN_CATALOG)
+    assert from_yaml.bits == builtin.bits
+    assert from_yaml.label_masks == builtin.label_masks
+
+
+def test_priority_resolution_with_bitmasks():
+    cat = get_catalog()
+    assert cat.label_for_types([]) == "INTERNAL"
+    assert cat.label_for_types(["IP_ADDRESS"]) == "CONFIDENTIAL"
+    assert cat.label_for_types(["IP_ADDRESS", "SSN"]) == "RESTRICTED_PII"
+    assert cat.label_for_types(["SSN", "MRN"]) == "RESTRICTED_PHI"
+    assert cat.label_for_types(["NOT_IN_CATALOG"]) == "INTERNAL"
+
+
+def test_catalog_edits_change_labels_without_code():
+    doc = dict(BUILTIN_CATALOG, entities={"SSN": "RESTRICTED_PHI", "EMAIL_ADDRESS": "PUBLIC"})
+    cat = compile_catalog(doc)
+    assert cat.label_for_types(["SSN"]) == "RESTRICTED_PHI"
+    assert cat.label_for_types(["EMAIL_ADDRESS"]) == "PUBLIC"
+    assert cat.types_by_label["RESTRICTED_PHI"] == frozenset({"SSN"})
+
+
+def test_confidential_label_surfaces_in_classify_text():
+    assert classify_text("host 10.0.0.12 is down")["label"] == "confidential"
+    assert classify_text([{"type": "ICD10_CODE"}]) == "phi"
@@ -0,0 +1,83 @@
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+
+class _FakeEmbedder:
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), float(i), 0.5, -1.0][: self.dim] for i, t in enumerate(texts)]
+
+
+def test_embed_only_calls_api_for_misses(tmp_path):
+    cache = EmbeddingCache(tmp_path)
+    api = _FakeEmbedder()
+
+    first = cache.embed("m", ["alpha", "beta", "alpha"], api)
+    second = cache.embed("m", ["beta", "gamma"], api)
+
+    assert api.calls == [["alpha", "beta"], ["gamma"]]
+    assert first[0] == first[2]
+    assert second[0] == first[1]
+
+
+def test_vectors_persist_across_instances(tmp_path):
+    api = _FakeEmbedder()
+    EmbeddingCache(tmp_path).embed("m", ["alpha", "beta"], api)
+
+    reopened = EmbeddingCache(tmp_path, lru_size=1)
+    vecs = reopened.get_many("m", ["alpha", "beta", "nope"])
+
+    assert vecs[0] == pytest.approx([5.0, 0.0, 0.5, -1.0])
+    assert vecs[1] == pytest.approx([4.0, 1.0, 0.5, -1.0])
+    assert vecs[2] is None
+    assert len(api.calls) == 1
+
+
+def test_models_and_dims_are_separate(tmp_path):
+    cache = EmbeddingCache(tmp_path)
+    cache.put_many("small", ["x"], [[1.0, 2.0]])
+    cache.put_many("large", ["x"], [[1.0, 2.0, 3.0]])
+
+    reopened = EmbeddingCache(tmp_path)
+    assert reopened.get_many("small", ["x"]) == [[1.0, 2.0]]
+    assert reopened.get_many("large", ["x"]) == [[1.0, 2.0, 3.0]]
+    assert reopened.info()["stored"] == 2
+
+
+def test_raw_text_is_not_stored(tmp_path):
+    EmbeddingCache(tmp_path).put_many("m", ["SSN 123-45-6789"], [[0.1, 0.2]])
+
+    for path in tmp_path.iterdir():
+        assert b"123-45-6789" not in path.read_bytes()
+
+
+def test_lambda_defaults_to_temp_dir(monkeypatch):
+    import embedding_cache
+
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "rag-fn")
+    assert str(embedding_cache.default_cache_dir()).startswith(embedding_cache.tempfile.gettempdir())
+
+
+def test_unwritable_dir_falls_back_to_uncached_api(tmp_path, monkeypatch, caplog):
+    import embedding_cache
+
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    monkeypatch.setenv("EMBED_CACHE_DIR", str(blocker / "embeddings"))
+    monkeypatch.setattr(embedding_cache, "_CACHE", None)
+    api = _FakeEmbedder()
+
+    with caplog.at_level("WARNING", logger="embedding_cache"):
+        cache = embedding_cache.get_embedding_cache()
+    out = cache.embed("m", ["alpha", "alpha"], api)
+
+    assert isinstance(cache, embedding_cache.UncachedEmbeddings)
+    assert "Embedding cache unavailable" in caplog.text
+    assert api.calls == [["alpha"]]
+    assert out[0] == out[1]
+    monkeypatch.setattr(embedding_cache, "_CACHE", None)
@@ -0,0 +1,147 @@
+import gzip
+import json
+import threading
+import time
+
+import dlp_utils
+from evidence_writer import EvidenceWriter
+
+
+class _Sink:
+    def __init__(self):
+        self.objects = []
+
+    def __call__(self, key, body):
+        self.objects.append((key, [json.loads(l) for l in gzip.decompress(body).splitlines()]))
+
+
+def test_batches_by_size_and_flush():
+    sink = _Sink()
+    writer = EvidenceWriter("bucket", max_records=2, max_age_s=60, sink=sink)
+    for i in range(5):
+        writer.submit({"n": i})
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert [len(records) for _, records in sink.objects] == [2, 2, 1]
+    assert [r["n"] for _, records in sink.objects for r in records] == [0, 1, 2, 3, 4]
+    key = sink.objects[0][0]
+    assert key.startswith("evidence/decisions/") and key.endswith(".ndjson.gz")
+
+
+def test_batches_by_age():
+    sink = _Sink()
+    writer = EvidenceWriter("bucket", max_records=100, max_age_s=0.05, sink=sink)
+    writer.submit({"n": 1})
+    writer._thread.join(0.5)
+    assert sink.objects and sink.objects[0][1] == [{"n": 1}]
+    writer.close()
+
+
+def test_log_decision_is_queued_without_raw_values(monkeypatch):
+    sink = _Sink()
+    writer = EvidenceWriter("bucket", sink=sink)
+    monkeypatch.setattr(dlp_utils, "get_evidence_writer", lambda bucket: writer)
+
+    text = "my ssn is 123-45-6789"
+    decision_id = dlp_utils.log_decision(
+        stage="request",
+        decision="block",
+        role="analyst",
+        pii_findings=dlp_utils.detect_pii(text),
+        content_preview=dlp_utils.safe_preview(text),
+        evidence_bucket="bucket",
+    )
+    writer.close()
+
+    (record,) = sink.objects[0][1]
+    assert record["decision_id"] == decision_id
+    assert record["findings"] == [{"type": "SSN", "score": 0.99}]
+    assert "123-45-6789" not in json.dumps(record)
+
+
+def test_lambda_handler_leaves_fresh_evidence_buffered(monkeypatch):
+    import dlp_handler
+    import evidence_writer
+
+    sink = _Sink()
+    writer = EvidenceWriter("bucket", max_age_s=60, sink=sink)
+    monkeypatch.setattr(dlp_utils, "get_evidence_writer", lambda bucket: writer)
+    monkeypatch.setattr(evidence_writer, "_WRITERS", {"bucket": writer})
+
+    resp = dlp_handler.lambda_handler(
+        {"body": json.dumps({"prompt": "my ssn is 123-45-6789", "role": "analyst"})}, None
+    )
+
+    # No S3 PUT on the request path: the record waits for its batch
+    assert resp["statusCode"] == 400
+    assert sink.objects == []
+    writer.close()
+    (record,) = sink.objects[0][1]
+    assert record["decision_id"] == json.loads(resp["body"])["decision_id"]
+
+
+def test_flush_aged_writers_only_waits_for_due_batches(monkeypatch):
+    import evidence_writer
+
+    sink = _Sink()
+    writer = EvidenceWriter("bucket", max_age_s=60, sink=sink)
+    monkeypatch.setattr(evidence_writer, "_WRITERS", {"bucket": writer})
+    writer.submit({"n": 1})
+    for _ in range(100):
+        if writer.buffered_since is not None:
+            break
+        time.sleep(0.01)
+
+    assert evidence_writer.flush_aged_writers(timeout=1)
+    assert sink.objects == []
+
+    writer.buffered_since -= 61  # the environment was frozen past max_age_s
+    assert evidence_writer.flush_aged_writers(timeout=1)
+    assert sink.objects[0][1] == [{"n": 1}]
+    assert writer.buffered_since is None
+    writer.close()
+
+
+def test_register_lambda_extension(monkeypatch):
+    import evidence_writer
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    seen = []
+    release = threading.Event()
+
+    class RuntimeApi(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            seen.append((self.path, self.headers["Lambda-Extension-Name"], json.loads(body)))
+            self.send_response(200)
+            self.send_header("Lambda-Extension-Identifier", "ext-1")
+            self.end_headers()
+
+        def do_GET(self):
+            seen.append((self.path, self.headers["Lambda-Extension-Identifier"]))
+            release.wait(5)
+            self.send_response(500)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), RuntimeApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("AWS_LAMBDA_RUNTIME_API", f"127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(evidence_writer, "_EXTENSION_REGISTERED", False)
+    try:
+        assert evidence_writer.register_lambda_extension()
+        for _ in range(100):
+            if len(seen) == 2:
+                break
+            time.sleep(0.01)
+        assert seen == [
+            ("/2020-01-01/extension/register", "evidence-writer", {"events": []}),
+            ("/2020-01-01/extension/event/next", "ext-1"),
+        ]
+    finally:
+        release.set()
+        server.shutdown()
+        monkeypatch.setattr(evidence_writer, "_EXTENSION_REGISTERED", False)
@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+import dlp_utils
+
+
+def _write_flows(path, allowed):
+    path.write_text(
+        json.dumps(
+            {"flows": [{"id": "f1", "from": "a", "to": "b", "allowed": allowed}]}
+        )
+    )
+
+
+def test_policy_is_cached_until_file_changes(tmp_path, monkeypatch):
+    flows = tmp_path / "flows.json"
+    _write_flows(flows, True)
+    monkeypatch.setattr(dlp_utils, "FLOWS_JSON", flows)
+
+    first = dlp_utils.load_flow_policy()
+    assert dlp_utils.load_flow_policy() is first
+    assert dlp_utils._run_opa({"from": "a", "to": "b", "state": {}})[0] is True
+
+    _write_flows(flows, False)
+    st = flows.stat()
+    os.utime(flows, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    second = dlp_utils.load_flow_policy()
+    assert second.version != first.version
+    assert dlp_utils._run_opa({"from": "a", "to": "b", "state": {}})[0] is False
+
+
+def test_touch_without_content_change_keeps_version(tmp_path):
+    flows = tmp_path / "flows.json"
+    _write_flows(flows, True)
+    first = dlp_utils.load_flow_policy(flows)
+
+    st = flows.stat()
+    os.utime(flows, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert dlp_utils.load_flow_policy(flows).version == first.version
+    assert dlp_utils.reload_flow_policy(flows).version == first.version
+
+
+def test_missing_policy_denies(tmp_path, monkeypatch):
+    monkeypatch.setattr(dlp_utils, "FLOWS_JSON", tmp_path / "nope.json")
+    with pytest.raises(dlp_utils.PolicyLoadError):
+        dlp_utils.load_flow_policy()
+    allow, reason = dlp_utils._run_opa({"from": "a", "to": "b", "state": {}})
+    assert allow is False and "not found" in reason
+
+
+def test_flows_compile_to_indexed_predicates(tmp_path):
+    flows = tmp_path / "flows.json"
+    flows.write_text(
+        json.dumps(
+            {
+                "flows": [
+                    {
+                        "id": "first",
+                        "from": "a",
+                        "to": "b",
+                        "allowed": True,
+                        "conditions": [
+                            "classification_label not_in [RESTRICTED_PII, RESTRICTED_PHI]",
+                            "policy_decision.action in [allow,mask]",
+                            "redaction_applied == true",
+                            "something_we_do_not_know",
+                        ],
+                    },
+                    {"id": "shadowed", "from": "a", "to": "b", "allowed": False},
+                ]
+            }
+        )
+    )
+    flow = dlp_utils.load_flow_policy(flows).index[("a", "b")]
+
+    assert flow.id == "first"
+    assert [type(c) for c in flow.conditions] == [
+        dlp_utils.LabelNotIn,
+        dlp_utils.ActionIn,
+        dlp_utils.RedactionRequired,
+    ]
+    assert flow.conditions[0].labels == frozenset({"RESTRICTED_PII", "RESTRICTED_PHI"})
+    assert flow.conditions[1].violated("INTERNAL", "block", True)
+    assert not flow.conditions[2].violated("INTERNAL", "allow", True)
+
+
+def test_decision_cache_hits_and_invalidates_on_policy_change(tmp_path, monkeypatch):
+    flows = tmp_path / "flows.json"
+    _write_flows(flows, True)
+    monkeypatch.setattr(dlp_utils, "FLOWS_JSON", flows)
+    cache = dlp_utils.DecisionCache(maxsize=8)
+    monkeypatch.setattr(dlp_utils, "DECISION_CACHE", cache)
+
+    payload = {"from": "a", "to": "b", "state": {"classification_label": "INTERNAL"}}
+    assert dlp_utils._run_opa(payload)[0] is True
+    assert dlp_utils._run_opa(payload)[0] is True
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    _write_flows(flows, False)
+    st = flows.stat()
+    os.utime(flows, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert dlp_utils._run_opa(payload)[0] is False
+    assert cache.info()["misses"] == 2
+    assert cache.info()["size"] == 1
@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import pytest
+
+from gateway_server import GatewayApp
+from rag_transport import RagTransportError
+
+
+class _EchoTransport:
+    def __init__(self):
+        self.payloads = []
+
+    def send(self, payload):
+        self.payloads.append(payload)
+        return {"answer": "ok", "prompt_seen": payload["prompt"]}
+
+
+class _FailingTransport:
+    def send(self, payload):
+        raise RagTransportError("down")
+
+
+def _call(app, method, path, body=None):
+    """Drive the ASGI app directly; returns (status, json_body)."""
+    raw = b"" if body is None else json.dumps(body).encode()
+    # Split the body to exercise more_body handling
+    messages = [
+        {"type": "http.request", "body": raw[:5], "more_body": True},
+        {"type": "http.request", "body": raw[5:], "more_body": False},
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+@pytest.fixture
+def app():
+    gw = GatewayApp(transport=_EchoTransport(), scan_workers=0, io_threads=4)
+    yield gw
+    gw.close()
+
+
+def test_classify_endpoint(app):
+    status, body = _call(app, "POST", "/classify", {"text": "My SSN is 123-45-6789"})
+
+    assert status == 200
+    assert body["label"] == "restricted_pii"
+    assert any(e["type"] == "SSN" for e in body["entities"])
+
+
+def test_evaluate_endpoint_both_modes(app):
+    status, body = _call(app, "POST", "/evaluate", {"prompt": "Patient MRN 12345678 diagnosis"})
+    assert status == 200
+    assert body["blocked"] is True
+
+    status, body = _call(
+        app,
+        "POST",
+        "/evaluate",
+        {"from": "user", "to": "dlp_gateway", "state": {"classification_label": "INTERNAL"}},
+    )
+    assert status == 200
+    assert body["allow"] is True
+
+
+def test_evaluate_with_missing_policy_denies_instead_of_500(app, tmp_path, monkeypatch):
+    import dlp_utils
+
+    monkeypatch.setattr(dlp_utils, "FLOWS_JSON", tmp_path / "missing" / "flows.json")
+    status, body = _call(app, "POST", "/evaluate", {"prompt": "quarterly planning notes"})
+
+    assert status == 200
+    assert body["blocked"] is True
+    assert all("flows.json not found" in hop["reason"] for hop in body["hops"])
+
+
+def test_gateway_blocks_and_forwards(app):
+    status, body = _call(app, "POST", "/gateway", {"prompt": "SSN 123-45-6789", "role": "analyst"})
+    assert status == 400
+    assert "decision_id" in body
+    assert app.transport.payloads == []
+
+    status, body = _call(app, "POST", "/gateway", {"prompt": "What is our refund policy?", "role": "analyst"})
+    assert status == 200
+    assert body["answer"] == "ok"
+    assert app.transport.payloads[0]["dlp_classification"]["label"] == "internal"
+
+
+def test_gateway_rag_failure_is_500():
+    gw = GatewayApp(transport=_FailingTransport(), scan_workers=0, io_threads=2)
+    try:
+        status, body = _call(gw, "POST", "/gateway", {"prompt": "hello", "role": "analyst"})
+    finally:
+        gw.close()
+    assert status == 500
+    assert "decision_id" in body
+
+
+def test_request_errors(app):
+    assert _call(app, "POST", "/classify", {})[0] == 400
+    assert _call(app, "GET", "/classify")[0] == 405
+    assert _call(app, "GET", "/nope")[0] == 404
+    assert _call(app, "GET", "/healthz") == (200, {"status": "ok"})
+
+    small = GatewayApp(transport=_EchoTransport(), scan_workers=0, max_body_bytes=8)
+    assert _call(small, "POST", "/classify", {"text": "x" * 100})[0] == 413
+
+
+def test_concurrent_requests_share_the_loop(app):
+    async def one(i):
+        sent = []
+        messages = [{"type": "http.request", "body": json.dumps({"text": f"call 555-123-{i:04d}"}).encode()}]
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await app({"type": "http", "method": "POST", "path": "/classify"}, receive, send)
+        return sent[0]["status"]
+
+    async def many():
+        return await asyncio.gather(*(one(i) for i in range(50)))
+
+    assert asyncio.run(many()) == [200] * 50
+
+
+def test_repeated_prompts_hit_the_result_cache(app):
+    for _ in range(3):
+        assert _call(app, "POST", "/classify", {"text": "email me at a@b.com"})[0] == 200
+        assert _call(app, "POST", "/evaluate", {"prompt": "email me at a@b.com"})[0] == 200
+
+    info = app.cache.info()
+    assert info["misses"] == 2
+    assert info["hits"] == 4
@@ -0,0 +1,88 @@
+from hybrid_retrieval import hybrid_query, is_id_query, rrf_fuse
+from lexical_index import LexicalIndex
+from vector_store import LocalVectorStore
+
+ACL = {"dlp_label": {"$in": ["internal"]}}
+
+
+def _backends():
+    lexical = LexicalIndex()
+    lexical.upsert(
+        [
+            ("t0051", "AML.T0051 LLM prompt injection", {"dlp_label": "internal"}),
+            ("t0054", "AML.T0054 LLM jailbreak", {"dlp_label": "internal"}),
+            ("phi", "AML.T0051 incident notes for a patient", {"dlp_label": "phi"}),
+        ],
+        namespace="ns",
+    )
+    vectors = LocalVectorStore()
+    vectors.upsert(
+        [
+            ("t0051", [1.0, 0.0], {"dlp_label": "internal"}),
+            ("t0054", [0.6, 0.8], {"dlp_label": "internal"}),
+            ("phi", [1.0, 0.0], {"dlp_label": "phi"}),
+        ],
+        namespace="ns",
+    )
+    return lexical, vectors
+
+
+def _query(prompt, mode, embed, lexical, vectors):
+    return hybrid_query(
+        prompt, 2, namespace="ns", filter=ACL, index=vectors, embed=embed, lexical=lexical,
+        mode=mode,
+    )
+
+
+def test_id_queries():
+    assert is_id_query("AML.T0051")
+    assert is_id_query("AI-03, LLM01 dlp05_rag_acl.rego")
+    assert not is_id_query("what is AML.T0051")
+    assert not is_id_query("")
+    assert is_id_query("aml.t0051")
+    assert not is_id_query("gpt4")
+    assert not is_id_query("mp3 ai-03")
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    a = [{"id": "x", "score": 9.0}, {"id": "y", "score": 1.0}]
+    b = [{"id": "y", "score": 0.9}, {"id": "z", "score": 0.8}]
+    fused = rrf_fuse([a, b], top_k=3, k=60)
+    assert [m["id"] for m in fused] == ["y", "x", "z"]
+    assert fused[0]["score"] == 1 / 62 + 1 / 61
+
+
+def test_id_lookup_skips_the_embedding_call():
+    lexical, vectors = _backends()
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return [0.0, 1.0]
+
+    matches, mode = _query("AML.T0051", "hybrid", embed, lexical, vectors)
+    assert (mode, [m["id"] for m in matches], calls) == ("lexical", ["t0051"], [])
+
+    matches, mode = _query("prompt injection AML.T0051", "hybrid", embed, lexical, vectors)
+    assert mode == "hybrid" and calls == ["prompt injection AML.T0051"]
+    assert {m["id"] for m in matches} == {"t0051", "t0054"}  # ACL keeps "phi" out of both sides
+
+
+def test_fallbacks_without_one_of_the_indexes():
+    lexical, vectors = _backends()
+    matches, mode = _query("jailbreak", "hybrid", lambda t: [0.6, 0.8], None, vectors)
+    assert (mode, matches[0]["id"]) == ("vector", "t0054")
+
+    matches, mode = _query("jailbreak", "hybrid", None, lexical, None)
+    assert (mode, [m["id"] for m in matches]) == ("lexical", ["t0054"])
+
+
+def test_hybrid_falls_back_to_bm25_when_the_vector_side_fails():
+    lexical, vectors = _backends()
+
+    def embed_down(text):
+        raise ConnectionError("embeddings API unavailable")
+
+    matches, mode = _query("jailbreak", "hybrid", embed_down, lexical, vectors)
+    assert (mode, [m["id"] for m in matches]) == ("lexical", ["t0054"])
+
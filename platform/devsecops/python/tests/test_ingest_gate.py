@@ -0,0 +1,62 @@
+import pytest
+
+from ingest_gate import GateConfig, chunk_gated_doc, gate_documents
+
+DOCS = [
+    ("clean-1", "Limo booking for four people at LAX.", {"s3_key": "clean/1.json"}),
+    ("sens-1", "Patient SSN: 123-45-6789, DOB: 01/02/1980", {"s3_key": "sensitive/1.json"}),
+]
+
+
+def test_metadata_is_flat_and_filterable():
+    clean, sensitive = gate_documents(DOCS, GateConfig(namespace="default"))
+
+    assert clean.metadata["dlp_label"] == "internal"
+    assert clean.metadata["dlp_entity_count"] == 0
+    assert sensitive.metadata["dlp_label"] in {"phi", "restricted_pii"}
+    assert "SSN" in sensitive.metadata["dlp_entity_types"]
+    assert sensitive.entity_counts["SSN"] == 1
+    # original metadata kept, input not mutated
+    assert sensitive.metadata["s3_key"] == "sensitive/1.json"
+    assert "dlp_label" not in DOCS[1][2]
+    for value in sensitive.metadata.values():
+        assert isinstance(value, (str, int, bool, list))
+
+
+def test_namespace_mode_quarantines_restricted_docs():
+    clean, sensitive = gate_documents(DOCS, GateConfig(namespace="default"))
+
+    assert clean.namespace == "default"
+    assert sensitive.namespace == "default-restricted"
+    assert "123-45-6789" in sensitive.text
+
+
+def test_redact_mode_embeds_redacted_text():
+    _clean, sensitive = gate_documents(DOCS, GateConfig(namespace="default", mode="redact"))
+
+    assert sensitive.namespace == "default"
+    assert "123-45-6789" not in sensitive.text
+    assert sensitive.metadata["dlp_redacted"] is True
+
+
+def test_drop_mode_and_validation():
+    clean, sensitive = gate_documents(DOCS, GateConfig(namespace="default", mode="drop"))
+    assert clean.namespace == "default"
+    assert sensitive.namespace is None
+
+    with pytest.raises(ValueError):
+        GateConfig(namespace="default", mode="shred")
+
+
+
+def test_chunks_carry_their_own_text_for_retrieval():
+    text = "".join(f"Booking policy sentence number {i}. " for i in range(200))
+    (gated,) = gate_documents([("doc", text, {"s3_key": "kb/1.json"})], GateConfig(namespace="default"))
+    chunks = chunk_gated_doc(gated, max_tokens=64, overlap_tokens=8)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.metadata["text"] == chunk.text
+        assert chunk.metadata["parent_id"] == "doc"
+        assert chunk.metadata["dlp_label"] == "internal"
+        assert chunk.namespace == "default"
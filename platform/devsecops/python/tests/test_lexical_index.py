@@ -0,0 +1,73 @@
+import pytest
+
+from lexical_index import LexicalIndex, tokenize
+
+DOCS = [
+    ("atlas-1", "AML.T0051 LLM Prompt Injection: adversary crafts prompts",
+     {"dlp_label": "internal"}),
+    ("atlas-2", "AML.T0054 LLM Jailbreak bypasses model guardrails",
+     {"dlp_label": "internal"}),
+    ("policy", "dlp05_rag_acl restricts retrieval by role and record type",
+     {"dlp_label": "confidential"}),
+    ("notes", "prompt injection notes mention T0051 once in passing text text",
+     {"dlp_label": "phi"}),
+]
+
+
+def _index():
+    index = LexicalIndex()
+    index.upsert(DOCS, namespace="ns")
+    return index
+
+
+def _ids(result):
+    return [m["id"] for m in result["matches"]]
+
+
+def test_tokenize_keeps_identifiers_whole_and_by_parts():
+    assert tokenize("See AML.T0051, AI-03.") == [
+        "see", "aml.t0051", "aml", "t0051", "ai-03", "ai", "03"
+    ]
+    assert "dlp05_rag_acl" in tokenize("policy dlp05_rag_acl")
+
+
+def test_exact_identifier_outranks_partial_mentions():
+    index = _index()
+    assert _ids(index.query("AML.T0051", top_k=5, namespace="ns")) == ["atlas-1"]
+    assert set(_ids(index.query("T0051", top_k=5, namespace="ns"))) == {"atlas-1", "notes"}
+    # an unindexed identifier falls back to its parts
+    assert set(_ids(index.query("AML.T9999", top_k=5, namespace="ns"))) == {"atlas-1", "atlas-2"}
+    assert _ids(index.query("dlp05_rag_acl", top_k=5, namespace="ns")) == ["policy"]
+    assert index.query("unrelated words", namespace="ns")["matches"] == []
+
+
+def test_filters_apply_before_ranking():
+    index = _index()
+    result = index.query("prompt injection", top_k=5, namespace="ns",
+                         filter={"dlp_label": {"$in": ["internal", "confidential"]}})
+    assert _ids(result) == ["atlas-1"]
+    with pytest.raises(ValueError):
+        index.query("x", namespace="ns", filter={"dlp_label": {"$regex": "p"}})
+
+
+def test_delete_and_overwrite_update_postings():
+    index = _index()
+    index.delete(ids=["atlas-1"], namespace="ns")
+    index.upsert([("atlas-2", "replaced text about AML.T0051", {})], namespace="ns")
+
+    assert _ids(index.query("AML.T0051", top_k=5, namespace="ns")) == ["atlas-2"]
+    assert index.query("jailbreak", namespace="ns")["matches"] == []
+    assert index.describe_index_stats()["namespaces"]["ns"]["vector_count"] == 3
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = _index()
+    index.delete(ids=["notes"], namespace="ns")
+    path = tmp_path / "lexical.json"
+    index.save(path)
+
+    loaded = LexicalIndex.load(path)
+    assert loaded.query("AML.T0051 jailbreak", namespace="ns") == index.query(
+        "AML.T0051 jailbreak", namespace="ns"
+    )
+    assert LexicalIndex.load(tmp_path / "missing.json").describe_index_stats()["namespaces"] == {}
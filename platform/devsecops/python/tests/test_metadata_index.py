@@ -0,0 +1,76 @@
+import random
+
+import numpy as np
+
+from metadata_index import BitmapIndex, compile_filter
+
+LABELS = ["public", "internal", "confidential", "restricted_pii", "phi"]
+
+FILTERS = [
+    {"dlp_label": "phi"},
+    {"dlp_label": {"$in": ["internal", "confidential"]}},
+    {"dlp_label": {"$ne": "phi"}, "record_type": "clean"},
+    {"dlp_entity_types": "SSN"},
+    {"dlp_entity_types": {"$nin": ["SSN", "MRN"]}},
+    {"record_type": {"$exists": False}},
+    {"$or": [{"dlp_label": "phi"}, {"record_type": "sensitive"}]},
+    {"$and": [{"record_type": {"$in": ["clean"]}}, {"dlp_label": {"$in": LABELS[:3]}}]},
+    # partly unindexed: "year" and range operators go to the residual
+    {"dlp_label": "internal", "year": {"$gte": 2024}},
+    {"$or": [{"dlp_label": "phi"}, {"year": 2023}]},
+]
+
+
+def _metadata(rng):
+    meta = {
+        "dlp_label": rng.choice(LABELS),
+        "dlp_entity_types": rng.sample(["SSN", "MRN", "EMAIL_ADDRESS"], rng.randint(0, 2)),
+        "year": rng.choice([2023, 2024]),
+    }
+    if rng.random() < 0.8:
+        meta["record_type"] = rng.choice(["clean", "sensitive"])
+    return meta
+
+
+def _matching(index, flt, size, metadata):
+    mask, residual = index.resolve(flt, size)
+    rows = np.flatnonzero(mask) if mask is not None else np.arange(size)
+    return [int(r) for r in rows if residual is None or residual(metadata[r])]
+
+
+def test_bitmaps_agree_with_the_filter_predicate():
+    rng = random.Random(0)
+    metadata = [_metadata(rng) for _ in range(300)]
+    index = BitmapIndex()
+    index.rebuild(metadata)
+
+    for flt in FILTERS:
+        predicate = compile_filter(flt)
+        expected = [row for row, meta in enumerate(metadata) if predicate(meta)]
+        assert _matching(index, flt, len(metadata), metadata) == expected, flt
+
+
+def test_indexed_filters_leave_no_residual():
+    index = BitmapIndex()
+    mask, residual = index.resolve(FILTERS[7], 10)
+    assert residual is None and mask.shape == (10,)
+    assert index.resolve(None, 10) == (None, None)
+
+
+def test_add_and_discard_track_row_moves():
+    rng = random.Random(1)
+    metadata = [_metadata(rng) for _ in range(40)]
+    index = BitmapIndex()
+    for row, meta in enumerate(metadata):
+        index.add(row, meta)
+
+    # what a swap-delete does: drop row 3, move the last row into it
+    index.discard(3, metadata[3])
+    index.discard(39, metadata[39])
+    index.add(3, metadata[39])
+    metadata[3] = metadata.pop()
+
+    for flt in FILTERS:
+        predicate = compile_filter(flt)
+        expected = [row for row, meta in enumerate(metadata) if predicate(meta)]
+        assert _matching(index, flt, len(metadata), metadata) == expected, flt
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from quantization import (
+    ProductQuantizer,
+    ScalarQuantizer,
+    default_pq_m,
+    make_quantizer,
+    quantizer_from_state,
+)
+
+
+def _data(n=2000, d=32, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(n, d)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_int8_round_trip_and_scores():
+    x = _data()
+    sq = ScalarQuantizer()
+    sq.train(x)
+    codes = sq.encode(x)
+
+    assert codes.dtype == np.uint8 and codes.shape == x.shape
+    assert np.abs(sq.decode(codes) - x).max() <= sq.step.max() / 2 + 1e-6
+    q = x[0]
+    assert sq.scorer(q)(codes) == pytest.approx(sq.decode(codes) @ q, abs=1e-4)
+
+
+def test_pq_scores_match_decoded_vectors():
+    x = _data()
+    pq = ProductQuantizer(m=8)
+    pq.train(x, iters=5)
+    codes = pq.encode(x)
+
+    assert codes.shape == (2000, 8) and codes.dtype == np.uint8
+    q = x[3]
+    assert pq.scorer(q)(codes) == pytest.approx(pq.decode(codes) @ q, abs=1e-4)
+    # reconstruction beats a random codebook assignment by a wide margin
+    err = np.linalg.norm(pq.decode(codes) - x) / np.linalg.norm(x)
+    assert err < 0.9
+
+
+def test_state_round_trip():
+    x = _data(n=500)
+    for q in (ScalarQuantizer(), ProductQuantizer(m=4)):
+        q.train(x)
+        restored = quantizer_from_state(q.kind, q.state())
+        assert np.array_equal(restored.encode(x), q.encode(x))
+
+
+def test_factory():
+    assert make_quantizer(None, 32) is None
+    assert make_quantizer("none", 32) is None
+    assert isinstance(make_quantizer("int8", 32), ScalarQuantizer)
+    assert make_quantizer("pq", 1536).m == default_pq_m(1536) == 192
+    with pytest.raises(ValueError):
+        make_quantizer("fp4", 32)
+    with pytest.raises(ValueError):
+        ProductQuantizer(m=5).train(_data(n=300))
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+from rag_chunker import approx_token_count, iter_chunks
+
+TEXT = " ".join(
+    f"Sentence {i} of the policy talks about control AC-{i % 7}." for i in range(300)
+)
+
+
+def _chunks(source, **kwargs):
+    kwargs.setdefault("count_tokens", approx_token_count)
+    return list(iter_chunks("doc", source, {"source": "s3"}, **kwargs))
+
+
+def test_chunks_cover_text_within_budget_and_overlap():
+    chunks = _chunks(TEXT, max_tokens=100, overlap_tokens=20)
+
+    assert len(chunks) > 1
+    assert chunks[0].start == 0
+    assert chunks[-1].end == len(TEXT)
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert prev.start < cur.start < prev.end  # overlapping, moving forward
+    for c in chunks:
+        assert c.tokens <= 100
+        assert TEXT[c.start:c.end] == c.text
+        assert c.chunk_id == f"doc#{c.start}"
+
+
+def test_prefers_sentence_boundaries():
+    chunks = _chunks(TEXT, max_tokens=100, overlap_tokens=0)
+
+    assert all(c.text.rstrip().endswith(".") for c in chunks)
+
+
+def test_streaming_matches_one_shot():
+    one_shot = _chunks(TEXT, max_tokens=80, overlap_tokens=16)
+    pieces = [TEXT[i:i + 37] for i in range(0, len(TEXT), 37)]
+
+    assert _chunks(iter(pieces), max_tokens=80, overlap_tokens=16) == one_shot
+    assert _chunks(io.StringIO(TEXT), max_tokens=80, overlap_tokens=16) == one_shot
+
+
+def test_editing_the_tail_keeps_earlier_chunk_ids():
+    before = _chunks(TEXT, max_tokens=100, overlap_tokens=20)
+    after = _chunks(TEXT + " An appended paragraph.", max_tokens=100, overlap_tokens=20)
+
+    assert [c.chunk_id for c in after[:-2]] == [c.chunk_id for c in before[:-2]]
+
+
+def test_long_whitespace_free_runs_are_split():
+    blob = "A" * 5000
+    chunks = _chunks(blob, max_tokens=100, overlap_tokens=0)
+
+    assert len(chunks) > 1
+    assert "".join(c.text for c in chunks) == blob
+    assert all(c.tokens <= 100 for c in chunks)
+
+
+def test_metadata_carries_parent_and_offsets():
+    chunk = _chunks("short doc")[0]
+
+    assert chunk.metadata == {
+        "source": "s3",
+        "parent_id": "doc",
+        "chunk_index": 0,
+        "chunk_start": 0,
+        "chunk_end": 9,
+    }
+
+
+def test_empty_text_has_no_chunks():
+    assert _chunks("") == []
+
+
+@pytest.mark.parametrize("max_tokens, overlap", [(0, 0), (10, 10), (10, -1)])
+def test_rejects_bad_budgets(max_tokens, overlap):
+    with pytest.raises(ValueError):
+        _chunks(TEXT, max_tokens=max_tokens, overlap_tokens=overlap)
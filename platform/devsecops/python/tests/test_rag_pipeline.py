@@ -0,0 +1,76 @@
+import threading
+import time
+
+from rag_pipeline import Pipeline, RateLimiter, Stage
+
+
+def _lengths(batch):
+    return [len(x) for x in batch]
+
+
+def test_stages_run_in_sequence_and_drop_none():
+    pipe = Pipeline(
+        [
+            Stage("double", lambda x: x * 2, workers=4),
+            Stage("odd_out", lambda x: None if x % 3 == 0 else x, workers=2),
+            Stage("sum_batch", lambda xs: [x + 1 for x in xs], batch_size=8),
+        ]
+    )
+    out = sorted(pipe.run(range(100)))
+
+    assert out == sorted(x * 2 + 1 for x in range(100) if (x * 2) % 3)
+    assert pipe.stats[0].items_out == 100
+    assert pipe.stats[2].items_in == len(out)
+    assert "sum_batch" in pipe.report()
+
+
+def test_failures_are_counted_and_dropped():
+    def flaky(x):
+        if x == 7:
+            raise ValueError("bad item")
+        return x
+
+    pipe = Pipeline([Stage("flaky", flaky, workers=3)])
+    out = sorted(pipe.run(range(10)))
+
+    assert out == [x for x in range(10) if x != 7]
+    assert pipe.stats[0].errors == 1
+    assert pipe.errors[0][0] == "flaky"
+
+
+def test_bounded_queues_apply_back_pressure():
+    produced = []
+    gate = threading.Event()
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    def slow(x):
+        gate.wait(2)
+        return x
+
+    pipe = Pipeline([Stage("slow", slow, queue_size=4)])
+    results = pipe.run(source())
+    t = threading.Thread(target=lambda: list(results))
+    t.start()
+    time.sleep(0.1)
+    # stalled stage: the feeder can only run ahead by roughly the queue size
+    assert len(produced) <= 8
+    gate.set()
+    t.join()
+    assert len(produced) == 100
+
+
+def test_process_stage_batches():
+    pipe = Pipeline([Stage("lengths", _lengths, batch_size=4, executor="process")], process_workers=2)
+    assert sorted(pipe.run(["a", "bb", "ccc", "dddd", "eeeee"])) == [1, 2, 3, 4, 5]
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(rate=50, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.09
@@ -0,0 +1,155 @@
+import io
+import json
+
+import pytest
+
+from rag_transport import (
+    HttpTransport,
+    InProcessTransport,
+    LambdaTransport,
+    RagTransportError,
+    transport_from_env,
+)
+
+
+class _FakeLambda:
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = []
+
+    def invoke(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"Payload": io.BytesIO(self.payload)}
+
+
+def test_lambda_transport_round_trip():
+    client = _FakeLambda(json.dumps({"answer": "ok"}).encode())
+    out = LambdaTransport("rag-fn", client=client).send({"prompt": "hi"})
+
+    assert out == {"answer": "ok"}
+    assert client.calls[0]["FunctionName"] == "rag-fn"
+    assert json.loads(client.calls[0]["Payload"]) == {"prompt": "hi"}
+
+
+def test_lambda_transport_bad_payload():
+    with pytest.raises(RagTransportError):
+        LambdaTransport("rag-fn", client=_FakeLambda(b"not json")).send({})
+
+
+def test_transport_selection(monkeypatch):
+    monkeypatch.setenv("DLP_RAG_TRANSPORT", "inprocess")
+    assert isinstance(transport_from_env(), InProcessTransport)
+
+    monkeypatch.setenv("DLP_RAG_TRANSPORT", "http")
+    monkeypatch.setenv("RAG_HTTP_URL", "http://localhost:8080/rag")
+    assert isinstance(transport_from_env(), HttpTransport)
+
+    monkeypatch.setenv("DLP_RAG_TRANSPORT", "lambda")
+    monkeypatch.delenv("RAG_LAMBDA_NAME", raising=False)
+    with pytest.raises(RagTransportError):
+        transport_from_env()
+
+    monkeypatch.setenv("DLP_RAG_TRANSPORT", "carrier-pigeon")
+    with pytest.raises(RagTransportError):
+        transport_from_env()
+
+
+def test_inprocess_transport_wraps_orchestrator_errors(monkeypatch):
+    import rag_handler
+
+    def boom(event, context):
+        raise ValueError("index unavailable")
+
+    monkeypatch.setattr(rag_handler, "lambda_handler", boom)
+    with pytest.raises(RagTransportError, match="index unavailable"):
+        InProcessTransport().send({"prompt": "hi", "user_role": "analyst"})
+
+
+def test_dlp_handler_returns_500_with_decision_id_on_transport_error(monkeypatch):
+    import dlp_handler
+
+    monkeypatch.setenv("DLP_RAG_TRANSPORT", "lambda")
+    monkeypatch.delenv("RAG_LAMBDA_NAME", raising=False)
+    resp = dlp_handler.lambda_handler(
+        {"body": json.dumps({"prompt": "summarize the runbook", "role": "analyst"})}, None
+    )
+
+    body = json.loads(resp["body"])
+    assert resp["statusCode"] == 500
+    assert "RAG_LAMBDA_NAME" in body["details"]
+    assert body["decision_id"]
+
+
+def test_inprocess_transport_needs_no_cloud_clients():
+    import rag_handler
+
+    out = InProcessTransport().send(
+        {
+            "prompt": "what is the weather",
+            "user_role": "analyst",
+            "dlp_classification": {"label": "internal", "entity_types": []},
+        }
+    )
+
+    assert out["ingress_label"] == "internal"
+    assert "[STUBBED ANSWER]" in out["answer"]
+    # Stub model: the Bedrock client is never built
+    assert rag_handler.get_bedrock_client.cache_info().currsize == 0
+
+
+def test_rag_handler_does_not_rescan_unclassified_prompts(monkeypatch):
+    import dlp_utils
+    import rag_handler
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("prompt was re-classified")
+
+    monkeypatch.setattr(dlp_utils, "classify_label", no_scan)
+    monkeypatch.setattr(dlp_utils, "classify_text", no_scan)
+    out = rag_handler.lambda_handler({"prompt": "what is the weather", "user_role": "analyst"}, None)
+
+    assert out["ingress_label"] is None
+
+
+def test_rag_handler_import_defers_retrieval_stack():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = (
+        "import sys, rag_handler; "
+        "heavy = {'numpy', 'lexical_index', 'hybrid_retrieval', 'embedding_cache', "
+        "'result_cache', 'retrieval_acl'}; "
+        "print(sorted(heavy & set(sys.modules)))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_answers_from_failed_retrieval_or_model_are_not_cached(monkeypatch):
+    import rag_handler
+
+    cache = rag_handler.get_answer_cache()
+    event = {"prompt": "what changed in AI-03?", "user_role": "analyst"}
+    key = cache.key_for("answer", rag_handler.MODEL_ID, "analyst", event["prompt"])
+
+    monkeypatch.setattr(rag_handler, "_retrieve", lambda prompt, role: ("", False))
+    rag_handler.lambda_handler(event, None)
+    assert cache.get(key) is None
+
+    monkeypatch.setattr(rag_handler, "_retrieve", lambda prompt, role: ("ctx", True))
+    monkeypatch.setattr(
+        rag_handler, "call_llm", lambda prompt, ctx: f"{rag_handler.MODEL_ERROR_PREFIX}: throttled"
+    )
+    assert rag_handler.lambda_handler(event, None)["answer"].endswith("throttled")
+    assert cache.get(key) is None
+
+    monkeypatch.setattr(rag_handler, "call_llm", lambda prompt, ctx: "fine answer")
+    assert rag_handler.lambda_handler(event, None)["answer"] == "fine answer"
+    assert cache.get(key) == "fine answer"
@@ -0,0 +1,40 @@
+from dlp_redact import FORMAT_PRESERVING, full_mask, last4, redact
+from dlp_utils import detect_entities, mask_text
+
+
+def test_strategies():
+    assert full_mask("SSN", "123-45-6789") == "[SSN]"
+    assert last4("SSN", "123-45-6789") == "***-**-6789"
+    token = FORMAT_PRESERVING("PASSPORT", "AB1234567")
+    assert token == FORMAT_PRESERVING("PASSPORT", "AB1234567")
+    assert token != "AB1234567"
+    assert token[:2].isalpha() and token[:2].isupper() and token[2:].isdigit()
+
+
+def test_redact_every_occurrence_in_one_pass():
+    text = "ssn 123-45-6789, mail a@b.io, ssn 987-65-4321."
+    out = redact(text, detect_entities(text))
+    assert out.text == "ssn ***-**-6789, mail [EMAIL_ADDRESS], ssn ***-**-4321."
+    assert out.counts_by_type == {"SSN": 2, "EMAIL_ADDRESS": 1}
+
+
+def test_overlapping_and_offsetless_spans_are_ignored_safely():
+    text = "abcdef"
+    spans = [
+        {"type": "X", "start": 1, "end": 4},
+        {"type": "Y", "start": 2, "end": 5},
+        {"type": "SSN", "value": "SSN"},
+    ]
+    assert redact(text, spans).text == "a[X]ef"
+
+
+def test_mask_text_sets_redaction_applied_accurately():
+    masked, state = mask_text("patient card 4111 1111 1111 1111", {"classification_label": "RESTRICTED_PII"})
+    assert masked == "patient card **** **** **** 1111"
+    assert state["redaction_applied"] is True
+    assert state["policy_decision"]["action"] == "mask"
+    assert state["classification_label"] == "RESTRICTED_PII"
+
+    clean, state = mask_text("nothing to see")
+    assert clean == "nothing to see"
+    assert state["redaction_applied"] is False
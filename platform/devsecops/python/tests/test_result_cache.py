@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from result_cache import ResultCache, Uncached
+
+
+def test_keys_are_opaque_and_content_addressed():
+    cache = ResultCache(key=b"k")
+    key = cache.key_for("classify", "SSN 123-45-6789")
+
+    assert "123-45-6789" not in key
+    assert key == cache.key_for("classify", "SSN 123-45-6789")
+    assert key != cache.key_for("evaluate", "SSN 123-45-6789")
+    assert key != ResultCache(key=b"other").key_for("classify", "SSN 123-45-6789")
+
+
+def test_ttl_and_size_bounds():
+    now = [0.0]
+    cache = ResultCache(max_entries=2, ttl_s=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # refresh a
+    cache.put("c", 3)  # evicts b
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+
+
+def test_sync_coalescing_runs_once():
+    cache = ResultCache()
+    calls = []
+    gate = threading.Event()
+
+    def compute():
+        calls.append(1)
+        gate.wait(1)
+        return "answer"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert results == ["answer"] * 8
+    assert len(calls) == 1
+    assert cache.info()["coalesced"] == 7
+    assert cache.get_or_compute("k", compute) == "answer" and len(calls) == 1
+
+
+def test_failures_are_shared_but_not_cached():
+    cache = ResultCache()
+
+    def boom():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", boom)
+    assert cache.get_or_compute("k", lambda: 42) == 42
+
+
+def test_uncached_results_are_returned_but_not_stored():
+    cache = ResultCache()
+
+    assert cache.get_or_compute("k", lambda: Uncached("degraded")) == "degraded"
+    assert cache.get("k") is None
+    assert cache.get_or_compute("k", lambda: "fresh") == "fresh"
+
+    async def degraded():
+        return Uncached("degraded")
+
+    assert asyncio.run(cache.get_or_compute_async("a", degraded)) == "degraded"
+    assert cache.get("a") is None
+
+
+def test_async_coalescing_runs_once():
+    cache = ResultCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"label": "internal"}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute_async("k", compute) for _ in range(20)))
+
+    results = asyncio.run(main())
+
+    assert all(r == {"label": "internal"} for r in results)
+    assert len(calls) == 1
+    assert cache.get("k") == {"label": "internal"}
+
+
+def test_disabled_cache_still_coalesces():
+    cache = ResultCache(max_entries=0)
+    assert cache.get_or_compute("k", lambda: 1) == 1
+    assert cache.get("k") is None
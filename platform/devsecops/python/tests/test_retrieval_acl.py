@@ -0,0 +1,45 @@
+from retrieval_acl import BUILTIN_ACL, RAG_ACL_PATH, RetrievalAcl, load_acl
+from vector_store import LocalVectorStore
+
+
+def test_builtin_acl_mirrors_the_rego_data_file():
+    assert load_acl() == RetrievalAcl.from_data(BUILTIN_ACL)
+    assert load_acl(RAG_ACL_PATH.with_name("missing.json")) == load_acl()
+
+
+def test_filter_for_admits_only_readable_records():
+    acl = RetrievalAcl.from_data(BUILTIN_ACL)
+    store = LocalVectorStore()
+    docs = [
+        ("clean-internal", {"record_type": "clean", "dlp_label": "internal"}),
+        ("clean-phi", {"record_type": "clean", "dlp_label": "phi"}),
+        ("sensitive-internal", {"record_type": "sensitive", "dlp_label": "internal"}),
+        ("untagged", {}),
+    ]
+    store.upsert([(doc_id, [1.0, 0.0], meta) for doc_id, meta in docs])
+
+    def visible(role, labels=None):
+        result = store.query(vector=[1.0, 0.0], top_k=10, filter=acl.filter_for(role, labels))
+        return sorted(m["id"] for m in result["matches"])
+
+    for role in ("analyst", "dlp-admin"):
+        assert visible(role) == [doc_id for doc_id, meta in docs if acl.allows(role, meta)]
+    assert visible("analyst") == ["clean-internal"]
+    assert visible("dlp-admin") == ["clean-internal", "clean-phi", "sensitive-internal"]
+    assert visible("dlp-admin", labels=["phi"]) == ["clean-phi"]
+
+
+def test_unknown_role_or_empty_clearance_gets_no_filter():
+    acl = RetrievalAcl.from_data(BUILTIN_ACL)
+    assert acl.filter_for("unknown") is None
+    assert acl.filter_for("analyst", labels=["phi"]) is None
+
+
+def test_single_role_string_form_is_accepted():
+    acl = RetrievalAcl.from_data(
+        {"roles": {"allowed": {"clean": "member"}, "labels": {"member": ["internal"]}}}
+    )
+    assert acl.allows("member", {"record_type": "clean", "dlp_label": "internal"})
+    # The label check applies to the string form too (as in the rego)
+    assert not acl.allows("member", {"record_type": "clean", "dlp_label": "phi"})
+    assert acl.record_types_for("analyst") == ()
@@ -0,0 +1,146 @@
+from dlp_scanner import DEFAULT_SCANNER, Detector, EntityScanner, Span
+from dlp_utils import (
+    classify_label,
+    classify_text,
+    classify_texts,
+    detect_entities,
+    iter_spans,
+    mask_text,
+)
+
+
+def test_reports_every_ssn_with_offsets():
+    text = "a 123-45-6789 b 987-65-4321"
+    ssns = [e for e in detect_entities(text) if e["type"] == "SSN"]
+    assert [e["value"] for e in ssns] == ["123-45-6789", "987-65-4321"]
+    assert all(text[e["start"]:e["end"]] == e["value"] for e in ssns)
+
+
+def test_value_group_offsets_cover_only_the_value():
+    text = "Routing number 021000021 on file"
+    (ent,) = [e for e in detect_entities(text) if e["type"] == "ROUTING"]
+    assert ent["value"] == "021000021"
+    assert text[ent["start"]:ent["end"]] == "021000021"
+
+
+def test_catalog_entity_types_detected():
+    text = (
+        "Mail jane.doe@example.com or call (555) 123-4567, "
+        "card 4111 1111 1111 1111, host 10.0.0.12, passport no X1234567"
+    )
+    types = {e["type"] for e in detect_entities(text)}
+    assert {"EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD", "IP_ADDRESS", "PASSPORT"} <= types
+
+
+def test_validator_rejects_non_luhn_card():
+    types = {e["type"] for e in detect_entities("order 4111 1111 1111 1112 shipped")}
+    assert "CREDIT_CARD" not in types
+
+
+def test_rejected_card_candidate_does_not_hide_an_ssn():
+    for text in (
+        "2024 123-45-6789 on file",
+        "Employee 00421 123-45-6789",
+        "acct 1234 123-45-6789",
+        "MRN: 123-45-6789",
+    ):
+        out = classify_text(text)
+        assert out["label"] in ("restricted_pii", "phi"), text
+        assert "123-45-6789" in [e["value"] for e in out["entities"] if e["type"] == "SSN"], text
+
+
+def test_keyword_detectors_do_not_hide_entities_before_their_value():
+    text = "passport for 123-45-6789 A1234567; driver's license of a@b.io is D7654321"
+    found = {(e["type"], e["value"]) for e in detect_entities(text)}
+    assert {
+        ("PASSPORT", "A1234567"),
+        ("SSN", "123-45-6789"),
+        ("DRIVERS_LICENSE", "D7654321"),
+        ("EMAIL_ADDRESS", "a@b.io"),
+    } <= found
+
+    masked = mask_text(text)[0]
+    assert "123-45-6789" not in masked and "a@b.io" not in masked
+
+    # Same spans when streamed in small chunks, each reported once
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    streamed = list(DEFAULT_SCANNER.iter_stream(chunks, overlap=100))
+    assert sorted(streamed) == sorted(iter_spans(text))
+    assert len(DEFAULT_SCANNER.scan("passport passport A1234567")) == 1
+
+
+def test_loose_phi_pii_detectors_need_full_shape():
+    for text in (
+        "I am taking over the project tomorrow",
+        "We are taking care of quarterly planning",
+        "rx: this",
+        "Meet at 10 main st",
+        "version 1.2.3.4 released",
+    ):
+        assert classify_text(text) == {"label": "internal", "entities": []}, text
+
+
+def test_medication_address_and_ip_shapes():
+    def types(text):
+        return {e["type"] for e in detect_entities(text)}
+
+    assert "MEDICATION" in types("Patient is taking lisinopril 10 mg daily")
+    assert "MEDICATION" in types("rx: zyrtec 10 mg")
+    assert "ADDRESS" in types("Ship to 123 Main St, Springfield")
+    assert "ADDRESS" in types("42 Elm Ave Apt 4")
+    assert "IP_ADDRESS" in types("login from 192.168.1.20")
+
+
+def test_mrn_and_phi_hint_classify_as_phi():
+    out = classify_text("Patient MRN 998877, chest pain since 3am.")
+    assert out["label"] == "phi"
+    mrn = [e for e in out["entities"] if e["type"] == "MRN"]
+    assert mrn and mrn[0]["value"] == "998877"
+
+
+def test_custom_scanner_single_pass_order():
+    scanner = EntityScanner(
+        [Detector("A", r"foo", 0.5), Detector("B", r"bar(?P<value>\d+)", 0.6)]
+    )
+    found = [(d.entity_type, v, s, e) for d, v, s, e in scanner.finditer("bar12 foo")]
+    assert found == [("B", "12", 3, 5), ("A", "foo", 6, 9)]
+    assert DEFAULT_SCANNER.scan("") == []
+
+
+def test_iter_spans_streams_every_occurrence():
+    text = " ".join(["123-45-6789"] * 50)
+    spans = list(iter_spans(text))
+    assert len(spans) == 50
+    assert spans[1] == Span("SSN", 12, 23, 0.99)
+
+
+def test_classify_label_matches_classify_text_and_stops_early():
+    for text in (
+        "Patient MRN 998877, chest pain since 3am.",
+        "My SSN is 123-45-6789.",
+        "Schedule a limo in LA tomorrow.",
+    ):
+        assert classify_label(text) == classify_text(text)["label"]
+
+    spans = iter_spans("patient 123-45-6789")
+    assert next(spans).type == "PHI_HINT"
+
+
+def test_classify_texts_is_columnar_and_matches_single_text_api():
+    texts = [
+        "My SSN is 123-45-6789 and 987-65-4321.",
+        "Patient MRN 998877",
+        "Schedule a limo in LA tomorrow.",
+    ]
+    out = classify_texts(texts)
+
+    assert out["labels"] == [classify_text(t)["label"] for t in texts]
+    assert out["entity_counts"][0] == {"SSN": 2}
+    assert out["entity_counts"][2] == {}
+    assert [s.type for s in out["spans"][1]] == ["PHI_HINT", "MRN"]
+
+
+def test_classify_texts_process_pool_preserves_order():
+    texts = ["123-45-6789", "nothing here", "patient"] * 10
+    out = classify_texts(texts, workers=2, chunksize=4)
+    assert out["labels"] == ["restricted_pii", "internal", "phi"] * 10
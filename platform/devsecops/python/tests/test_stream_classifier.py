@@ -0,0 +1,52 @@
+import io
+
+from dlp_utils import classify_stream, detect_entities, iter_stream_spans
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_ssn_split_across_chunks_found_once_with_global_offsets():
+    text = ("lorem ipsum " * 40) + "ssn 123-45-6789 " + ("dolor sit " * 40)
+    expected = [(e["type"], e["start"], e["end"]) for e in detect_entities(text)]
+
+    for size in (1, 7, 64, 500):
+        spans = list(iter_stream_spans(_chunks(text, size), overlap=32))
+        assert [(s.type, s.start, s.end) for s in spans] == expected
+
+
+def test_chunk_boundary_does_not_create_false_ssn():
+    text = "x" * 300 + "9123-45-6789 " + "y" * 300
+    spans = list(iter_stream_spans(_chunks(text, 301), overlap=32))
+    assert spans == []
+
+
+def test_binary_file_object_with_multibyte_chars():
+    text = "café " * 100 + "routing number 021000021 " + "naïve " * 100
+    spans = list(iter_stream_spans(io.BytesIO(text.encode("utf-8")), chunk_size=33))
+    (span,) = spans
+    assert text[span.start:span.end] == "021000021"
+
+
+def test_classify_stream_short_circuits_on_phi():
+    consumed = []
+
+    def source():
+        for piece in ["patient MRN 42 ", "x" * 1000, "123-45-6789", "y" * 1000]:
+            consumed.append(piece)
+            yield piece
+
+    out = classify_stream(source(), overlap=16)
+    assert out["label"] == "phi"
+    assert out["complete"] is False
+    assert len(consumed) < 4
+
+
+def test_classify_stream_full_scan_for_pii():
+    out = classify_stream(io.StringIO("card 4111 1111 1111 1111 and 123-45-6789"), chunk_size=5)
+    assert out == {
+        "label": "restricted_pii",
+        "entity_counts": {"CREDIT_CARD": 1, "SSN": 1},
+        "complete": True,
+    }
@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+from sync_manifest import ManifestEntry, SyncManifest, content_hash, plan_sync
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+T1 = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+
+def _obj(key, etag="e1", modified=T0):
+    return {"Key": key, "ETag": f'"{etag}"', "LastModified": modified}
+
+
+def test_plan_fetches_only_new_and_changed(tmp_path):
+    manifest = SyncManifest(tmp_path / "m.sqlite", target="bucket|index|ns")
+    manifest.upsert(
+        [
+            manifest.record(_obj("clean/a.json"), "h-a", ["a"]),
+            manifest.record(_obj("clean/b.json"), "h-b", ["b"]),
+            manifest.record(_obj("clean/gone.json"), "h-g", ["g"]),
+            manifest.record(_obj("other/keep.json"), "h-k", ["k"]),
+        ]
+    )
+
+    listing = [
+        _obj("clean/a.json"),  # unchanged
+        _obj("clean/b.json", etag="e2", modified=T1),  # changed
+        _obj("clean/new.json"),  # new
+    ]
+    plan = plan_sync(listing, manifest.entries(), prefixes=["clean/"])
+
+    assert plan.unchanged == 1
+    assert [o["Key"] for o in plan.fetch] == ["clean/b.json", "clean/new.json"]
+    # other/ wasn't listed this run, so it is not treated as removed
+    assert [e.key for e in plan.removed] == ["clean/gone.json"]
+    assert plan.removed[0].vector_ids == ("g",)
+
+    forced = plan_sync(listing, manifest.entries(), prefixes=["clean/"], force=True)
+    assert len(forced.fetch) == 3
+
+
+def test_manifest_round_trip_is_scoped_by_target(tmp_path):
+    path = tmp_path / "m.sqlite"
+    one = SyncManifest(path, target="t1")
+    one.upsert([ManifestEntry("k", "e", "2026-01-01T00:00:00+00:00", "h", ("k#0", "k#1"))])
+    one.close()
+
+    assert SyncManifest(path, target="t1").entries()["k"].vector_ids == ("k#0", "k#1")
+    assert SyncManifest(path, target="t2").entries() == {}
+
+    again = SyncManifest(path, target="t1")
+    again.delete(["k"])
+    assert again.entries() == {}
+
+
+def test_content_hash_tracks_text_and_metadata():
+    base = content_hash("hello", {"a": 1, "b": 2})
+    assert base == content_hash("hello", {"b": 2, "a": 1})
+    assert base != content_hash("hello!", {"a": 1, "b": 2})
+    assert base != content_hash("hello", {"a": 1})
+
+
+def test_manifest_keeps_the_vector_namespace(tmp_path):
+    manifest = SyncManifest(tmp_path / "m.sqlite", target="t")
+    manifest.upsert([manifest.record(_obj("sensitive/1.json"), "h", ["s1"], "default-restricted")])
+
+    assert manifest.entries()["sensitive/1.json"].namespace == "default-restricted"
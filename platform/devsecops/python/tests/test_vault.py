@@ -0,0 +1,85 @@
+import pytest
+
+from dlp_handler import screen_prompt
+from dlp_utils import mask_text
+from dlp_vault import TokenVault, VaultConfigError, get_vault
+
+
+def test_tokens_are_deterministic_and_reversible(tmp_path):
+    path = str(tmp_path / "vault.sqlite")
+    vault = TokenVault(b"k" * 32, path, cache_size=2)
+    tokens = vault.tokenize_many([("SSN", "123-45-6789"), ("MRN", "998877"), ("SSN", "123-45-6789")])
+
+    assert tokens[0] == tokens[2] != tokens[1]
+    assert tokens[0].startswith("TOK_SSN_")
+
+    # A fresh instance with the same key reads through to the store
+    other = TokenVault(b"k" * 32, path)
+    assert other.detokenize_many(tokens + ["TOK_SSN_aaaaaaaaaaaaaaaa"]) == [
+        "123-45-6789",
+        "998877",
+        "123-45-6789",
+        None,
+    ]
+    assert TokenVault(b"x" * 32).token_for("SSN", "123-45-6789") != tokens[0]
+
+
+def test_mask_then_restore_for_authorized_role_only():
+    vault = TokenVault(b"k" * 32)
+    text = "ssn 123-45-6789 and mail a@b.io"
+    masked, state = mask_text(text, vault=vault)
+
+    assert "123-45-6789" not in masked and "TOK_SSN_" in masked
+    assert "[EMAIL_ADDRESS]" in masked
+    assert state["redaction_applied"] is True
+
+    assert vault.detokenize_for_role(masked, "dlp-admin") == "ssn 123-45-6789 and mail [EMAIL_ADDRESS]"
+    assert vault.detokenize_for_role(masked, "analyst") == masked
+
+
+def test_shared_vault_requires_key_and_store(monkeypatch):
+    monkeypatch.delenv("DLP_TOKEN_KEY", raising=False)
+    monkeypatch.delenv("DLP_VAULT_PATH", raising=False)
+    with pytest.raises(VaultConfigError):
+        get_vault(shared=True)
+
+    monkeypatch.setenv("DLP_TOKEN_KEY", "k" * 32)
+    with pytest.raises(VaultConfigError):
+        get_vault(shared=True)
+
+
+def test_unshared_vault_falls_back_to_irreversible_masking(monkeypatch):
+    monkeypatch.setenv("DLP_RAG_TRANSPORT", "lambda")
+    monkeypatch.delenv("DLP_TOKEN_KEY", raising=False)
+    monkeypatch.delenv("DLP_VAULT_PATH", raising=False)
+
+    screened = screen_prompt("my ssn is 123-45-6789", "dlp-admin")
+    prompt = screened["forward_payload"]["prompt"]
+
+    assert screened["decision"] == "mask"
+    assert "123-45-6789" not in prompt and "TOK_" not in prompt
+
+
+def test_rag_handler_needs_no_vault_without_tokens(monkeypatch):
+    import rag_handler
+
+    monkeypatch.delenv("DLP_TOKEN_KEY", raising=False)
+    monkeypatch.delenv("DLP_VAULT_PATH", raising=False)
+    event = {"prompt": "what is our retention policy?", "user_role": "dlp-admin"}
+
+    # A Lambda context: the vault would have to be shared, and isn't
+    out = rag_handler.lambda_handler(event, object())
+    assert "[STUBBED ANSWER]" in out["answer"]
+
+    event["prompt"] = "restore TOK_SSN_aaaaaaaaaaaaaaaa"
+    out = rag_handler.lambda_handler(event, object())
+    assert "TOK_SSN_aaaaaaaaaaaaaaaa" in out["answer"]
+
+
+def test_unresolved_tokens_are_logged(caplog):
+    vault = TokenVault(b"k" * 32)
+    text = "ssn TOK_SSN_aaaaaaaaaaaaaaaa"
+
+    with caplog.at_level("WARNING", logger="dlp_vault"):
+        assert vault.detokenize_text(text) == text
+    assert "1 vault token(s) could not be resolved" in caplog.text
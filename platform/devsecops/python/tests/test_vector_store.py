@@ -0,0 +1,125 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import vector_store
+from vector_store import LocalVectorStore, compile_filter, get_vector_store, local_namespace
+
+SAMPLE = Path(__file__).resolve().parents[3] / "mlsecops" / "rag" / "sample_embeddings.json"
+
+
+def _store():
+    store = LocalVectorStore()
+    store.upsert(
+        [
+            ("a", [1.0, 0.0, 0.0], {"source": "policy_doc", "year": 2023}),
+            ("b", [0.9, 0.1, 0.0], {"source": "kb_article", "year": 2024}),
+            {"id": "c", "values": [0.0, 1.0, 0.0], "metadata": {"tags": ["phi", "s3"]}},
+            ("d", [0.0, 0.0, 5.0]),
+        ],
+        namespace="ns",
+    )
+    return store
+
+
+def _ids(result):
+    return [m["id"] for m in result["matches"]]
+
+
+def test_cosine_top_k_matches_brute_force():
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(200, 8)).astype(np.float32)
+    store = LocalVectorStore()
+    store.upsert([(f"v{i}", v.tolist(), {}) for i, v in enumerate(vectors)])
+    q = rng.normal(size=8)
+
+    result = store.query(vector=q.tolist(), top_k=10)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(unit @ (q / np.linalg.norm(q))))[:10]
+    assert _ids(result) == [f"v{i}" for i in expected]
+    scores = [m["score"] for m in result["matches"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_scores_are_cosine_and_scale_invariant():
+    result = _store().query(vector=[0.0, 0.0, 0.1], top_k=1, namespace="ns")
+
+    assert result["matches"][0]["id"] == "d"
+    assert result["matches"][0]["score"] == pytest.approx(1.0)
+
+
+def test_namespaces_are_isolated():
+    store = _store()
+    store.upsert([("x", [1.0, 0.0, 0.0], {})], namespace="other")
+
+    assert _ids(store.query(vector=[1, 0, 0], top_k=10, namespace="other")) == ["x"]
+    assert "x" not in _ids(store.query(vector=[1, 0, 0], top_k=10, namespace="ns"))
+    assert store.query(vector=[1, 0, 0], namespace="missing")["matches"] == []
+
+
+def test_metadata_filters():
+    store = _store()
+
+    def ids(flt):
+        return sorted(_ids(store.query(vector=[1, 1, 1], top_k=10, namespace="ns", filter=flt)))
+
+    assert ids({"source": "kb_article"}) == ["b"]
+    assert ids({"source": {"$in": ["kb_article", "policy_doc"]}}) == ["a", "b"]
+    assert ids({"year": {"$gte": 2024}}) == ["b"]
+    assert ids({"tags": "phi"}) == ["c"]
+    assert ids({"tags": {"$nin": ["phi"]}}) == ["a", "b", "d"]
+    assert ids({"source": {"$exists": False}}) == ["c", "d"]
+    assert ids({"$or": [{"source": "policy_doc"}, {"tags": {"$in": ["s3"]}}]}) == ["a", "c"]
+    assert ids({"source": "nope"}) == []
+
+
+def test_unknown_filter_operator_is_rejected():
+    with pytest.raises(ValueError):
+        compile_filter({"source": {"$regex": "kb"}})
+
+
+def test_upsert_overwrites_and_delete_keeps_rows_consistent():
+    store = _store()
+    store.upsert([("a", [0.0, 1.0, 0.0], {"source": "moved"})], namespace="ns")
+    store.delete(ids=["c"], namespace="ns")
+
+    result = store.query(vector=[0, 1, 0], top_k=10, namespace="ns")
+    assert _ids(result)[0] == "a"
+    assert "c" not in _ids(result)
+    assert result["matches"][0]["metadata"] == {"source": "moved"}
+    assert store.describe_index_stats()["namespaces"]["ns"]["vector_count"] == 3
+
+
+def test_dimension_mismatch_is_rejected():
+    store = _store()
+    with pytest.raises(ValueError):
+        store.upsert([("e", [1.0, 2.0], {})], namespace="ns")
+    with pytest.raises(ValueError):
+        store.query(vector=[1.0, 2.0], namespace="ns")
+
+
+def test_loads_sample_embeddings():
+    store = LocalVectorStore.from_json(SAMPLE)
+    sample = json.loads(SAMPLE.read_text())
+    first = sample["vectors"][0]
+
+    result = store.query(vector=first["values"], top_k=1, namespace=sample["namespace"])
+
+    assert result["matches"][0]["id"] == first["id"]
+    assert result["matches"][0]["metadata"] == first["metadata"]
+
+
+def test_process_store_preloads_the_sample_by_default(monkeypatch):
+    monkeypatch.delenv("LOCAL_VECTOR_STORE_PATH", raising=False)
+    monkeypatch.setattr(vector_store, "_STORE", None)
+    monkeypatch.setattr(vector_store, "_STORE_NAMESPACE", "")
+    sample = json.loads(SAMPLE.read_text())
+
+    store = get_vector_store()
+
+    assert vector_store.SAMPLE_EMBEDDINGS == SAMPLE
+    assert local_namespace() == sample["namespace"]
+    assert store.describe_index_stats()["total_vector_count"] == len(sample["vectors"])
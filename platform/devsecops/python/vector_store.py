@@ -0,0 +1,271 @@
+# vector_store.py
+"""
+In-process vector index: a local stand-in for the Pinecone index.
+
+    store = LocalVectorStore.from_json("sample_embeddings.json")
+    store.upsert([("doc-9", values, {"source": "kb_article"})], namespace="default")
+    store.query(vector=q, top_k=5, namespace="default",
+                filter={"source": {"$in": ["kb_article", "policy_doc"]}})
+    # -> {"namespace": "default", "matches": [{"id", "score", "metadata"}, ...]}
+
+upsert / query / delete / describe_index_stats take the same arguments as
+the Pinecone Index methods the repo calls, and query results have the
+dict shape rag_handler already reads, so the local store drops in behind
+VECTOR_BACKEND=local with no network round trip (small corpora, tests,
+air-gapped deployments).
+
+Each namespace keeps a float32 matrix of L2-normalized rows, so a cosine
+top-k is one matrix-vector product plus an argpartition. Metadata filters
+use Pinecone's operators (metadata_index.py) and are applied before
+scoring: indexed fields through inverted bitmaps, anything else per row.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from metadata_index import DEFAULT_INDEXED_FIELDS, BitmapIndex, compile_filter
+
+Metadata = Dict[str, Any]
+
+# Preloaded by get_vector_store() unless LOCAL_VECTOR_STORE_PATH says otherwise
+SAMPLE_EMBEDDINGS = Path(__file__).resolve().parents[2] / "mlsecops" / "rag" / "sample_embeddings.json"
+
+
+def normalize(values: Any, dim: Optional[int]) -> np.ndarray:
+    vec = np.asarray(values, dtype=np.float32).reshape(-1)
+    if dim is not None and vec.shape[0] != dim:
+        raise ValueError(f"vector dimension {vec.shape[0]} does not match index dimension {dim}")
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else vec
+
+
+def as_record(item: Any) -> tuple:
+    """(id, values, metadata) from a tuple or a {"id", "values", "metadata"} dict."""
+    if isinstance(item, Mapping):
+        return item["id"], item["values"], dict(item.get("metadata") or {})
+    vec_id, values, *rest = item
+    return vec_id, values, dict(rest[0] or {}) if rest else {}
+
+
+def read_export(path: Union[str, Path]) -> Tuple[str, List[Dict[str, Any]]]:
+    """(namespace, vectors) of a sample_embeddings.json-style export."""
+    with open(path, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    return data.get("namespace") or "", data.get("vectors") or []
+
+
+class _Namespace:
+    """Rows [0, size) are live; deletes move the last row into the hole."""
+
+    def __init__(self, dim: int, indexed_fields: Sequence[str]):
+        self.matrix = np.empty((16, dim), dtype=np.float32)
+        self.size = 0
+        self.ids: List[str] = []
+        self.metadata: List[Metadata] = []
+        self.rows: Dict[str, int] = {}
+        self.bitmaps = BitmapIndex(indexed_fields)
+
+    def put(self, vec_id: str, vec: np.ndarray, metadata: Metadata) -> None:
+        row = self.rows.get(vec_id)
+        if row is None:
+            if self.size == self.matrix.shape[0]:
+                grown = np.empty((2 * self.size, self.matrix.shape[1]), dtype=np.float32)
+                grown[: self.size] = self.matrix
+                self.matrix = grown
+            row = self.size
+            self.size += 1
+            self.ids.append(vec_id)
+            self.metadata.append(metadata)
+            self.rows[vec_id] = row
+        else:
+            self.bitmaps.discard(row, self.metadata[row])
+            self.metadata[row] = metadata
+        self.bitmaps.add(row, metadata)
+        self.matrix[row] = vec
+
+    def remove(self, vec_id: str) -> None:
+        row = self.rows.pop(vec_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        self.bitmaps.discard(row, self.metadata[row])
+        if row != last:
+            self.bitmaps.discard(last, self.metadata[last])
+            self.bitmaps.add(row, self.metadata[last])
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = self.ids[last]
+            self.metadata[row] = self.metadata[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.metadata.pop()
+        self.size = last
+
+
+class LocalVectorStore:
+    """Cosine-similarity index over in-memory float32 matrices, one per namespace."""
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        indexed_fields: Sequence[str] = DEFAULT_INDEXED_FIELDS,
+    ):
+        self.dimension = dimension
+        self.indexed_fields = tuple(indexed_fields)
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path]) -> "LocalVectorStore":
+        store = cls()
+        store.load_json(path)
+        return store
+
+    def load_json(self, path: Union[str, Path]) -> str:
+        """Load an export (see read_export); returns the namespace loaded into."""
+        namespace, vectors = read_export(path)
+        self.upsert(vectors, namespace=namespace)
+        return namespace
+
+    def upsert(self, vectors: Iterable[Any], namespace: str = "") -> Dict[str, int]:
+        records = [as_record(v) for v in vectors]
+        with self._lock:
+            count = 0
+            for vec_id, values, metadata in records:
+                vec = normalize(values, self.dimension)
+                if self.dimension is None:
+                    self.dimension = vec.shape[0]
+                ns = self._namespaces.get(namespace)
+                if ns is None:
+                    ns = self._namespaces[namespace] = _Namespace(
+                        self.dimension, self.indexed_fields
+                    )
+                ns.put(str(vec_id), vec, metadata)
+                count += 1
+        return {"upserted_count": count}
+
+    def delete(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        namespace: str = "",
+        delete_all: bool = False,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+            elif namespace in self._namespaces:
+                ns = self._namespaces[namespace]
+                for vec_id in ids or ():
+                    ns.remove(vec_id)
+        return {}
+
+    def query(
+        self,
+        vector: Sequence[float],
+        top_k: int = 5,
+        namespace: str = "",
+        filter: Optional[Mapping[str, Any]] = None,
+        include_metadata: bool = True,
+        **_ignored: Any,
+    ) -> Dict[str, Any]:
+        compile_filter(filter)  # reject bad filters even on an empty namespace
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or ns.size == 0 or top_k <= 0:
+                return {"namespace": namespace, "matches": []}
+            q = normalize(vector, self.dimension)
+
+            mask, residual = ns.bitmaps.resolve(filter, ns.size)
+            if mask is None and residual is None:
+                candidates = None
+                scores = ns.matrix[: ns.size] @ q
+            else:
+                candidates = np.flatnonzero(mask) if mask is not None else np.arange(ns.size)
+                if residual is not None:
+                    keep = [residual(ns.metadata[i]) for i in candidates]
+                    candidates = candidates[np.asarray(keep, dtype=bool)]
+                if candidates.size == 0:
+                    return {"namespace": namespace, "matches": []}
+                scores = ns.matrix[candidates] @ q
+
+            k = min(top_k, scores.shape[0])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            rows = top if candidates is None else candidates[top]
+
+            matches = []
+            for pos, row in zip(top, rows):
+                match: Dict[str, Any] = {"id": ns.ids[row], "score": float(scores[pos])}
+                if include_metadata:
+                    match["metadata"] = dict(ns.metadata[row])
+                matches.append(match)
+        return {"namespace": namespace, "matches": matches}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {
+                name: {"vector_count": ns.size} for name, ns in self._namespaces.items()
+            }
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values()),
+        }
+
+
+def vector_store_from_env() -> Any:
+    """
+    Empty local store of the kind named by LOCAL_VECTOR_INDEX:
+
+      flat  exact scan (this module), for small corpora and tests
+      ivf   ann_index.IVFVectorStore, persisted under LOCAL_VECTOR_INDEX_DIR
+            and probing ANN_NPROBE lists per query; ANN_QUANTIZER=int8|pq
+            (ANN_PQ_M sub-vectors) stores codes instead of float rows and
+            re-ranks ANN_RERANK * top_k candidates exactly
+    """
+    kind = os.environ.get("LOCAL_VECTOR_INDEX", "flat").strip().lower()
+    if kind == "flat":
+        return LocalVectorStore()
+    if kind == "ivf":
+        from ann_index import DEFAULT_NPROBE, DEFAULT_RERANK, IVFVectorStore
+
+        pq_m = os.environ.get("ANN_PQ_M")
+        return IVFVectorStore(
+            os.environ.get("LOCAL_VECTOR_INDEX_DIR") or None,
+            nprobe=int(os.environ.get("ANN_NPROBE", str(DEFAULT_NPROBE))),
+            quantizer=os.environ.get("ANN_QUANTIZER", "none").strip().lower(),
+            pq_m=int(pq_m) if pq_m else None,
+            rerank=int(os.environ.get("ANN_RERANK", str(DEFAULT_RERANK))),
+        )
+    raise RuntimeError(f"unknown LOCAL_VECTOR_INDEX: {kind!r}")
+
+
+_STORE_LOCK = threading.Lock()
+_STORE: Optional[Any] = None
+_STORE_NAMESPACE = ""
+
+
+def get_vector_store() -> Any:
+    """
+    Process-wide store, preloaded from LOCAL_VECTOR_STORE_PATH (default:
+    SAMPLE_EMBEDDINGS, skipped when the sample isn't shipped alongside).
+    """
+    global _STORE, _STORE_NAMESPACE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                store = vector_store_from_env()
+                path = os.environ.get("LOCAL_VECTOR_STORE_PATH")
+                if path or SAMPLE_EMBEDDINGS.exists():
+                    _STORE_NAMESPACE = store.load_json(path or SAMPLE_EMBEDDINGS)
+                _STORE = store
+    return _STORE
+
+
+def local_namespace() -> str:
+    """Namespace get_vector_store() preloaded into ("" if nothing was loaded)."""
+    get_vector_store()
+    return _STORE_NAMESPACE
@@ -152,6 +152,9 @@ resource "aws_lambda_function" "dlp_filter" {
       {
         "EVIDENCE_BUCKET_NAME" = aws_s3_bucket.evidence.bucket
         "RAG_LAMBDA_NAME"      = "${var.project_name}-rag-orchestrator"
+        # Shared with the RAG Lambda so dlp-admin answers can be detokenized
+        "DLP_TOKEN_KEY"  = var.dlp_token_key
+        "DLP_VAULT_PATH" = var.dlp_vault_path
       },
       var.dlp_lambda_env
     )
@@ -169,7 +172,9 @@ resource "aws_lambda_function" "rag_orchestrator" {
   environment {
     variables = merge(
       {
-        "EVIDENCE_BUCKET_NAME"  = aws_s3_bucket.evidence.bucket
+        "EVIDENCE_BUCKET_NAME" = aws_s3_bucket.evidence.bucket
+        "DLP_TOKEN_KEY"        = var.dlp_token_key
+        "DLP_VAULT_PATH"       = var.dlp_vault_path
       },
       var.rag_lambda_env
     )
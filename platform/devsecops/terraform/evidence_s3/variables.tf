@@ -31,3 +31,15 @@ variable "rag_lambda_env" {
   description = "Environment variables for the RAG Lambda"
 }
 
+variable "dlp_token_key" {
+  type        = string
+  default     = ""
+  sensitive   = true
+  description = "HMAC key for DLP vault tokens, shared by both Lambdas (empty: prompts are masked without reversible tokens)"
+}
+
+variable "dlp_vault_path" {
+  type        = string
+  default     = ""
+  description = "SQLite vault file on storage both Lambdas mount, e.g. an EFS path (empty: no detokenization across Lambdas)"
+}
@@ -1,7 +1,22 @@
 package dlp.rag_acl
 
-default allow = false
+import rego.v1
 
-allow {
-    input.user_role == data.roles.allowed[input.embedding.record_type]
+default allow := false
+
+# dlp05_rag_acl_data.json: record_type -> roles, role -> cleared dlp_labels.
+# Either may be a list or a single string; both shapes need the role AND the
+# label to match. retrieval_acl.py applies the same rule as a vector-index
+# filter at query time.
+allow if {
+    input.user_role in allowed_roles
+    input.embedding.dlp_label in cleared_labels
 }
+
+allowed_roles := as_set(data.roles.allowed[input.embedding.record_type])
+
+cleared_labels := as_set(data.roles.labels[input.user_role])
+
+as_set(value) := {value} if is_string(value)
+
+as_set(value) := {x | some x in value} if is_array(value)
@@ -0,0 +1,48 @@
+package dlp.rag_acl
+
+import rego.v1
+
+list_roles := {
+  "allowed": {"clean": ["analyst", "dlp-admin"], "sensitive": ["dlp-admin"]},
+  "labels": {
+    "analyst": ["public", "internal", "confidential"],
+    "dlp-admin": ["public", "internal", "confidential", "restricted_pii", "phi"]
+  }
+}
+
+string_roles := {
+  "allowed": {"clean": "analyst", "sensitive": "dlp-admin"},
+  "labels": {"analyst": "internal", "dlp-admin": "phi"}
+}
+
+test_list_shape_allows_cleared_label if {
+  allow with input as {"user_role": "analyst", "embedding": {"record_type": "clean", "dlp_label": "internal"}} with data.roles as list_roles
+}
+
+test_list_shape_denies_uncleared_label if {
+  not allow with input as {"user_role": "analyst", "embedding": {"record_type": "clean", "dlp_label": "phi"}} with data.roles as list_roles
+}
+
+test_list_shape_denies_other_record_type if {
+  not allow with input as {"user_role": "analyst", "embedding": {"record_type": "sensitive", "dlp_label": "internal"}} with data.roles as list_roles
+}
+
+test_list_shape_admin_reads_phi if {
+  allow with input as {"user_role": "dlp-admin", "embedding": {"record_type": "sensitive", "dlp_label": "phi"}} with data.roles as list_roles
+}
+
+test_string_shape_allows_cleared_label if {
+  allow with input as {"user_role": "analyst", "embedding": {"record_type": "clean", "dlp_label": "internal"}} with data.roles as string_roles
+}
+
+test_string_shape_denies_uncleared_label if {
+  not allow with input as {"user_role": "analyst", "embedding": {"record_type": "clean", "dlp_label": "phi"}} with data.roles as string_roles
+}
+
+test_string_shape_denies_other_role if {
+  not allow with input as {"user_role": "analyst", "embedding": {"record_type": "sensitive", "dlp_label": "internal"}} with data.roles as string_roles
+}
+
+test_unknown_role_denied if {
+  not allow with input as {"user_role": "guest", "embedding": {"record_type": "clean", "dlp_label": "public"}} with data.roles as list_roles
+}
@@ -1,13 +1,42 @@
 import os
-from pinecone import Pinecone, ServerlessSpec
+import sys
+from functools import lru_cache
+from pathlib import Path
 
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+# VECTOR_BACKEND=local serves upsert/query from the in-process vector store
+# (platform/devsecops/python/vector_store.py), preloaded from
+# LOCAL_VECTOR_STORE_PATH (default: sample_embeddings.json next to this file)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+DLP_PATH = Path(__file__).resolve().parents[2] / "devsecops" / "python"
 
-def get_index():
+
+def _dlp_path():
+    if str(DLP_PATH) not in sys.path:
+        sys.path.insert(0, str(DLP_PATH))
+
+
+@lru_cache(maxsize=None)
+def _local_index():
+    _dlp_path()
+    from vector_store import get_vector_store, local_namespace
+
+    return get_vector_store(), os.getenv("PINECONE_NAMESPACE", local_namespace())
+
+
+@lru_cache(maxsize=None)
+def _pinecone_index():
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
     index_name = os.getenv("PINECONE_INDEX_NAME", "vhc-rag-index")
     ns = os.getenv("PINECONE_NAMESPACE", "vhc-default")
-    index = pc.Index(index_name)
-    return index, ns
+    return pc.Index(index_name), ns
+
+
+def get_index():
+    if VECTOR_BACKEND == "local":
+        return _local_index()
+    return _pinecone_index()
 
 def upsert_embedding(vec_id: str, embedding: list, metadata: dict):
     index, ns = get_index()
@@ -20,12 +49,26 @@ def upsert_embedding(vec_id: str, embedding: list, metadata: dict):
         namespace=ns
     )
 
-def query_embeddings(embedding: list, top_k=5):
+def query_embeddings(embedding: list, top_k=5, filter=None, role=None, labels=None):
+    """
+    With a role, only records it may read (dlp05_rag_acl.rego, optionally
+    narrowed to `labels`) are scored; a role cleared for nothing gets no
+    matches.
+    """
+    if role is not None:
+        _dlp_path()
+        from retrieval_acl import get_retrieval_acl
+
+        acl_filter = get_retrieval_acl().filter_for(role, labels)
+        if acl_filter is None:
+            return {"matches": []}
+        filter = {"$and": [acl_filter, filter]} if filter else acl_filter
     index, ns = get_index()
     res = index.query(
         vector=embedding,
         top_k=top_k,
         namespace=ns,
+        filter=filter,
         include_metadata=True
     )
     return res
@@ -2,7 +2,7 @@ import json
 import os
 import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 # --- Force Python to use the repo's dlp_utils.py ---
 ROOT = Path(__file__).resolve().parent
@@ -19,11 +19,15 @@ import dlp_utils  # now guaranteed to come from DLP_PATH
 print("dlp_utils loaded from:", dlp_utils.__file__)  # sanity check in terminal
 
 from dlp_utils import classify_text, detect_entities, check_data_movement
+from embedding_cache import get_embedding_cache
+from hybrid_retrieval import hybrid_query, retrieval_mode_from_env
+from lexical_index import get_lexical_index
+from retrieval_acl import get_retrieval_acl
+from vector_store import get_vector_store, local_namespace
 
 import streamlit as st
 from dotenv import load_dotenv
 from openai import OpenAI
-from pinecone import Pinecone, ServerlessSpec
 
 load_dotenv()
 
@@ -34,6 +38,9 @@ OPENAI_EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "vhc-rag-index")
 PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE", "vhc-default")
+# pinecone | local (in-process vector_store, loaded from LOCAL_VECTOR_STORE_PATH,
+# default sample_embeddings.json – same store and namespace as pinecone_client)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
 
 if not OPENAI_API_KEY:
     st.warning(
@@ -41,52 +48,66 @@ if not OPENAI_API_KEY:
         "The RAG query will be disabled until you set it."
     )
 
-if not PINECONE_API_KEY:
+if VECTOR_BACKEND != "local" and not PINECONE_API_KEY:
     st.warning(
         "PINECONE_API_KEY is not set in your environment. "
         "The RAG query will be disabled until you set it."
     )
 
 openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-pc = Pinecone(api_key=PINECONE_API_KEY) if PINECONE_API_KEY else None
-pinecone_index = pc.Index(PINECONE_INDEX_NAME) if pc else None
+if VECTOR_BACKEND == "local":
+    pinecone_index = get_vector_store()
+    PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE", local_namespace())
+elif PINECONE_API_KEY:
+    from pinecone import Pinecone
+
+    pinecone_index = Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME)
+else:
+    pinecone_index = None
+# BM25 index written by the S3 sync (RAG_LEXICAL_INDEX); None until one exists
+lexical_index = get_lexical_index()
 
 
 # ----------------------------------------------------
 # Helpers
 # ----------------------------------------------------
+def _embed_api(texts: List[str]) -> List[List[float]]:
+    resp = openai_client.embeddings.create(
+        model=OPENAI_EMBED_MODEL,
+        input=texts,
+    )
+    return [item.embedding for item in resp.data]
+
+
 def embed_text(text: str) -> List[float]:
     if not openai_client:
         raise RuntimeError("OPENAI_API_KEY not configured")
 
-    resp = openai_client.embeddings.create(
-        model=OPENAI_EMBED_MODEL,
-        input=[text],
-    )
-    return resp.data[0].embedding
+    # Shared with the S3 sync job: repeated prompts are embedded once
+    return get_embedding_cache().embed(OPENAI_EMBED_MODEL, [text], _embed_api)[0]
 
 
-def query_rag(prompt: str, top_k: int = 5) -> List[Dict[str, Any]]:
-    if not pinecone_index:
+def query_rag(
+    prompt: str, top_k: int = 5, role: str = "analyst", labels: Optional[List[str]] = None
+) -> Tuple[List[Dict[str, Any]], str]:
+    """(matches, retrieval mode used); see hybrid_retrieval.py for RAG_RETRIEVAL_MODE."""
+    if not (pinecone_index or lexical_index):
         raise RuntimeError("Pinecone is not configured")
 
-    vec = embed_text(prompt)
-    result = pinecone_index.query(
+    # Only records this role may read are scored (dlp05_rag_acl.rego)
+    acl_filter = get_retrieval_acl().filter_for(role, labels)
+    if acl_filter is None:
+        return [], "none"
+
+    return hybrid_query(
+        prompt,
+        top_k,
         namespace=PINECONE_NAMESPACE,
-        vector=vec,
-        top_k=top_k,
-        include_metadata=True,
+        filter=acl_filter,
+        index=pinecone_index if openai_client else None,
+        embed=embed_text,
+        lexical=lexical_index,
     )
-    matches = []
-    for m in result.matches:
-        matches.append(
-            {
-                "id": m.id,
-                "score": m.score,
-                "metadata": getattr(m, "metadata", {}) or {},
-            }
-        )
-    return matches
 
 
 def simulate_flow(
@@ -104,6 +125,8 @@ def simulate_flow(
         opa_label = "RESTRICTED_PHI"
     elif norm in ("restricted_pii", "pii"):
         opa_label = "RESTRICTED_PII"
+    elif norm in ("confidential",):
+        opa_label = "CONFIDENTIAL"
     elif norm in ("internal",):
         opa_label = "INTERNAL"
     else:
@@ -206,6 +229,15 @@ with st.sidebar:
     st.markdown(f"- **Pinecone index**: `{PINECONE_INDEX_NAME}`")
     st.markdown(f"- **Namespace**: `{PINECONE_NAMESPACE}`")
     st.markdown(f"- **Embed model**: `{OPENAI_EMBED_MODEL}`")
+    st.markdown(
+        f"- **Retrieval**: `{retrieval_mode_from_env()}`"
+        + ("" if lexical_index else " (no BM25 index yet: vector only)")
+    )
+    acl = get_retrieval_acl()
+    user_role = st.selectbox("Retrieval role", sorted(acl.labels) or ["analyst"])
+    retrieval_labels = st.multiselect(
+        "Retrievable labels", acl.labels_for(user_role), default=list(acl.labels_for(user_role))
+    )
     st.markdown(
         "- **DLP engine**: `dlp_utils.classify_text / detect_entities / check_data_movement`"
     )
@@ -292,7 +324,7 @@ if run_demo:
             "RAG query is **not** executed for this prompt. "
             "See data-movement reasons above."
         )
-    elif not (openai_client and pinecone_index):
+    elif not ((openai_client and pinecone_index) or lexical_index):
         st.warning(
             "OpenAI and/or Pinecone are not fully configured. "
             "Set `OPENAI_API_KEY` and `PINECONE_API_KEY` to enable RAG."
@@ -300,15 +332,19 @@ if run_demo:
     else:
         with st.spinner("Querying Pinecone with DLP-approved prompt..."):
             try:
-                matches = query_rag(user_prompt, top_k=5)
+                matches, retrieval_mode = query_rag(
+                    user_prompt, top_k=5, role=user_role, labels=retrieval_labels
+                )
             except Exception as e:
                 st.error(f"Error querying Pinecone: {e}")
-                matches = []
+                matches, retrieval_mode = [], "error"
 
         if not matches:
             st.info("No RAG matches returned from Pinecone.")
         else:
-            st.success(f"Retrieved {len(matches)} RAG matches from Pinecone.")
+            st.success(
+                f"Retrieved {len(matches)} RAG matches from Pinecone ({retrieval_mode} retrieval)."
+            )
 
             # 🔎 New: AI-generated explanation of *why* these results matter
             st.markdown("**RAG assistant explanation**")